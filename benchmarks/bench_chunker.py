@@ -0,0 +1,93 @@
+"""Chunker benchmark: throughput (MB/s) and chunk quality, RecursiveCharacterTextSplitter vs. TokenChunker.
+
+The input is a list of sections, each a heading followed by prose
+paragraphs or table rows, split one section at a time as
+ingest.iter_chunks does. Token counts use tiktoken when it can load (a
+len/4 estimate otherwise). "over budget" counts chunks above the token
+budget; "mid-chunk headings" counts headings that do not start their
+chunk. Run from the repository root:
+
+    python benchmarks/bench_chunker.py --mb 8 --json chunker.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chunker import TokenChunker
+from corpora import paragraph, sentence, sales_rows, SALES_HEADER
+
+
+def make_sections(rng, megabytes):
+    parts, size = [], 0
+    while size < megabytes * 2**20:
+        if rng.random() < 0.3:
+            block = "\n".join("; ".join(f"{column}: {value}" for column, value in zip(SALES_HEADER, row))
+                              for row in sales_rows(rng, 30))
+        else:
+            block = "\n".join(paragraph(rng, rng.randint(2, 8)) for _ in range(rng.randint(1, 4)))
+        block = f"# {sentence(rng, 4)}\n{block}\n"
+        parts.append(block)
+        size += len(block)
+    return parts
+
+
+def measure(name, split, sections, chunker, budget):
+    start = time.perf_counter()
+    chunks = [chunk for section in sections for chunk in split(section)]
+    seconds = time.perf_counter() - start
+    tokens = [chunker.count(chunk) for chunk in chunks]
+    return {
+        "splitter": name,
+        "mb_per_s": sum(len(section.encode("utf-8")) for section in sections) / 2**20 / seconds,
+        "seconds": seconds,
+        "chunks": len(chunks),
+        "max_tokens": max(tokens, default=0),
+        "over_budget": sum(count > budget for count in tokens),
+        "mid_chunk_headings": sum("\n#" in chunk for chunk in chunks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=8, help="input size in MB")
+    parser.add_argument("--tokens", type=int, default=250, help="TokenChunker budget")
+    parser.add_argument("--overlap", type=int, default=50, help="TokenChunker overlap")
+    parser.add_argument("--chars", type=int, default=1000, help="RecursiveCharacterTextSplitter chunk_size")
+    parser.add_argument("--char-overlap", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--min-mb-per-s", type=float, help="fail if TokenChunker is slower")
+    args = parser.parse_args()
+
+    sections = make_sections(random.Random(7), args.mb)
+    chunker = TokenChunker(args.tokens, args.overlap)
+    results = []
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        recursive = RecursiveCharacterTextSplitter(chunk_size=args.chars, chunk_overlap=args.char_overlap, length_function=len)
+        results.append(measure("recursive (chars)", recursive.split_text, sections, chunker, args.tokens))
+    except ImportError:
+        print("⏭️ langchain not installed; measuring TokenChunker only")
+    results.append(measure("token chunker", chunker.split_text, sections, chunker, args.tokens))
+
+    tokenizer = chunker.tokenizer
+    print(f"{sum(map(len, sections)) / 2**20:.1f} MB input, {args.tokens}-token budget ({tokenizer})")
+    print(f"{'':<20}{'MB/s':>8}{'chunks':>9}{'max tok':>9}{'over':>7}{'mid-head':>10}")
+    for result in results:
+        print(f"{result['splitter']:<20}{result['mb_per_s']:>8.2f}{result['chunks']:>9}{result['max_tokens']:>9}"
+              f"{result['over_budget']:>7}{result['mid_chunk_headings']:>10}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mb": args.mb, "tokens": args.tokens, "tokenizer": tokenizer, "results": results}, f, indent=2)
+    if args.min_mb_per_s is not None and results[-1]["mb_per_s"] < args.min_mb_per_s:
+        sys.exit(f"TokenChunker {results[-1]['mb_per_s']:.2f} MB/s < {args.min_mb_per_s} MB/s")
+
+
+if __name__ == "__main__":
+    main()
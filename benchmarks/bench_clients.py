@@ -0,0 +1,98 @@
+"""Client benchmark: per-request latency and connections, fresh clients vs. the shared registry.
+
+"fresh" builds a new ChatOpenAI / OpenAIEmbeddings for every request, as
+the UI, CLI and index helpers used to; "shared" goes through clients.py.
+By default everything talks to a local stand-in server (plain HTTP, so
+TLS handshake savings against the real API come on top of what is shown).
+Run from the repository root:
+
+    python benchmarks/bench_clients.py --requests 50 --server-ms 20 --json clients.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODEL = "gpt-3.5-turbo"
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+def timed(name, call, requests, server):
+    connections = server.stats["connections"] if server else None
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "case": name,
+        "mean_ms": statistics.mean(latencies),
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95) - 1],
+        "connections": server.stats["connections"] - connections if server else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--server-ms", type=float, default=10, help="stand-in server delay per request")
+    parser.add_argument("--base-url", help="use this OpenAI-compatible endpoint instead of the built-in stand-in")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    import clients
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        from fakes import StandInOpenAIServer
+        server = StandInOpenAIServer(delay=args.server_ms / 1000).start()
+        base_url = server.url
+    clients.OPENAI_BASE_URL = base_url
+    api_key = os.getenv("OPENAI_API_KEY", "sk-standin")
+
+    results = [
+        timed("chat fresh", lambda i: ChatOpenAI(model=MODEL, temperature=0.2, api_key=api_key, base_url=base_url)
+              .invoke(f"question {i}"), args.requests, server),
+        timed("chat shared", lambda i: clients.get_chat_model(MODEL, 0.2, api_key=api_key)
+              .invoke(f"question {i}"), args.requests, server),
+        timed("embed fresh", lambda i: OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=api_key, base_url=base_url)
+              .embed_query(f"query {i}"), args.requests, server),
+        timed("embed shared", lambda i: clients.get_embeddings_client(EMBEDDING_MODEL, api_key=api_key)
+              .embed_query(f"query {i}"), args.requests, server),
+    ]
+
+    async def concurrent():
+        model = clients.get_chat_model(MODEL, 0.2, api_key=api_key)
+        await asyncio.gather(*(model.ainvoke(f"question {i}") for i in range(args.requests)))
+        await clients.aclose()
+
+    connections = server.stats["connections"] if server else None
+    start = time.perf_counter()
+    asyncio.run(concurrent())
+    elapsed = (time.perf_counter() - start) * 1000
+    results.append({"case": "chat shared async x%d" % args.requests, "mean_ms": elapsed / args.requests,
+                    "p95_ms": None, "connections": server.stats["connections"] - connections if server else None})
+    clients.close()
+
+    print(f"{args.requests} requests per case against {base_url}")
+    print(f"{'case':<26}{'mean ms':>10}{'p95 ms':>10}{'conns':>8}")
+    for r in results:
+        p95 = f"{r['p95_ms']:.2f}" if r["p95_ms"] is not None else "-"
+        conns = r["connections"] if r["connections"] is not None else "-"
+        print(f"{r['case']:<26}{r['mean_ms']:>10.2f}{p95:>10}{conns:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
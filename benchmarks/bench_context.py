@@ -0,0 +1,134 @@
+"""Context benchmark: prompt tokens and assembly time, plain join vs. context_builder.
+
+A synthetic corpus is split into overlapping chunks (CHUNK_SIZE/CHUNK_OVERLAP
+like data_chunks) and spread over several indexes that share documents,
+as happens with the permanent plus per-file indexes. Each query retrieves
+the same candidates for both methods. Run from the repository root:
+
+    python benchmarks/bench_context.py --candidates 12 --budget 1500 --json context.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from context_builder import build_context, count_tokens
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+DIMENSIONS = 512
+
+
+class Chunk:
+    def __init__(self, text, metadata):
+        self.page_content = text
+        self.metadata = metadata
+
+
+def split(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Word-boundary windows with a fixed character overlap, like the recursive splitter on plain prose."""
+    words, chunks, start = text.split(" "), [], 0
+    while start < len(words):
+        length, end = 0, start
+        while end < len(words) and length + len(words[end]) + 1 <= size:
+            length += len(words[end]) + 1
+            end += 1
+        chunks.append(" ".join(words[start:end]))
+        if end >= len(words):
+            break
+        back, carried = end, 0
+        while back > start + 1 and carried + len(words[back - 1]) + 1 <= overlap:
+            back -= 1
+            carried += len(words[back]) + 1
+        start = back
+    return chunks
+
+
+def embed(text):
+    """Hashed bag of words: similar texts get similar vectors, like a real embedder would give."""
+    vector = np.zeros(DIMENSIONS, dtype="float32")
+    for word in text.lower().split():
+        vector[zlib.crc32(word.encode()) % DIMENSIONS] += 1
+    return vector / (np.linalg.norm(vector) or 1)
+
+
+def make_corpus(rng, documents, pages, words_per_page):
+    vocabulary = [f"term{i}" for i in range(3000)]
+    corpus = []
+    for d in range(documents):
+        topic = rng.sample(vocabulary, 60)
+        for page in range(1, pages + 1):
+            text = " ".join(rng.choice(topic) if rng.random() < 0.5 else rng.choice(vocabulary)
+                            for _ in range(words_per_page))
+            for chunk in split(text):
+                corpus.append(Chunk(chunk, {"source": f"doc{d}.pdf", "page": page}))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=6)
+    parser.add_argument("--indexes", type=int, default=3, help="indexes sharing the corpus (duplicates)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=60, help="LLM prompt processing cost estimate")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    corpus = make_corpus(rng, args.documents, pages=4, words_per_page=600)
+    # Every index holds most of the corpus, so the same chunk comes back from several of them
+    chunks = [chunk for _ in range(args.indexes) for chunk in corpus if rng.random() < 0.8]
+    vectors = np.stack([embed(chunk.page_content) for chunk in chunks])
+
+    naive_tokens, built_tokens, build_ms = [], [], []
+    for _ in range(args.queries):
+        words = rng.choice(corpus).page_content.split()
+        query = " ".join(rng.sample(words, 8))
+        query_vector = embed(query)
+        # Exact duplicates are already merged away by retrieval.search_indexes
+        top, seen = [], set()
+        for i in np.argsort(-(vectors @ query_vector)):
+            if chunks[i].page_content not in seen:
+                seen.add(chunks[i].page_content)
+                top.append(i)
+            if len(top) == args.candidates:
+                break
+        docs = [chunks[i] for i in top]
+
+        naive_tokens.append(count_tokens("\n".join(doc.page_content for doc in docs)))
+        start = time.perf_counter()
+        context = build_context(docs, query_vector=query_vector, vectors=vectors[top], budget=args.budget)
+        build_ms.append((time.perf_counter() - start) * 1000)
+        built_tokens.append(context["tokens"])
+
+    result = {
+        "candidates": args.candidates,
+        "budget": args.budget,
+        "naive_tokens": statistics.mean(naive_tokens),
+        "built_tokens": statistics.mean(built_tokens),
+        "build_ms": statistics.mean(build_ms),
+        "naive_prefill_ms": statistics.mean(naive_tokens) * args.prefill_ms_per_1k / 1000,
+        "built_prefill_ms": statistics.mean(built_tokens) * args.prefill_ms_per_1k / 1000,
+    }
+    print(f"{len(chunks)} chunks in {args.indexes} indexes, {args.queries} queries, {args.candidates} candidates each")
+    print(f"{'':<16}{'tokens':>10}{'prefill ms':>12}")
+    print(f"{'plain join':<16}{result['naive_tokens']:>10.0f}{result['naive_prefill_ms']:>12.1f}")
+    print(f"{'context_builder':<16}{result['built_tokens']:>10.0f}{result['built_prefill_ms']:>12.1f}"
+          f"   (+{result['build_ms']:.2f} ms to build)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Detection benchmark: time to find the open document, cold and cached.
+
+Starts --holders processes that each keep a document open (one through
+an open descriptor, the rest only naming it on their command line, like
+LibreOffice does) and detects through the Linux /proc backend, with
+FLOWSYNC_ACTIVE_PID standing in for window focus. The old path slept 3 s
+before every detection. Linux only; no display needed. Run from the
+repository root:
+
+    python benchmarks/bench_detect.py --holders 8 --rounds 50 --json detect.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from open_documents import DocumentDetector, LinuxProcBackend, copy_for_reading
+
+HOLD_OPEN = "import sys, time; f = open(sys.argv[1], 'rb'); time.sleep(600)"
+HOLD_NAME = "import time; time.sleep(600)"
+
+
+def timed(function, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--holders", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--size-mb", type=float, default=20, help="size of the document copied for indexing")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-ms", type=float, help="fail if cached detection is slower")
+    args = parser.parse_args()
+    if not sys.platform.startswith("linux"):
+        sys.exit("bench_detect needs Linux /proc")
+
+    directory = tempfile.mkdtemp(prefix="flowsync_detect_")
+    documents = [os.path.join(directory, f"report{i}.pdf") for i in range(args.holders)]
+    for path in documents:
+        with open(path, "wb") as f:
+            f.write(os.urandom(int(args.size_mb * 2**20)) if path == documents[0] else b"%PDF-1.4")
+    holders = [subprocess.Popen([sys.executable, "-c", HOLD_OPEN, documents[0]])]
+    holders += [subprocess.Popen([sys.executable, "-c", HOLD_NAME, path]) for path in documents[1:]]
+    time.sleep(0.5)
+    try:
+        os.environ["FLOWSYNC_ACTIVE_PID"] = str(holders[0].pid)
+        result = {}
+        focused = DocumentDetector(LinuxProcBackend(), ttl=0)
+        found, result["focused_cold_ms"] = timed(lambda: focused.detect()[0], args.rounds)
+        assert found == documents[0], found
+        focused = DocumentDetector(LinuxProcBackend())
+        _, result["focused_cached_ms"] = timed(lambda: focused.detect()[0], args.rounds)
+
+        # No focus information: scan the session's processes
+        del os.environ["FLOWSYNC_ACTIVE_PID"]
+        scanning = DocumentDetector(LinuxProcBackend(), ttl=0)
+        found, result["scan_cold_ms"] = timed(lambda: scanning.detect()[0], max(args.rounds // 10, 1))
+        assert found in documents, found
+        scanning = DocumentDetector(LinuxProcBackend())
+        _, result["scan_cached_ms"] = timed(lambda: scanning.detect()[0], args.rounds)
+
+        _, result["copy_ms"] = timed(lambda: copy_for_reading(documents[0], directory=os.path.join(directory, "copy")), 3)
+        alive = all(holder.poll() is None for holder in holders)
+    finally:
+        for holder in holders:
+            holder.kill()
+
+    summary = {name: statistics.median(samples) for name, samples in result.items()}
+    summary["holder_still_running"] = alive
+    print(f"{args.holders} processes holding documents, {args.rounds} rounds (old path: 3000 ms sleep + scan)")
+    print(f"{'':<16}{'median ms':>10}")
+    for name in ("focused_cold_ms", "focused_cached_ms", "scan_cold_ms", "scan_cached_ms", "copy_ms"):
+        print(f"{name[:-3]:<16}{summary[name]:>10.2f}")
+    print(f"application kept running during copy: {alive}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.max_ms is not None and summary["focused_cached_ms"] > args.max_ms:
+        sys.exit(f"cached detection {summary['focused_cached_ms']:.2f} ms > {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
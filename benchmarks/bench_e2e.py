@@ -0,0 +1,321 @@
+"""End-to-end benchmark: every user-facing path, offline, with JSON results and regression checks.
+
+Synthetic documents (corpora.py) go through extract_text, data_chunks,
+indexing (cold and cached), retrieval and the table query engine; a
+synthetic screen goes through capture_and_process_screen (full and
+incremental OCR); respond_to_user_query and FloatingChat.handle_user_query
+run end to end. Embeddings come from FakeEmbeddings with a per-batch
+delay, LLMs are SlowChatModel stand-ins and OCR is CannedOCRReader. All
+caches live in a fresh temporary directory. Stages whose dependencies
+are missing are reported as skipped. A wrong table answer (a filter on
+two regions) fails the run like a regression. Run from the repository root:
+
+    python benchmarks/bench_e2e.py --scale 1 --json e2e.json
+    python benchmarks/bench_e2e.py --baseline e2e.json --max-regression 0.25
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+GENERAL_ANSWER = "Here is a short explanation of what is on your screen. " * 6
+AUTOMATION_ANSWER = json.dumps({
+    "instructions": ["Open the Start menu", "Type the app name", "Press Enter"],
+    "automation_code": "pyautogui.press('win')\npyautogui.write('notepad')\npyautogui.press('enter')\n",
+})
+DOCUMENT_ANSWER = "The documents describe the quarterly revenue forecast by region [1] and the renewal terms [2]. "
+GENERAL_QUERIES = ["what does this error message mean", "summarize the text on screen", "explain this report"]
+AUTOMATION_QUERIES = ["open notepad and type my shopping list", "send the report to the team channel"]
+MULTI_VALUE_QUERY = "total amount in the East and West regions"
+NOISE_FLOOR_MS = 1.0   # differences below this are never reported as regressions
+
+
+def reply(prompt):
+    if "Classify the user's query" in prompt:
+        return "automation" if any(query in prompt for query in AUTOMATION_QUERIES) else "general"
+    if "citing them like [1]" in prompt:
+        return DOCUMENT_ANSWER
+    return GENERAL_ANSWER if "smart and helpful assistant" in prompt else AUTOMATION_ANSWER
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.skipped = {}
+        self.counters = {}
+        self.failures = []
+
+    def time(self, stage, function, runs=1):
+        """Runs `function` `runs` times, recording each duration; returns the last result."""
+        result = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = function()
+            self.samples.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    def verify(self, check, problem):
+        """Records a correctness check; `problem` is None when it passed."""
+        if problem is not None:
+            self.failures.append(f"{check}: {problem}")
+            print(f"❌ {check}: {problem}")
+
+    def skip(self, stage, reason):
+        self.skipped[stage] = str(reason)
+        print(f"⏭️ {stage}: {reason}")
+
+    def summary(self):
+        stages = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            stages[stage] = {
+                "runs": len(samples),
+                "median_ms": statistics.median(samples),
+                "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "max_ms": ordered[-1],
+            }
+        return stages
+
+
+def configure_environment(work_dir):
+    """Points every cache at `work_dir` and selects offline backends; must run before app imports."""
+    os.environ.update({
+        "FLOWSYNC_INDEX_CACHE_DIR": os.path.join(work_dir, "indexes"),
+        "FLOWSYNC_EMBEDDING_CACHE": os.path.join(work_dir, "embeddings.sqlite3"),
+        "FLOWSYNC_RESPONSE_CACHE": os.path.join(work_dir, "responses.sqlite3"),
+        "FLOWSYNC_TABLE_CACHE_DIR": os.path.join(work_dir, "tables"),
+        "FLOWSYNC_DETECTION_BACKEND": "synthetic",
+        "FLOWSYNC_INPUT_BACKEND": "synthetic",
+        "FLOWSYNC_WARMUP": "0",
+        "QT_QPA_PLATFORM": "offscreen",
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+
+def install_fakes(args):
+    """Swaps the remote services for the stand-ins; returns the fake chat model and embedder."""
+    import clients
+    import screen
+    import embedding_service
+    from fakes import SlowChatModel
+
+    llm = SlowChatModel(reply=reply, first_token_delay=args.first_token, token_delay=args.token_delay)
+    clients.get_chat_model = lambda *a, **k: llm
+    screen._llms["general"] = llm
+    screen._llms["code"] = llm
+    embedder = embedding_service.FakeEmbeddings(delay=args.embed_ms / 1000)
+    with embedding_service._services_lock:
+        if embedding_service._embedding_cache is None:
+            embedding_service._embedding_cache = embedding_service.EmbeddingCache()
+        from detect_open import EMBEDDING_MODEL
+        embedding_service._services[(EMBEDDING_MODEL, os.environ["OPENAI_API_KEY"])] = embedding_service.EmbeddingService(
+            embedder, f"fake:{EMBEDDING_MODEL}", cache=embedding_service._embedding_cache
+        )
+    return llm, embedder
+
+
+def bench_documents(recorder, args, work_dir):
+    from corpora import make_corpus, sentence
+    from detect_open import extract_text, data_chunks, build_temp_index_from_file
+    from retrieval import retrieve_context
+    from tabular import answer_from_tables
+    import random
+
+    paths, skipped = recorder.time("corpus", lambda: make_corpus(os.path.join(work_dir, "docs"), args.scale, args.formats))
+    for extension, reason in skipped.items():
+        recorder.skip(f"document:{extension}", reason)
+    indexes = {}
+    for extension, path in paths.items():
+        text = recorder.time(f"extract_text:{extension}", lambda: extract_text(path), args.runs)
+        if text.startswith(("Error extracting text", "Unsupported file type", "No text found")):
+            recorder.skip(f"document:{extension}", text)
+            continue
+        chunks = recorder.time(f"data_chunks:{extension}", lambda: data_chunks(text), args.runs)
+        recorder.counters[f"chunks:{extension}"] = len(chunks)
+        index = recorder.time(f"index_cold:{extension}", lambda: build_temp_index_from_file(path, os.environ["OPENAI_API_KEY"]))
+        recorder.time(f"index_cached:{extension}", lambda: build_temp_index_from_file(path, os.environ["OPENAI_API_KEY"]), args.runs)
+        if index is not None:
+            indexes[extension] = index
+    if not indexes:
+        recorder.skip("retrieval", "no document could be indexed")
+        return []
+
+    rng = random.Random(11)
+    queries = [sentence(rng, 6) for _ in range(args.queries)]
+    everything = list(indexes.values())
+    recorder.time("retrieval_cold", lambda: [retrieve_context(everything, query) for query in queries])
+    recorder.time("retrieval_repeat", lambda: retrieve_context(everything, queries[0]), args.runs)
+    if "csv" in indexes:
+        answer = recorder.time("table_query", lambda: answer_from_tables([indexes["csv"]], "total amount by region"), args.runs)
+        recorder.counters["table_query_answered"] = answer is not None
+        recorder.verify("table_query_values", check_multi_value(paths["csv"], answer_from_tables([indexes["csv"]], MULTI_VALUE_QUERY)))
+    return everything
+
+
+def check_multi_value(path, answer):
+    """None if MULTI_VALUE_QUERY was answered with the sum over both regions, else what went wrong."""
+    import csv
+    with open(path, newline="", encoding="utf-8") as f:
+        expected = sum(float(row["Amount"]) for row in csv.DictReader(f) if row["Region"] in ("East", "West"))
+    if answer is None:
+        return "not answered"
+    if f"{expected:,.2f}" not in answer["answer"] and f"{expected:,.0f}" not in answer["answer"]:
+        return f"{answer['answer']!r}, expected {expected:,.2f}"
+    return None
+
+
+def bench_screen(recorder, args):
+    import screen
+    from corpora import SyntheticScreen
+    from fakes import CannedOCRReader
+    from screen_capture import ScreenCapture
+
+    synthetic = SyntheticScreen(*args.screen)
+    reader = CannedOCRReader(synthetic.lines, seconds_per_megapixel=args.ocr_ms_per_mp / 1000)
+    screen._ocr_reader = reader
+    ScreenCapture.grab = classmethod(lambda cls, region=None: cls(synthetic.frame(), region))
+
+    text = recorder.time("capture_full", lambda: screen.capture_and_process_screen())
+    for i in range(args.runs):
+        synthetic.type(i % len(synthetic.lines), f"Typed text number {i}")
+        recorder.time("capture_incremental", lambda: screen.capture_and_process_screen())
+    recorder.counters["ocr_megapixels"] = round(reader.stats["megapixels"], 2)
+
+    first_tokens = []
+    for kind, queries in (("general", GENERAL_QUERIES), ("automation", AUTOMATION_QUERIES)):
+        for i in range(args.runs):
+            # A distinct question each run, so the response cache never answers
+            query = f"{queries[i % len(queries)]} (run {i})"
+            start = time.perf_counter()
+            first = []
+            def on_token(chunk, first=first):
+                if not first:
+                    first.append((time.perf_counter() - start) * 1000)
+            recorder.time(f"respond_{kind}", lambda: screen.respond_to_user_query(text, query, on_token=on_token))
+            first_tokens.extend(first)
+    if first_tokens:
+        recorder.samples["respond_first_token"] = first_tokens
+    return text
+
+
+def bench_ui(recorder, args, indexes, screen_text):
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError as e:
+        recorder.skip("ui", f"missing {e.name}")
+        return
+    app = QApplication.instance() or QApplication([])
+    import ui
+    ui.QMessageBox.question = staticmethod(lambda *a, **k: ui.QMessageBox.No)
+    chat = ui.FloatingChat()
+
+    def ask(query):
+        chat.input_field.setText(query)
+        chat.handle_user_query()
+        while chat.tasks.is_busy("query"):
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+
+    chat.screen_text = screen_text
+    for i in range(args.runs):
+        recorder.time("ui_screen_query", lambda: ask(f"{GENERAL_QUERIES[i % len(GENERAL_QUERIES)]} (ui run {i})"))
+    if indexes:
+        chat.document_mode = True
+        chat.document_indexes = list(indexes)
+        for i in range(args.runs):
+            recorder.time("ui_document_query", lambda: ask(f"what does the contract renewal clause say (ui run {i})"))
+    chat.tasks.cancel_all()
+    chat.stall_monitor.stop()
+    recorder.counters["ui_stalls"] = chat.stall_monitor.summary()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def check(result, baseline_path, max_regression, thresholds_path):
+    """Returns the failed checks: stages slower than the baseline or above absolute thresholds."""
+    failures = []
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+        for stage, stats in result["stages"].items():
+            if stage not in baseline:
+                continue
+            before, after = baseline[stage]["median_ms"], stats["median_ms"]
+            if after > before * (1 + max_regression) and after - before > NOISE_FLOOR_MS:
+                failures.append(f"{stage}: {after:.1f} ms vs. {before:.1f} ms baseline (+{after / before - 1:.0%})")
+    if thresholds_path:
+        with open(thresholds_path, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+        for stage, limit in thresholds.items():
+            stats = result["stages"].get(stage)
+            if stats is not None and stats["median_ms"] > limit:
+                failures.append(f"{stage}: {stats['median_ms']:.1f} ms > {limit} ms threshold")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="document size multiplier")
+    parser.add_argument("--formats", nargs="*", help="document formats (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions of each timed stage")
+    parser.add_argument("--queries", type=int, default=20, help="distinct retrieval queries")
+    parser.add_argument("--screen", type=int, nargs=2, default=[1280, 800], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--first-token", type=float, default=0.3, help="stub LLM first-token delay (s)")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="stub LLM delay per chunk (s)")
+    parser.add_argument("--embed-ms", type=float, default=20, help="fake embedder delay per batch (ms)")
+    parser.add_argument("--ocr-ms-per-mp", type=float, default=400, help="canned OCR cost per megapixel (ms)")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["documents", "screen", "ui"])
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown vs. the baseline")
+    parser.add_argument("--thresholds", help="JSON file of {stage: max median ms}")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="flowsync_e2e_")
+    configure_environment(work_dir)
+    llm, embedder = install_fakes(args)
+    recorder = Recorder()
+    indexes, screen_text = [], ""
+    if "documents" not in args.skip:
+        indexes = bench_documents(recorder, args, work_dir)
+    if "screen" not in args.skip:
+        screen_text = bench_screen(recorder, args)
+    if "ui" not in args.skip:
+        bench_ui(recorder, args, indexes, screen_text)
+    recorder.counters["llm_calls"] = llm.stats["calls"]
+
+    result = {
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "baseline", "thresholds")},
+        "stages": recorder.summary(),
+        "counters": recorder.counters,
+        "skipped": recorder.skipped,
+    }
+    print(f"{'stage':<28}{'runs':>6}{'median ms':>12}{'p95 ms':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<28}{stats['runs']:>6}{stats['median_ms']:>12.2f}{stats['p95_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    failures = recorder.failures + check(result, args.baseline, args.max_regression, args.thresholds)
+    if failures:
+        sys.exit("Failed checks:\n" + "\n".join(f"- {failure}" for failure in failures))
+
+
+if __name__ == "__main__":
+    main()
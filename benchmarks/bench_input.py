@@ -0,0 +1,142 @@
+"""Input benchmark: idle CPU and hotkey-to-handler latency, polling vs. event-driven.
+
+"polling" mirrors the old launcher loop (check `is_pressed` every
+--poll-ms); "events" uses HotkeyManager. Key presses are synthetic by
+default; with --qt the handler runs on the Qt main thread through the
+launcher's HotkeyBridge, as the real UI does. Run from the repository root:
+
+    python benchmarks/bench_input.py --idle-seconds 5 --presses 20 --json input.json
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from input_events import HotkeyManager, SyntheticBackend
+
+HOTKEY = "ctrl+alt+a"
+
+
+class Polling:
+    def __init__(self, backend, period):
+        self.backend = backend
+        self.period = period
+        self.handled = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        was_pressed = False
+        while not self._stop.is_set():
+            if self.backend.is_pressed(HOTKEY):
+                if not was_pressed:
+                    was_pressed = True
+                    self.handled.put(time.perf_counter())
+            else:
+                was_pressed = False
+            time.sleep(self.period)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Events:
+    def __init__(self, backend, qt_app=None):
+        self.handled = queue.Queue()
+        self.hotkeys = HotkeyManager(backend, debounce=0)
+        if qt_app is None:
+            self.hotkeys.register(HOTKEY, lambda: self.handled.put(time.perf_counter()))
+        else:
+            from hotkey_launcher import HotkeyBridge
+            self.bridge = HotkeyBridge()
+            self.bridge.triggered.connect(lambda: self.handled.put(time.perf_counter()))
+            self.hotkeys.register(HOTKEY, self.bridge.triggered.emit)
+
+    def close(self):
+        self.hotkeys.unregister_all()
+
+
+def wait_for(handled, qt_app, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if qt_app is not None:
+            qt_app.processEvents()
+        try:
+            return handled.get(timeout=0.001 if qt_app is not None else timeout)
+        except queue.Empty:
+            continue
+    return None
+
+
+def measure(name, make, backend, args, qt_app):
+    listener = make()
+    try:
+        # Idle: nothing pressed, only the listener's own cost counts
+        cpu = time.process_time()
+        time.sleep(args.idle_seconds)
+        idle_cpu = (time.process_time() - cpu) / args.idle_seconds * 100
+
+        latencies = []
+        for _ in range(args.presses):
+            time.sleep(random.uniform(0.05, 0.25))
+            pressed = time.perf_counter()
+            backend.press(HOTKEY)
+            handled = wait_for(listener.handled, qt_app)
+            # Hold the key long enough for the poller to see it, like a human press
+            time.sleep(max(args.poll_ms / 1000 * 1.5 - (time.perf_counter() - pressed), 0))
+            backend.release(HOTKEY)
+            if handled is not None:
+                latencies.append((handled - pressed) * 1000)
+    finally:
+        listener.close()
+    latencies.sort()
+    return {
+        "listener": name,
+        "idle_cpu_percent": idle_cpu,
+        "latency_p50_ms": statistics.median(latencies) if latencies else None,
+        "latency_max_ms": latencies[-1] if latencies else None,
+        "missed": args.presses - len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--presses", type=int, default=20)
+    parser.add_argument("--poll-ms", type=float, default=100, help="polling period of the old loop")
+    parser.add_argument("--qt", action="store_true", help="deliver events through the Qt main thread")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    qt_app = None
+    if args.qt:
+        from PyQt5.QtWidgets import QApplication
+        qt_app = QApplication.instance() or QApplication(sys.argv)
+
+    backend = SyntheticBackend()
+    results = [
+        measure("polling", lambda: Polling(backend, args.poll_ms / 1000), backend, args, qt_app),
+        measure("events", lambda: Events(backend, qt_app), backend, args, qt_app),
+    ]
+    print(f"{'listener':<10}{'idle CPU %':>12}{'p50 ms':>10}{'max ms':>10}{'missed':>8}")
+    for r in results:
+        p50 = f"{r['latency_p50_ms']:.2f}" if r["latency_p50_ms"] is not None else "-"
+        worst = f"{r['latency_max_ms']:.2f}" if r["latency_max_ms"] is not None else "-"
+        print(f"{r['listener']:<10}{r['idle_cpu_percent']:>12.3f}{p50:>10}{worst:>10}{r['missed']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
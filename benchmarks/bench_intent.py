@@ -0,0 +1,102 @@
+"""Intent benchmark: accuracy and latency of the local classifier against the LLM.
+
+Runs the labelled queries in intent_testset.jsonl through the local
+classifier and, with --llm, through the LLM prompt as well (needs
+OPENAI_API_KEY; the response cache is bypassed). Queries below the
+confidence threshold go to the LLM in the app, so the offline gate is
+the number answered locally with the wrong label. Run from the
+repository root:
+
+    python benchmarks/bench_intent.py --max-confident-misses 0 --json intent.json
+    python benchmarks/bench_intent.py --llm --min-accuracy 0.9
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TESTSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_testset.jsonl")
+
+
+def load_testset(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(name, classify, cases):
+    correct, latencies, misses = 0, [], []
+    for case in cases:
+        start = time.perf_counter()
+        label = classify(case["query"])
+        latencies.append(time.perf_counter() - start)
+        if label == case["label"]:
+            correct += 1
+        else:
+            misses.append(case["query"])
+    latencies.sort()
+    return {
+        "classifier": name,
+        "accuracy": correct / len(cases),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--testset", default=TESTSET)
+    parser.add_argument("--llm", action="store_true", help="also measure the LLM classifier")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--min-accuracy", type=float, help="fail if the hybrid classifier is less accurate")
+    parser.add_argument("--max-confident-misses", type=int,
+                        help="fail if more queries are answered locally with the wrong label")
+    args = parser.parse_args()
+
+    import intent_classifier
+    cases = load_testset(args.testset)
+    results = [run("local", lambda q: intent_classifier.classify(q)[0], cases)]
+
+    fallbacks, confident_misses = 0, []
+    for case in cases:
+        label, confidence, _ = intent_classifier.classify(case["query"])
+        if confidence < intent_classifier.CONFIDENCE_THRESHOLD:
+            fallbacks += 1
+        elif label != case["label"]:
+            confident_misses.append(case["query"])
+    results[0]["confident_misses"] = confident_misses
+    if args.llm:
+        from screen import get_llm_general, classify_query_intent_llm
+        from response_cache import get_response_cache
+        get_llm_general()
+        cache = get_response_cache()
+        cache.get = lambda *a, **kw: None
+        cache.put = lambda *a, **kw: None
+        results.append(run("llm", classify_query_intent_llm, cases))
+        from screen import classify_query_intent
+        results.append(run("hybrid", classify_query_intent, cases))
+
+    print(f"{len(cases)} queries, {fallbacks} below the local confidence threshold "
+          f"({intent_classifier.CONFIDENCE_THRESHOLD}) would go to the LLM, "
+          f"{len(confident_misses)} would be answered locally with the wrong label")
+    for query in confident_misses:
+        print(f"    wrong without the LLM: {query}")
+    print(f"{'classifier':<12}{'accuracy':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['classifier']:<12}{r['accuracy']:>10.1%}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}")
+        for query in r["misses"]:
+            print(f"    missed: {query}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    gate = results[-1]
+    failed = args.min_accuracy is not None and gate["accuracy"] < args.min_accuracy
+    failed |= args.max_confident_misses is not None and len(confident_misses) > args.max_confident_misses
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Speculative execution benchmark: latency and generated output per mode, with stub LLMs.
+
+The LLMs are replaced by SlowChatModel stubs with injected delays and the
+local intent classifier is bypassed by default, so every query pays for an
+LLM classification as in the worst case. Run from the repository root:
+
+    python benchmarks/bench_speculative.py --first-token 0.6 --json speculative.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    ("open notepad and type my shopping list", "automation"),
+    ("what does this error message mean", "general"),
+    ("send the report to the team channel", "automation"),
+    ("summarize the article on screen", "general"),
+]
+SCREEN = "Inbox - Outlook\nReport.docx\nError 0x80070005: Access is denied"
+GENERAL_ANSWER = "Here is a short explanation of what is on your screen. " * 6
+AUTOMATION_ANSWER = json.dumps({
+    "instructions": ["Open the Start menu", "Type the app name", "Press Enter"],
+    "automation_code": "pyautogui.press('win')\npyautogui.write('notepad')\npyautogui.press('enter')\n" * 4,
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="*", default=["off", "fallback", "always"])
+    parser.add_argument("--first-token", type=float, default=0.5, help="stub LLM first-token delay (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="stub LLM delay per chunk (s)")
+    parser.add_argument("--local-intent", action="store_true", help="keep the local intent classifier")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    import screen
+    import intent_classifier
+    import response_cache
+    from fakes import SlowChatModel
+
+    expected = {}
+
+    def reply(prompt):
+        if "Classify the user's query" in prompt:
+            return expected["label"]
+        return GENERAL_ANSWER if "smart and helpful assistant" in prompt else AUTOMATION_ANSWER
+
+    llm = {"first_token_delay": args.first_token, "token_delay": args.token_delay}
+    screen._llms["general"] = SlowChatModel(reply=reply, **llm)
+    screen._llms["code"] = SlowChatModel(reply=reply, **llm)
+    cache_dir = tempfile.mkdtemp(prefix="flowsync_bench_")
+    response_cache._response_cache = response_cache.ResponseCache(path=os.path.join(cache_dir, "responses.sqlite3"))
+    if not args.local_intent:
+        intent_classifier.CONFIDENCE_THRESHOLD = 1.01
+
+    results = []
+    for mode in args.modes:
+        for model in screen._llms.values():
+            model.stats.update(calls=0, chunks=0)
+        latencies, first_tokens = [], []
+        for query, label in QUERIES:
+            expected["label"] = label
+            response_cache._response_cache.clear()
+            screen.conversation_history.clear()
+            first = []
+            start = time.perf_counter()
+            screen.respond_to_user_query(SCREEN, query, on_token=lambda _: first or first.append(time.perf_counter()),
+                                         mode=mode)
+            latencies.append(time.perf_counter() - start)
+            first_tokens.append((first[0] if first else time.perf_counter()) - start)
+        # Let cancelled branches notice and stop before reading the counters
+        time.sleep(args.first_token + 0.1)
+        results.append({
+            "mode": mode,
+            "mean_s": statistics.mean(latencies),
+            "first_token_s": statistics.mean(first_tokens),
+            "llm_calls": sum(m.stats["calls"] for m in screen._llms.values()),
+            "chunks": sum(m.stats["chunks"] for m in screen._llms.values()),
+        })
+
+    print(f"{len(QUERIES)} queries, first token {args.first_token}s, "
+          f"{'local' if args.local_intent else 'LLM'} intent classification")
+    print(f"{'mode':<10}{'mean s':>10}{'1st tok s':>11}{'LLM calls':>11}{'chunks':>9}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['mean_s']:>10.3f}{r['first_token_s']:>11.3f}{r['llm_calls']:>11}{r['chunks']:>9}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Startup benchmark: import time and resident memory per module.
+
+Each module is imported in a fresh interpreter so results don't leak
+between measurements. The probes run in a scratch directory, so modules
+that write files on import (e.g. screen's assistant.log) leave the
+repository clean. Run from the repository root:
+
+    python benchmarks/bench_startup.py --json startup.json --max-seconds 1.5 --max-rss-mb 250
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["lazy_imports", "tracing", "clients", "context_builder", "chunker", "lexical_index", "embedding_service",
+           "index_cache", "ingest", "tabular", "retrieval", "input_events", "open_documents", "detect_open",
+           "screen", "workers", "ui", "hotkey_launcher"]
+
+PROBE = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[2])
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+before = rss_mb()
+start = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "rss_mb": rss_mb(), "rss_delta_mb": rss_mb() - before}))
+"""
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="flowsync_startup_") as scratch:
+            proc = subprocess.run([sys.executable, "-c", PROBE, module, ROOT], cwd=scratch, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["seconds"])
+    return {"module": module, **best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-seconds", type=float, help="fail if any import is slower")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if any import leaves RSS higher")
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeat) for module in args.modules]
+    failed = False
+    print(f"{'module':<20}{'import s':>10}{'RSS MB':>10}{'+MB':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<20}  error: {r['error']}")
+            continue
+        over = (args.max_seconds is not None and r["seconds"] > args.max_seconds) or \
+               (args.max_rss_mb is not None and r["rss_mb"] > args.max_rss_mb)
+        failed = failed or over
+        print(f"{r['module']:<20}{r['seconds']:>10.3f}{r['rss_mb']:>10.1f}{r['rss_delta_mb']:>8.1f}{'  <-- over budget' if over else ''}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Synthetic documents and screens for the offline benchmarks.
+
+Every generator is seeded, so the same arguments always produce the same
+files. PDFs are written by hand; DOCX, XLSX and PPTX need the same
+libraries the app reads them with and are skipped when those are missing.
+"""
+import os
+import csv
+import json
+import random
+
+VOCABULARY = (
+    "invoice quarterly revenue forecast region customer contract renewal clause liability warranty "
+    "shipment supplier inventory margin budget variance approval deadline milestone project risk "
+    "compliance audit policy employee onboarding training schedule meeting agenda summary action "
+    "owner status report dashboard metric target growth churn retention pricing discount order"
+).split()
+REGIONS = ["North", "South", "East", "West", "Central"]
+PRODUCTS = ["Widget", "Gadget", "Sprocket", "Gizmo", "Doohickey", "Thingamajig"]
+
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng, sentences=5):
+    return " ".join(sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def sales_rows(rng, count):
+    for i in range(count):
+        yield [f"ORD-{i:06d}", rng.choice(REGIONS), rng.choice(PRODUCTS), rng.randint(1, 50),
+               round(rng.uniform(5, 500), 2)]
+
+
+SALES_HEADER = ["Order", "Region", "Product", "Quantity", "Amount"]
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, rng, scale):
+    """A text PDF with Helvetica pages of 40 lines; readable by PyPDF2 like any exported report."""
+    pages = max(1, int(10 * scale))
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        lines = " ".join(f"({_pdf_escape(sentence(rng))}) '" for _ in range(40))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET".encode("latin-1")
+        page_id, content_id = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_id} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {content_id} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def write_docx(path, rng, scale):
+    import docx
+    document = docx.Document()
+    for i in range(max(1, int(60 * scale))):
+        if i % 10 == 0:
+            document.add_heading(sentence(rng, 4), level=2)
+        document.add_paragraph(paragraph(rng))
+    document.save(path)
+
+
+def write_xlsx(path, rng, scale):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    for name in ("Q1", "Q2"):
+        sheet = workbook.create_sheet(name)
+        sheet.append(SALES_HEADER)
+        for row in sales_rows(rng, max(1, int(1000 * scale))):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(path, rng, scale):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SALES_HEADER)
+        writer.writerows(sales_rows(rng, max(1, int(2000 * scale))))
+
+
+def write_pptx(path, rng, scale):
+    import pptx
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]
+    for _ in range(max(1, int(15 * scale))):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = sentence(rng, 4)
+        slide.placeholders[1].text = "\n".join(sentence(rng) for _ in range(5))
+    presentation.save(path)
+
+
+def write_json(path, rng, scale):
+    records = [{"id": i, "title": sentence(rng, 5), "owner": rng.choice(REGIONS), "notes": paragraph(rng, 2)}
+               for i in range(max(1, int(300 * scale)))]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"records": records}, f)
+
+
+def write_txt(path, rng, scale):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(max(1, int(200 * scale))):
+            f.write(paragraph(rng) + "\n\n")
+
+
+WRITERS = {
+    "pdf": write_pdf,
+    "docx": write_docx,
+    "xlsx": write_xlsx,
+    "csv": write_csv,
+    "pptx": write_pptx,
+    "json": write_json,
+    "txt": write_txt,
+}
+
+
+def make_corpus(directory, scale=1.0, formats=None, seed=7):
+    """Writes one document per format; returns ({extension: path}, {extension: reason skipped})."""
+    os.makedirs(directory, exist_ok=True)
+    paths, skipped = {}, {}
+    for extension in formats or WRITERS:
+        path = os.path.join(directory, f"sample_{extension}.{extension}")
+        try:
+            WRITERS[extension](path, random.Random(f"{seed}:{extension}"), scale)
+        except ImportError as e:
+            skipped[extension] = f"missing {e.name}"
+            continue
+        paths[extension] = path
+    return paths, skipped
+
+
+class SyntheticScreen:
+    """A screen of text lines drawn as bands whose red channel encodes the line number.
+
+    `fakes.CannedOCRReader(screen.lines)` reads them back with exact boxes,
+    so the incremental OCR path runs on real frame diffs. `type()` edits
+    one line, like a user typing into a field.
+    """
+
+    LINE_HEIGHT = 24
+    CHAR_WIDTH = 7
+
+    def __init__(self, width=1280, height=800, seed=7):
+        import numpy as np
+        self.np = np
+        self.width = width
+        self.height = height
+        rng = random.Random(seed)
+        count = min(200, (height - 20) // self.LINE_HEIGHT)
+        self.lines = {i: sentence(rng, rng.randint(3, 12))[:(width - 40) // self.CHAR_WIDTH] for i in range(count)}
+
+    def type(self, line, text):
+        self.lines[line] = text[:(self.width - 40) // self.CHAR_WIDTH]
+
+    def frame(self):
+        frame = self.np.full((self.height, self.width, 3), 255, dtype="uint8")
+        for i, text in self.lines.items():
+            y = 10 + i * self.LINE_HEIGHT
+            frame[y:y + 14, 20:20 + len(text) * self.CHAR_WIDTH] = (i + 10, 40, 40)
+        return frame
@@ -0,0 +1,145 @@
+"""Stand-ins for the remote services, with injectable latency, for benchmarks."""
+import json
+import time
+import base64
+import threading
+from array import array
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from pydantic import Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class SlowChatModel(BaseChatModel):
+    """Chat model that answers with `reply(prompt)` after a first-token delay, streaming in small chunks.
+
+    `stats` counts calls and generated chunks, so cancelled streams show up as saved output.
+    """
+    reply: Callable[[str], str]
+    first_token_delay: float = 0.5
+    token_delay: float = 0.005
+    chunk_chars: int = 4
+    stats: dict = Field(default_factory=lambda: {"calls": 0, "chunks": 0})
+    lock: object = Field(default_factory=threading.Lock, exclude=True)
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._count("calls")
+        text = self.reply("\n".join(str(message.content) for message in messages))
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(text), self.chunk_chars):
+            if start:
+                time.sleep(self.token_delay)
+            self._count("chunks")
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + self.chunk_chars]))
+
+
+class CannedOCRReader:
+    """EasyOCR stand-in for `corpora.SyntheticScreen` frames, with a read cost per megapixel.
+
+    Each text band's red channel names its line in `lines`, so crops come
+    back with the right text and boxes relative to the crop, like readtext.
+    """
+
+    def __init__(self, lines, seconds_per_megapixel=0.4):
+        self.lines = lines
+        self.seconds_per_megapixel = seconds_per_megapixel
+        self.stats = {"calls": 0, "megapixels": 0.0}
+
+    def readtext(self, image, detail=1):
+        height, width = image.shape[:2]
+        self.stats["calls"] += 1
+        self.stats["megapixels"] += height * width / 1e6
+        time.sleep(self.seconds_per_megapixel * height * width / 1e6)
+        text_pixels = image[..., 1] == 40
+        results = []
+        for value in np.unique(image[..., 0][text_pixels]):
+            text = self.lines.get(int(value) - 10)
+            if text is None:
+                continue
+            ys, xs = np.nonzero(text_pixels & (image[..., 0] == value))
+            x0, y0, x1, y1 = int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+            results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, 0.99))
+        return results
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+        if self.path.endswith("/embeddings"):
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            vector = [0.1] * self.server.dimensions
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array("f", vector).tobytes()).decode()
+            payload = {
+                "object": "list", "model": body.get("model", ""),
+                "data": [{"object": "embedding", "index": i, "embedding": vector} for i in range(len(inputs))],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        else:
+            payload = {
+                "id": "chatcmpl-standin", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.server.reply}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInOpenAIServer(ThreadingHTTPServer):
+    """Local OpenAI-compatible endpoint (chat completions and embeddings) with a fixed server delay.
+
+    Point clients at `url` (e.g. FLOWSYNC_OPENAI_BASE_URL) to measure client-side overhead offline.
+    `stats` counts accepted connections and requests.
+    """
+    daemon_threads = True
+
+    def __init__(self, delay=0.0, reply="ok", dimensions=8, port=0):
+        super().__init__(("127.0.0.1", port), _StandInHandler)
+        self.delay = delay
+        self.reply = reply
+        self.dimensions = dimensions
+        self.lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,100 @@
+import os
+import re
+from context_builder import get_encoder
+
+# === Settings ===
+CHUNK_TOKENS = int(os.getenv("FLOWSYNC_CHUNK_TOKENS", "250"))             # ~1000 characters of English
+CHUNK_OVERLAP_TOKENS = int(os.getenv("FLOWSYNC_CHUNK_OVERLAP_TOKENS", "50"))
+TOKENIZER_MODEL = "text-embedding-3-large"
+CHARS_PER_TOKEN = 4        # estimate when tiktoken is unavailable
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+SECTION_LABEL = re.compile(r"^--- .+ ---$")   # "--- Sheet: Q1 ---" from ingest
+
+
+class TokenChunker:
+    """Packs lines into chunks of at most `chunk_tokens` tokens in a single pass.
+
+    Lines (paragraphs, table rows, slide text) stay whole, indentation
+    included, unless one alone exceeds the budget; it is then split at
+    sentences, and finally into token windows. A section label line
+    ("--- Sheet: Q1 ---") is repeated at the top of every chunk of its
+    section while it takes at most half the budget, and overlap is carried
+    as whole trailing lines. Works as the `splitter` of `ingest.iter_chunks`
+    (`split_text`), which chunks each section separately, so a section
+    boundary (a DOCX heading, a page) always starts a chunk.
+    """
+
+    def __init__(self, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, model=TOKENIZER_MODEL):
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoder = get_encoder(model)
+
+    @property
+    def tokenizer(self):
+        """How tokens are counted ("cl100k_base", or "len/4" without tiktoken); part of index cache keys."""
+        return self.encoder.name if self.encoder is not None else f"len/{CHARS_PER_TOKEN}"
+
+    def count(self, text):
+        if self.encoder is None:
+            return len(text) // CHARS_PER_TOKEN + 1
+        return len(self.encoder.encode_ordinary(text))
+
+    def _counts(self, lines):
+        if self.encoder is None:
+            return [len(line) // CHARS_PER_TOKEN + 1 for line in lines]
+        return [len(tokens) for tokens in self.encoder.encode_ordinary_batch(lines)]
+
+    def _windows(self, text, budget):
+        """Token windows of `budget` tokens with the configured overlap."""
+        stride = max(budget - self.overlap_tokens, 1)
+        if self.encoder is None:
+            # count() rounds up, so a window of budget - 1 estimated tokens counts as `budget`
+            size, step = max(budget - 1, 1) * CHARS_PER_TOKEN, stride * CHARS_PER_TOKEN
+            starts = range(0, max(len(text) - size, 0) + step, step)
+            return [(text[start:start + size], budget) for start in starts]
+        tokens = self.encoder.encode_ordinary(text)
+        starts = range(0, max(len(tokens) - budget, 0) + stride, stride)
+        return [(self.encoder.decode(tokens[start:start + budget]), len(tokens[start:start + budget])) for start in starts]
+
+    def _pieces(self, line, tokens, budget):
+        if tokens <= budget:
+            return [(line, tokens)]
+        pieces = []
+        for sentence in SENTENCE_END.split(line):
+            size = self.count(sentence)
+            pieces.extend([(sentence, size)] if size <= budget else self._windows(sentence, budget))
+        return pieces
+
+    def split_text(self, text):
+        lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+        if not lines:
+            return []
+        label = lines.pop(0) if SECTION_LABEL.match(lines[0]) else ""
+        if not lines:
+            return []
+        header, budget = [], self.chunk_tokens
+        if label and 2 * (self.count(label) + 1) <= self.chunk_tokens:
+            # Longer labels are dropped rather than crowd out the rows; chunk metadata still names the sheet
+            header, budget = [label], self.chunk_tokens - self.count(label) - 1
+
+        chunks, current, size = [], [], 0
+        for line, tokens in zip(lines, self._counts(lines)):
+            for piece, tokens in self._pieces(line, tokens, budget):
+                tokens += 1   # the newline joining it to the chunk
+                if current and size + tokens > budget:
+                    chunks.append("\n".join(header + [text for text, _ in current]))
+                    # Carry whole trailing lines as overlap, as many as fit
+                    carried, carried_size = [], 0
+                    for entry in reversed(current):
+                        if carried_size + entry[1] > self.overlap_tokens or carried_size + entry[1] + tokens > budget:
+                            break
+                        carried.append(entry)
+                        carried_size += entry[1]
+                    current, size = carried[::-1], carried_size
+                current.append((piece, tokens))
+                size += tokens
+        chunks.append("\n".join(header + [text for text, _ in current]))
+        return chunks
@@ -0,0 +1,155 @@
+import os
+import asyncio
+import weakref
+import threading
+from lazy_imports import lazy_import
+
+httpx = lazy_import("httpx")
+
+# === Settings ===
+# Point every OpenAI client at another endpoint, e.g. a local stand-in for offline measurements
+OPENAI_BASE_URL = os.getenv("FLOWSYNC_OPENAI_BASE_URL") or None
+REQUEST_TIMEOUT = float(os.getenv("FLOWSYNC_REQUEST_TIMEOUT", "60"))     # seconds per request
+CONNECT_TIMEOUT = float(os.getenv("FLOWSYNC_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.getenv("FLOWSYNC_MAX_RETRIES", "2"))
+MAX_CONNECTIONS = int(os.getenv("FLOWSYNC_MAX_CONNECTIONS", "20"))
+KEEPALIVE_SECONDS = 60
+
+DOCUMENT_QA_PROMPT = (
+    "Answer the question based on the numbered sources below, citing them like [1].\n\n"
+    "{context}\n\nQuestion: {question}"
+)
+
+_lock = threading.RLock()
+_http = {}
+_chat_models = {}
+_embedding_clients = {}
+_chains = {}
+
+
+def _timeout():
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def _limits():
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_SECONDS)
+
+
+def get_http_client():
+    """Process-wide HTTP/1.1 keep-alive pool, so TLS handshakes happen once per host, not per request."""
+    with _lock:
+        if "sync" not in _http:
+            _http["sync"] = httpx.Client(timeout=_timeout(), limits=_limits())
+        return _http["sync"]
+
+
+def _loop_local_client_class():
+    class LoopLocalAsyncClient(httpx.AsyncClient):
+        """Sends through one pooled AsyncClient per event loop.
+
+        An AsyncClient's connections belong to the loop that opened them, so
+        a single shared one fails ("Event loop is closed", "attached to a
+        different loop") once worker threads run their own loops. This
+        client only builds requests; `send` picks the running loop's pool.
+        """
+
+        def __init__(self):
+            super().__init__(timeout=_timeout(), limits=_limits())
+            self._pools = weakref.WeakKeyDictionary()
+            self._pools_lock = threading.Lock()
+
+        def pool(self):
+            loop = asyncio.get_running_loop()
+            with self._pools_lock:
+                if loop not in self._pools:
+                    self._pools[loop] = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+                return self._pools[loop]
+
+        async def send(self, request, **kwargs):
+            return await self.pool().send(request, **kwargs)
+
+        async def aclose(self):
+            loop = asyncio.get_running_loop()
+            with self._pools_lock:
+                pool = self._pools.pop(loop, None)
+            if pool is not None:
+                await pool.aclose()
+
+    return LoopLocalAsyncClient
+
+
+def get_async_http_client():
+    """Async counterpart of `get_http_client`, used by `ainvoke`/`astream` on the shared models.
+
+    Shared by every model, but connections are pooled per event loop.
+    """
+    with _lock:
+        if "async" not in _http:
+            _http["async"] = _loop_local_client_class()()
+        return _http["async"]
+
+
+def get_chat_model(model, temperature=0.2, api_key=None):
+    """Returns the shared ChatOpenAI for (model, temperature), wired to the pooled HTTP clients."""
+    key = (model, temperature, api_key)
+    with _lock:
+        if key not in _chat_models:
+            from langchain_openai import ChatOpenAI
+            _chat_models[key] = ChatOpenAI(
+                model=model, temperature=temperature, api_key=api_key, base_url=OPENAI_BASE_URL,
+                timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                http_client=get_http_client(), http_async_client=get_async_http_client(),
+            )
+        return _chat_models[key]
+
+
+def get_embeddings_client(model, api_key=None, max_retries=0):
+    """Returns the shared OpenAIEmbeddings for a model; retries default to 0 as EmbeddingService retries itself."""
+    key = (model, api_key, max_retries)
+    with _lock:
+        if key not in _embedding_clients:
+            from langchain_openai import OpenAIEmbeddings
+            _embedding_clients[key] = OpenAIEmbeddings(
+                model=model, openai_api_key=api_key, base_url=OPENAI_BASE_URL,
+                timeout=REQUEST_TIMEOUT, max_retries=max_retries,
+                http_client=get_http_client(), http_async_client=get_async_http_client(),
+            )
+        return _embedding_clients[key]
+
+
+def get_chain(key, build):
+    """Returns the chain cached under `key`, calling `build()` the first time."""
+    with _lock:
+        if key not in _chains:
+            _chains[key] = build()
+        return _chains[key]
+
+
+def get_document_qa_chain(model, api_key=None, temperature=0.2):
+    """Prebuilt `prompt | llm | parser` chain; invoke or stream it with {"context", "question"}."""
+    def build():
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+        prompt = ChatPromptTemplate.from_template(DOCUMENT_QA_PROMPT)
+        return prompt | get_chat_model(model, temperature, api_key) | StrOutputParser()
+    return get_chain(("document_qa", model, temperature, api_key), build)
+
+
+def close():
+    """Closes the pooled connections and forgets the models built on them (the async pool needs `aclose`)."""
+    with _lock:
+        client = _http.pop("sync", None)
+        _chat_models.clear()
+        _embedding_clients.clear()
+        _chains.clear()
+    if client is not None:
+        client.close()
+
+
+async def aclose():
+    """Closes the running event loop's async connections."""
+    with _lock:
+        client = _http.get("async")
+    if client is not None:
+        await client.aclose()
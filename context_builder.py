@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# === Settings ===
+CONTEXT_TOKEN_BUDGET = int(os.getenv("FLOWSYNC_CONTEXT_TOKENS", "1500"))
+MMR_LAMBDA = 0.7              # 1 = pure relevance, 0 = pure diversity
+DUPLICATE_SIMILARITY = 0.95   # candidates at least this similar to a selected chunk are dropped
+MIN_OVERLAP_CHARS = 20        # shortest shared prefix/suffix treated as splitter overlap
+MIN_CHUNK_CHARS = 40          # what is left of a chunk after trimming overlap must be this long
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(model):
+    """The tiktoken encoding for `model` (cached), or None when tiktoken is unavailable.
+
+    tiktoken downloads its BPE files on first use, so offline without a
+    cached copy loading fails; callers then estimate tokens for the rest
+    of the process, consistently.
+    """
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken
+            except ImportError:
+                _encoders[model] = None
+                return None
+            try:
+                try:
+                    _encoders[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoders[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"⚠️ Could not load the tokenizer for {model}, estimating tokens instead: {e}")
+                _encoders[model] = None
+        return _encoders[model]
+
+
+def count_tokens(text, model=TOKENIZER_MODEL):
+    """Tokens in `text` for `model` (tiktoken), or a len/4 estimate when tiktoken is unavailable."""
+    encoder = get_encoder(model)
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def cite(metadata):
+    """Human-readable source of a chunk, e.g. "report.pdf p. 3" or "data.xlsx Sales rows 1-200"."""
+    parts = [os.path.basename(metadata.get("source", "")) or "document"]
+    if "page" in metadata:
+        parts.append(f"p. {metadata['page']}")
+    if "slide" in metadata:
+        parts.append(f"slide {metadata['slide']}")
+    if "sheet" in metadata:
+        parts.append(str(metadata["sheet"]))
+    for key in ("rows", "lines", "paragraphs"):
+        if key in metadata:
+            parts.append(f"{key} {metadata[key]}")
+    return " ".join(parts)
+
+
+def _shared_edge(first, second):
+    """Length of the longest suffix of `first` that is also a prefix of `second`."""
+    head = second[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    start = first.find(head)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(head, start + 1)
+    return 0
+
+
+def trim_overlap(selected, text):
+    """Removes text shared with an already selected chunk's start or end (the splitter's overlap)."""
+    for other in selected:
+        size = _shared_edge(other, text)
+        if size:
+            text = text[size:].strip()
+        size = _shared_edge(text, other)
+        if size:
+            text = text[:-size].strip()
+    return text
+
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _similarity_matrix(texts, vectors):
+    """Pairwise cosine similarity of the vectors, or word-set Jaccard similarity without them."""
+    if vectors is not None:
+        matrix = np.asarray(vectors, dtype="float32")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        return matrix @ matrix.T
+    words = [_words(text) for text in texts]
+    return [[len(a & b) / (len(a | b) or 1) for b in words] for a in words]
+
+
+def _relevance(texts, query_vector, vectors):
+    if vectors is None or query_vector is None:
+        # Candidates arrive ranked; keep that order as relevance
+        return [1 - i / max(len(texts), 1) for i in range(len(texts))]
+    matrix = np.asarray(vectors, dtype="float32")
+    query = np.asarray(query_vector, dtype="float32")
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1)
+    return list(matrix @ query / np.where(norms == 0, 1, norms))
+
+
+def mmr_order(texts, query_vector=None, vectors=None, lambda_mult=MMR_LAMBDA, duplicate=DUPLICATE_SIMILARITY):
+    """Orders candidates by maximal marginal relevance, dropping near-duplicates.
+
+    Returns indexes into `texts`. Without vectors, rank order stands in for
+    relevance and word overlap for similarity.
+    """
+    if not texts:
+        return []
+    relevance = _relevance(texts, query_vector, vectors)
+    similarity = _similarity_matrix(texts, vectors)
+    remaining = list(range(len(texts)))
+    order = []
+    while remaining:
+        best, best_score = None, None
+        for i in remaining:
+            redundancy = max((similarity[i][j] for j in order), default=0.0)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        remaining.remove(best)
+        if not any(similarity[best][j] >= duplicate for j in order):
+            order.append(best)
+    return order
+
+
+def build_context(docs, query_vector=None, vectors=None, budget=CONTEXT_TOKEN_BUDGET, model=TOKENIZER_MODEL):
+    """Packs retrieved chunks into a numbered, cited context within `budget` tokens.
+
+    Exact and near-duplicate chunks are dropped, overlap with chunks already
+    taken is trimmed, and chunks are taken in MMR order until the budget is
+    spent. Returns a dict with "text", "citations" ([{"n", "source"}]),
+    "tokens" and "dropped" (candidates left out).
+    """
+    texts = [doc.page_content.strip() for doc in docs]
+    selected, citations, blocks = [], [], []
+    tokens = 0
+    for i in mmr_order(texts, query_vector, vectors):
+        text = trim_overlap(selected, texts[i])
+        # Only what trimming left over must be MIN_CHUNK_CHARS long; short chunks of their own are kept
+        if not text or (text != texts[i] and len(text) < MIN_CHUNK_CHARS) or any(text in other for other in selected):
+            continue
+        source = cite(docs[i].metadata)
+        block = f"[{len(blocks) + 1}] ({source})\n{text}"
+        cost = count_tokens(block, model)
+        if tokens + cost > budget:
+            continue
+        selected.append(text)
+        blocks.append(block)
+        citations.append({"n": len(blocks), "source": source})
+        tokens += cost
+    return {"text": "\n\n".join(blocks), "citations": citations, "tokens": tokens, "dropped": len(docs) - len(blocks)}
+
+
+def format_citations(citations):
+    return "Sources: " + "; ".join(f"[{c['n']}] {c['source']}" for c in citations) if citations else ""
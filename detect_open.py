@@ -1,90 +1,52 @@
-import psutil
-import win32gui
-import win32process
 import os
 import time
-import shutil
 import tempfile
-import pygetwindow as gw
-import pyperclip
-import keyboard
-import subprocess
-import docx
-import PyPDF2
-import pandas as pd
-import pptx
-import json
-import pyautogui
 import pickle
+import hashlib
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
-from langchain_community.vectorstores import FAISS
+from lazy_imports import lazy_import, lazy_attr
 from urllib.parse import unquote
+from index_cache import file_hash, make_cache_key, get_index_cache
+from embedding_service import get_embedding_service
+from ingest import SECTION_READERS, iter_sections, iter_chunks, batched
+from retrieval import retrieve_context
+from lexical_index import LexicalIndex, lexical_for, attach as attach_lexical
+from context_builder import format_citations
+from tabular import attach_tables, answer_from_tables
+from screen_capture import ScreenCapture
+from open_documents import get_detector, copy_for_reading
+from clients import get_document_qa_chain
+from tracing import span, count
+from chunker import TokenChunker, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+from context_builder import get_encoder
+
+# Heavy or platform-specific dependencies load on first use
+gw = lazy_import("pygetwindow")
+pyperclip = lazy_import("pyperclip")
+keyboard = lazy_import("keyboard")
+FAISS = lazy_attr("langchain_community.vectorstores", "FAISS")
 
 TEMP_DIR = tempfile.gettempdir()  
 
-FILE_TYPES = {
-    '.docx': "Word Document",
-    '.pdf': "PDF Document",
-    '.txt': "Text File",
-    '.xlsx': "Excel Spreadsheet",
-    '.xls': "Excel Spreadsheet",
-    '.pptx': "PowerPoint Presentation",
-    '.ppt': "PowerPoint Presentation",
-    '.csv': "CSV File",
-    '.json': "JSON File"
-}
+EMBEDDING_MODEL = "text-embedding-3-large"
+CHUNK_SIZE = CHUNK_TOKENS        # in tokens; part of every index cache key
+CHUNK_OVERLAP = CHUNK_OVERLAP_TOKENS
+INCREMENTAL_INDEXING = os.getenv("FLOWSYNC_INCREMENTAL_INDEXING", "1") != "0"
+EMBED_BATCH_SIZE = 1024  # chunks pulled from the ingestion stream per embedding round
 
 BROWSER_PROCESSES = ["chrome.exe", "msedge.exe", "firefox.exe"]
 
-def get_active_window():
-    return win32gui.GetForegroundWindow()
-
-def get_process_from_window(hwnd):
-    _, pid = win32process.GetWindowThreadProcessId(hwnd)
-    return psutil.Process(pid)
-
-def get_open_file_path(process):
-    try:
-        for file in process.open_files():
-            if any(file.path.endswith(ext) for ext in FILE_TYPES.keys()):
-                return file.path
-    except (psutil.AccessDenied, Exception) as e:
-        print(f"[ERROR] Could not retrieve file path: {e}")
-    return None
-
-def close_application_by_pid(pid):
-    """Force close an application using its process ID."""
-    if pid:
-        try:
-            print(f"🔴 Closing process (PID: {pid})")
-            psutil.Process(pid).terminate()
-            time.sleep(2)  
-        except psutil.NoSuchProcess:
-            print("⚠️ Process already closed.")
-
-def reopen_file(file_path):
-    """Reopens the file after saving changes."""
-    print(f"🔄 Reopening {file_path}")
-    subprocess.Popen(['start', '', file_path], shell=True)
-
 def copy_to_temp(file_path):
-    """Copy the file to a temporary folder for editing."""
-    temp_path = os.path.join(TEMP_DIR, os.path.basename(file_path))
-    shutil.copy2(file_path, temp_path)
-    return temp_path
+    """Copy the file to a temporary folder for reading; the application that has it open keeps running."""
+    with span("copy"):
+        return copy_for_reading(file_path)
 
 def capture_screenshot():
-    screenshot_path = os.path.join(tempfile.gettempdir(), "screenshot.png")
-    screenshot = pyautogui.screenshot()
-    screenshot.save(screenshot_path)
-    print(f"📸 Screenshot saved: {screenshot_path}")
-    return screenshot_path
+    """Captures the screen into memory; the PNG is only written when debugging screenshots."""
+    capture = ScreenCapture.grab()
+    capture.save_if_debugging(os.path.join(tempfile.gettempdir(), "screenshot.png"))
+    print(f"📸 Screenshot captured ({capture.frame.shape[1]}x{capture.frame.shape[0]})")
+    return capture
 
 def get_browser_pdf_url():
     active_window = gw.getActiveWindow()
@@ -96,16 +58,18 @@ def get_browser_pdf_url():
     time.sleep(0.5)
     url = pyperclip.paste()
     if url.startswith("file:///"):
-        return unquote(url[8:]).replace("/", "\\")
+        return os.path.normpath(unquote(url[8:] if os.name == "nt" else url[7:]))
     return None
 
-def detect_document_path():
-    time.sleep(3)  
-    hwnd = get_active_window()
-    process = get_process_from_window(hwnd)
-    file_path = get_open_file_path(process)
-    if not file_path:
-        if process.name().lower() in BROWSER_PROCESSES:
+def detect_document_path(timeout=0.0):
+    """Returns (file_path, process) for the document in the focused window; either may be None.
+
+    `timeout` gives the user that long to switch to a document window; the
+    call returns as soon as one has focus.
+    """
+    with span("detect"):
+        file_path, process = get_detector().detect(timeout)
+        if not file_path and process is not None and process.name().lower() in BROWSER_PROCESSES:
             file_path = get_browser_pdf_url()
     return file_path, process
 
@@ -113,146 +77,240 @@ def extract_text(file_path):
     """Extracts text from various file formats."""
     if not os.path.exists(file_path):
         return "File not found."
-    file_extension = file_path.lower().split('.')[-1]
+    if file_path.lower().split('.')[-1] not in SECTION_READERS:
+        return "Unsupported file type."
     try:
-        if file_extension == 'txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        elif file_extension == 'docx':
-            doc = docx.Document(file_path)
-            return '\n'.join([para.text for para in doc.paragraphs])
-        elif file_extension == 'pdf':
-            text = ""
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            return text if text else "No text found in PDF."
-        elif file_extension in ['xlsx', 'xls']:
-            df = pd.read_excel(file_path, sheet_name=None)
-            text = [f"--- Sheet: {sheet} ---\n{data.to_string()}" for sheet, data in df.items()]
-            return "\n".join(text)
-        elif file_extension in ['pptx', 'ppt']:
-            ppt = pptx.Presentation(file_path)
-            return "\n".join([shape.text for slide in ppt.slides for shape in slide.shapes if hasattr(shape, "text")])
-        elif file_extension == 'csv':
-            df = pd.read_csv(file_path)
-            return df.to_string(index=False)
-        elif file_extension == 'json':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.dumps(json.load(f), indent=4)
-        else:
-            return "Unsupported file type."
+        text = "\n".join(section for section, _ in iter_sections(file_path))
+        if not text.strip() and file_path.lower().endswith(".pdf"):
+            return "No text found in PDF."
+        return text
     except Exception as e:
         return f"Error extracting text: {e}"
 
+def get_splitter():
+    return TokenChunker(CHUNK_SIZE, CHUNK_OVERLAP, model=EMBEDDING_MODEL)
+
 def data_chunks(data):
     """Splits data into chunks for embedding."""
-    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len).split_text(data)
+    return get_splitter().split_text(data)
+
+def get_embeddings(openai_api_key):
+    """Returns the shared, cached embedding service used by every indexing path."""
+    return get_embedding_service(openai_api_key, model=EMBEDDING_MODEL)
+
+def _chunk_id(chunk, counts):
+    digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:32]
+    occurrence = counts.get(digest, 0)
+    counts[digest] = occurrence + 1
+    return f"{digest}-{occurrence}"
+
+def chunk_ids(chunks):
+    """Stable ids per chunk: content hash plus an occurrence counter for repeated chunks."""
+    counts = {}
+    return [_chunk_id(chunk, counts) for chunk in chunks]
+
+def index_chunks(chunk_stream, embeddings, VectorStore=None, batch_size=EMBED_BATCH_SIZE):
+    """Embeds a stream of (chunk, metadata) pairs batch by batch into a FAISS index.
+
+    With an existing index only chunks it does not already hold are embedded,
+    and vectors for chunks missing from the stream are deleted at the end.
+    The BM25 lexical index attached to the store is kept in step with it.
+    """
+    existing = set(VectorStore.index_to_docstore_id.values()) if VectorStore is not None else set()
+    lexical = lexical_for(VectorStore) if VectorStore is not None else LexicalIndex()
+    seen, counts = set(), {}
+    embedded = 0
+    for batch in batched(chunk_stream, batch_size):
+        texts, metadatas, ids = [], [], []
+        for chunk, metadata in batch:
+            doc_id = _chunk_id(chunk, counts)
+            seen.add(doc_id)
+            if doc_id not in existing:
+                texts.append(chunk)
+                metadatas.append(metadata)
+                ids.append(doc_id)
+                lexical.add(doc_id, chunk, metadata)
+            else:
+                # A reused chunk may have moved to another page or row block; keep its citation current
+                document = VectorStore.docstore.search(doc_id)
+                if document.metadata != metadata:
+                    document.metadata = metadata
+                    lexical.set_metadata(doc_id, metadata)
+        if not texts:
+            continue
+        if VectorStore is None:
+            VectorStore = FAISS.from_texts(texts, embedding=embeddings, metadatas=metadatas, ids=ids)
+        else:
+            VectorStore.add_texts(texts, metadatas=metadatas, ids=ids)
+        embedded += len(texts)
+    stale = list(existing - seen)
+    if stale:
+        VectorStore.delete(stale)
+        for doc_id in stale:
+            lexical.remove(doc_id)
+    attach_lexical(VectorStore, lexical)
+    # FAISS positions move on add and delete; retrieval rebuilds its id -> position map
+    VectorStore.vector_positions = None
+    count("chunks", len(seen))
+    count("chunks_embedded", embedded)
+    if existing:
+        print(f"♻️ Incremental re-index: {embedded} embedded, {len(stale)} removed, {len(seen) - embedded} reused")
+    return VectorStore
+
+def sync_index(VectorStore, chunks):
+    """Updates an existing index to match `chunks`, embedding only added or changed chunks."""
+    return index_chunks(((chunk, {}) for chunk in chunks), VectorStore.embeddings, VectorStore)
 
 def chunk_embedding(chunks, file_name, openai_api_key):
-    """Embeds the chunks using FAISS and Google embeddings."""
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=openai_api_key)
+    """Embeds the chunks using FAISS and OpenAI embeddings."""
+    embeddings = get_embeddings(openai_api_key)
     index_path = f"{file_name}_index"
     if os.path.exists(index_path):
         VectorStore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        if INCREMENTAL_INDEXING:
+            sync_index(VectorStore, chunks)
+            VectorStore.save_local(index_path)
     else:
-        VectorStore = FAISS.from_texts(chunks, embedding=embeddings)
+        VectorStore = FAISS.from_texts(chunks, embedding=embeddings, ids=chunk_ids(chunks))
         VectorStore.save_local(index_path)
     return VectorStore
 
+def warm_up():
+    """Imports the indexing stack (FAISS, tokenizer, embeddings client) ahead of first use."""
+    FAISS._resolve()
+    get_encoder(EMBEDDING_MODEL)
+    get_embeddings(os.getenv("OPENAI_API_KEY"))
+    # Start tracking window focus so the hotkey finds the user's document immediately
+    get_detector()
+
 def load_permanent_index(index_path, openai_api_key):
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=openai_api_key)
+    embeddings = get_embeddings(openai_api_key)
     if os.path.exists(index_path):
-        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        VectorStore = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        lexical = LexicalIndex.load(index_path)
+        if lexical is None:
+            lexical = LexicalIndex.from_vector_store(VectorStore)
+            lexical.save(index_path)
+        return attach_lexical(VectorStore, lexical)
     else:
         print("⚠️ Permanent index not found.")
         return None
 
-def build_temp_index_from_file(file_path, openai_api_key):
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        openai_api_key=openai_api_key
-    )
+def build_temp_index_from_file(file_path, openai_api_key, incremental=INCREMENTAL_INDEXING, source=None):
+    """Returns a FAISS index for the file, reusing the content-addressed cache when possible.
 
-    base_name = os.path.basename(file_path)[:-4]
-    temp_index_path = os.path.join(TEMP_DIR, f"{base_name}_temp_index")
-    index_path = f"{base_name}_index"  # Assuming saved in current working directory
-    # Step 1: Check TEMP_DIR for temp index
-    if os.path.exists(temp_index_path):
-        print(f"📦 Found existing TEMP index: {temp_index_path}")
-        return FAISS.load_local(temp_index_path, embeddings, allow_dangerous_deserialization=True)
-    # Step 2: Check for permanent index in current dir
-    if os.path.exists(index_path):
-        print(f"📦 Found existing index: {index_path}")
-        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
-    # Step 3: Build a new temp index if none found
-    print("🧠 No existing index found. Creating new TEMP index...")
-    data = extract_text(file_path)
-    if data:
-        chunks = data_chunks(data)
-        VectorStore = FAISS.from_texts(chunks, embedding=embeddings)
-        VectorStore.save_local(temp_index_path)
-        print(f"💾 Index saved at: {temp_index_path}")
-        return VectorStore
-    print("⚠️ Failed to extract or embed content from the file.")
-    return None
+    `source` is the user's document when `file_path` is a copy of it (see
+    copy_to_temp); it identifies the document across versions, so updates
+    and cache removal never touch another document with the same name.
+    """
+    with span("index", file=os.path.basename(file_path)):
+        return _build_temp_index(file_path, openai_api_key, incremental, source or file_path)
+
+def _build_temp_index(file_path, openai_api_key, incremental, source):
+    embeddings = get_embeddings(openai_api_key)
+    cache = get_index_cache()
+    source = os.path.abspath(source)
+    content_hash = file_hash(file_path)
+    splitter = get_splitter()
+    # Indexes chunked with tiktoken and with the offline estimate are never mixed
+    key = make_cache_key(content_hash, embeddings.model_id, CHUNK_SIZE, CHUNK_OVERLAP, splitter.tokenizer)
+    # Step 1: An unchanged document skips extraction and embedding entirely
+    VectorStore = cache.get(key, embeddings)
+    if VectorStore is not None:
+        print(f"📦 Found cached index for: {os.path.basename(file_path)}")
+        count("index_cache_hits")
+        return attach_tables(VectorStore, file_path, content_hash)
+    # Step 2: A changed document only re-embeds the chunks that differ from its last index
+    previous_key = None
+    if incremental:
+        previous_key = cache.find_latest(
+            source=source, model=embeddings.model_id, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+            tokenizer=splitter.tokenizer,
+        )
+        if previous_key is not None:
+            VectorStore = cache.get(previous_key, embeddings)
+    if VectorStore is not None:
+        print(f"🔁 Document changed. Updating index for: {os.path.basename(file_path)}")
+    else:
+        # Step 3: Build a new index from scratch
+        print("🧠 No cached index found. Creating new index...")
+    # Pages, sheets and row blocks are streamed through chunking and embedding in bounded batches
+    try:
+        VectorStore = index_chunks(iter_chunks(file_path, splitter), embeddings, VectorStore)
+    except Exception as e:
+        print(f"⚠️ Failed to extract or embed content from the file: {e}")
+        return None
+    if VectorStore is None:
+        print("⚠️ No text found in the file.")
+        return None
+    index_path = cache.put(
+        key, VectorStore,
+        source=source,
+        content_hash=content_hash,
+        model=embeddings.model_id,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        tokenizer=splitter.tokenizer,
+    )
+    if previous_key is not None and previous_key != key:
+        cache.remove(previous_key)
+    print(f"💾 Index saved at: {index_path}")
+    return attach_tables(VectorStore, file_path, content_hash)
 
 
 if __name__ == "__main__":
-    file_path, process = detect_document_path()
+    # Switch to the document window within 3 seconds; detection returns as soon as it has focus
+    file_path, process = detect_document_path(timeout=3)
     print("file_path:", file_path)
-    print("process:", process.name())
+    print("process:", process.name() if process else None)
     
     if file_path:
         print("📄 Opened file:", file_path)
         load_dotenv()
         openai_api_key = os.getenv("OPENAI_API_KEY")
 
-        print("🔴 Closing application...")
-        close_application_by_pid(process.pid)
-        print("✅ Application closed.")
-
         try:
             temp_path = copy_to_temp(file_path)
             print(f"✅ File copied to temp: {temp_path}")
-        except PermissionError as e:
-            print(f"❌ Permission denied: {e}")
-
-        print("🔄 Reopening file...")
-        reopen_file(file_path)
+        except OSError as e:
+            print(f"❌ Could not read the file: {e}")
+            temp_path = file_path
 
         # Load permanent index
         permanent_index = load_permanent_index("permanent_index", openai_api_key)
         
         # Build temporary index from opened file
-        temp_index = build_temp_index_from_file(file_path, openai_api_key)
+        temp_index = build_temp_index_from_file(temp_path, openai_api_key, source=file_path)
 
         if not temp_index and not permanent_index:
             print("❌ No documents available to answer from.")
             exit()
 
-        # Combine documents for similarity search
-        combined_docs = []
         while True:
             query = input("Enter a query or type EXIT: ")
             if query.lower() == "exit":
+                print(f"📊 {get_embeddings(openai_api_key).query_summary()}")
                 break
 
-            if temp_index:
-                combined_docs += temp_index.similarity_search(query, k=3)
-            if permanent_index:
-                combined_docs += permanent_index.similarity_search(query, k=3)
+            # Aggregate questions over spreadsheets are computed, not retrieved
+            table_answer = answer_from_tables([temp_index], query)
+            if table_answer is not None:
+                print(table_answer["answer"])
+                print(f"Sources: {table_answer['source']}")
+                continue
+
+            # One query embedding, deduplicated and budgeted context across both indexes
+            context = retrieve_context([temp_index, permanent_index], query)
 
-            if not combined_docs:
+            if not context["citations"]:
                 print("🤖 No relevant answers found.")
                 continue
 
-            context = "\n".join([doc.page_content for doc in combined_docs])
-            llm = ChatOpenAI(model='gpt-3.5-turbo', temperature=0.2, api_key=openai_api_key)
-            prompt = ChatPromptTemplate.from_template("Answer the question based on: {context} Question: {question}")
-            chain = {"context": lambda x: context, "question": RunnablePassthrough()} | prompt | llm | StrOutputParser()
-            print(chain.invoke(query))
+            chain = get_document_qa_chain('gpt-3.5-turbo', api_key=openai_api_key)
+            for chunk in chain.stream({"context": context["text"], "question": query}):
+                print(chunk, end="", flush=True)
+            print()
+            print(format_citations(context["citations"]))
     else:
         print("❌ No document detected. Taking a screenshot...")
         capture_screenshot()
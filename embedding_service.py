@@ -0,0 +1,286 @@
+import os
+import time
+import random
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from lazy_imports import lazy_attr
+
+Embeddings = lazy_attr("langchain_core.embeddings", "Embeddings")
+
+# === Settings ===
+EMBEDDING_CACHE_PATH = os.getenv(
+    "FLOWSYNC_EMBEDDING_CACHE", os.path.join(tempfile.gettempdir(), "flowsync_embeddings.sqlite3")
+)
+EMBEDDING_BACKEND = os.getenv("FLOWSYNC_EMBEDDING_BACKEND", "openai")  # "openai" or "fake"
+MAX_BATCH_SIZE = 512          # texts per request (OpenAI accepts up to 2048)
+MAX_BATCH_TOKENS = 250_000    # estimated tokens per request (OpenAI limit is 300k)
+MAX_CONCURRENCY = int(os.getenv("FLOWSYNC_EMBEDDING_CONCURRENCY", "4"))
+MAX_RETRIES = 6
+QUERY_LRU_SIZE = int(os.getenv("FLOWSYNC_QUERY_EMBEDDING_LRU", "256"))   # query vectors kept in memory
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text):
+    return " ".join(text.lower().split()).strip(" ?!.")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for batch sizing."""
+    return len(text) // 4 + 1
+
+
+def _is_rate_limit(exc):
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(exc).__name__ or "rate limit" in str(exc).lower()
+
+
+class EmbeddingCache:
+    """Persistent vector store keyed by (model, chunk hash), backed by SQLite."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for digest, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[digest] = vector.tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, array("f", vector).tobytes()) for digest, vector in items],
+            )
+            self._conn.commit()
+
+
+_registered = False
+_registered_lock = threading.Lock()
+
+
+def _register_embeddings():
+    """Registers the embedders below as LangChain `Embeddings` once one is created.
+
+    They are virtual subclasses rather than real ones so importing this
+    module does not import langchain_core; FAISS still recognises them.
+    """
+    global _registered
+    if not _registered:
+        with _registered_lock:
+            if not _registered:
+                Embeddings.register(FakeEmbeddings)
+                Embeddings.register(EmbeddingService)
+                _registered = True
+
+
+class FakeEmbeddings:
+    """Deterministic offline embedder: the same text always maps to the same unit vector."""
+
+    def __init__(self, size=256, delay=0.0):
+        _register_embeddings()
+        self.size = size
+        self.delay = delay
+
+    def _vector(self, text):
+        rng = random.Random(text_hash(text))
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.size)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        if self.delay:
+            time.sleep(self.delay)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingService:
+    """Deduplicating, batching, concurrent embedder with a persistent per-chunk cache.
+
+    Any LangChain `Embeddings` can be used as the backend, so FAISS and the
+    rest of the pipeline use this service exactly like `OpenAIEmbeddings`.
+    Query vectors are cached too, by normalised query text, in an in-memory
+    LRU in front of the same on-disk cache.
+    """
+
+    def __init__(self, backend, model_id, cache=None, batch_size=MAX_BATCH_SIZE,
+                 max_batch_tokens=MAX_BATCH_TOKENS, max_workers=MAX_CONCURRENCY, max_retries=MAX_RETRIES):
+        _register_embeddings()
+        self.backend = backend
+        self.model_id = model_id
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.stats = {"requested": 0, "unique": 0, "cached": 0, "embedded": 0, "batches": 0, "retries": 0}
+        self.query_lru_size = QUERY_LRU_SIZE
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+        self.query_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "miss_seconds": 0.0, "saved_seconds": 0.0}
+
+    def _batches(self, items):
+        """Groups (hash, text) pairs into batches within the provider's count and token limits."""
+        batch, batch_tokens = [], 0
+        for item in items:
+            tokens = estimate_tokens(item[1])
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch):
+        """Embeds one batch, backing off exponentially with jitter on rate-limit errors."""
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                vectors = self.backend.embed_documents(texts)
+                return [(digest, vector) for (digest, _), vector in zip(batch, vectors)]
+            except Exception as e:
+                if attempt == self.max_retries or not _is_rate_limit(e):
+                    raise
+                self.stats["retries"] += 1
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"⏳ Embedding rate limited, retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        vectors = self.cache.get_many(self.model_id, list(unique)) if self.cache else {}
+        missing = [(digest, text) for digest, text in unique.items() if digest not in vectors]
+
+        batches = list(self._batches(missing))
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(batches)))) as pool:
+                for embedded in pool.map(self._embed_batch, batches):
+                    vectors.update(embedded)
+                    if self.cache:
+                        self.cache.put_many(self.model_id, embedded)
+
+        self.stats["requested"] += len(texts)
+        self.stats["unique"] += len(unique)
+        self.stats["cached"] += len(unique) - len(missing)
+        self.stats["embedded"] += len(missing)
+        self.stats["batches"] += len(batches)
+        return [vectors[digest] for digest in hashes]
+
+    def _remember_query(self, key, vector):
+        with self._queries_lock:
+            self._queries[key] = vector
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.query_lru_size:
+                self._queries.popitem(last=False)
+
+    def _average_miss_seconds(self):
+        misses = self.query_stats["misses"]
+        return self.query_stats["miss_seconds"] / misses if misses else 0.0
+
+    def embed_query(self, text):
+        """Embeds a query, reusing the vector of any earlier query with the same normalised text.
+
+        The normalised text is only the cache key; what is embedded is the
+        query as typed, so case-sensitive terms (product codes, names) keep
+        their meaning.
+        """
+        key = text_hash(normalize_query(text) or text)
+        with self._queries_lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+        if vector is not None:
+            self.query_stats["memory_hits"] += 1
+            self.query_stats["saved_seconds"] += self._average_miss_seconds()
+            return vector
+        # Not ":query": vectors stored under that were embedded from the lowercased text
+        query_model = f"{self.model_id}:query-as-typed"
+        if self.cache:
+            vector = self.cache.get_many(query_model, [key]).get(key)
+        if vector is not None:
+            self.query_stats["disk_hits"] += 1
+            self.query_stats["saved_seconds"] += self._average_miss_seconds()
+        else:
+            start = time.perf_counter()
+            vector = self.backend.embed_query(text)
+            self.query_stats["misses"] += 1
+            self.query_stats["miss_seconds"] += time.perf_counter() - start
+            if self.cache:
+                self.cache.put_many(query_model, [(key, vector)])
+        self._remember_query(key, vector)
+        return vector
+
+    def query_summary(self):
+        stats = self.query_stats
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        rate = hits / lookups * 100 if lookups else 0.0
+        return (f"Query embeddings: {hits}/{lookups} cached ({rate:.0f}%, {stats['disk_hits']} from disk), "
+                f"~{stats['saved_seconds']:.2f}s saved")
+
+
+# === Shared Services ===
+_services = {}
+_services_lock = threading.Lock()
+_embedding_cache = None
+
+
+def _build_backend(model, openai_api_key):
+    if EMBEDDING_BACKEND == "fake":
+        return FakeEmbeddings(), f"fake:{model}"
+    from clients import get_embeddings_client
+    # Batching and retries are handled by the service; the client shares the pooled connections
+    return get_embeddings_client(model, api_key=openai_api_key, max_retries=0), model
+
+
+def get_embedding_service(openai_api_key=None, model="text-embedding-3-large", backend=None):
+    """Returns the shared embedding service for a model, creating it on first use.
+
+    Pass `backend` to plug in another embedder (e.g. `FakeEmbeddings()` for offline benchmarks).
+    """
+    global _embedding_cache
+    with _services_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        if backend is not None:
+            return EmbeddingService(backend, f"{type(backend).__name__}:{model}", cache=_embedding_cache)
+        key = (model, openai_api_key)
+        if key not in _services:
+            backend, model_id = _build_backend(model, openai_api_key)
+            _services[key] = EmbeddingService(backend, model_id, cache=_embedding_cache)
+        return _services[key]
+
+
+def embedding_services():
+    """The shared services created so far (for reporting)."""
+    with _services_lock:
+        return list(_services.values())
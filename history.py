@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+from response_cache import fingerprint
+
+# === Settings ===
+MAX_ENTRIES = int(os.getenv("FLOWSYNC_HISTORY_ENTRIES", "20"))     # turns kept verbatim
+MAX_BYTES = int(os.getenv("FLOWSYNC_HISTORY_KB", "64")) * 1024      # memory cap for kept turns
+MAX_FIELD_CHARS = 2000     # longer instructions/code/errors are truncated when stored
+SUMMARY_CHARS = 1500       # rolling summary of evicted turns is kept under this length
+
+
+def _clip(text, limit):
+    text = (text or "").strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class HistoryRecord:
+    """One assistant turn; the screen is kept as a fingerprint, not a copy of the OCR text."""
+    __slots__ = ("type", "query", "instructions", "code", "error", "screen_fp", "timestamp")
+
+    def __init__(self, type, query="", instructions="", code="", error="", screen_fp="", timestamp=None):
+        self.type = type
+        self.query = query
+        self.instructions = instructions
+        self.code = code
+        self.error = error
+        self.screen_fp = screen_fp
+        self.timestamp = timestamp or time.time()
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Builds a record from the dict entries screen.py has always appended."""
+        screen = entry.get("screen_context", entry.get("screen", ""))
+        return cls(
+            entry.get("type", ""),
+            query=_clip(entry.get("query", ""), MAX_FIELD_CHARS),
+            instructions=_clip(entry.get("instructions", ""), MAX_FIELD_CHARS),
+            code=_clip(entry.get("automation_code", entry.get("code_attempt", "")), MAX_FIELD_CHARS),
+            error=_clip(entry.get("error", ""), MAX_FIELD_CHARS),
+            screen_fp=fingerprint(screen) if screen else "",
+        )
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__)
+
+    def summarize(self):
+        """One line for the rolling summary."""
+        if self.type == "instruction":
+            first_line = self.instructions.splitlines()[0] if self.instructions else ""
+            return f"- Asked: {_clip(self.query, 80)} -> {_clip(first_line, 80)}"
+        if self.type == "automation_success":
+            return f"- Automation succeeded for: {_clip(self.query, 80)}"
+        if self.type == "automation_attempt":
+            return f"- Automation failed for: {_clip(self.query, 80)} ({_clip(self.error, 80)})"
+        return f"- {self.type}: {_clip(self.query, 80)}"
+
+
+class ConversationHistory:
+    """Bounded conversation history: a ring buffer of recent turns plus a rolling summary.
+
+    Turns beyond `max_entries`, or beyond `max_bytes` of memory, are folded
+    into a short extractive summary (oldest lines dropped past
+    `summary_chars`), so long sessions stay bounded. `append` takes the
+    same dicts as the old list, and `clear` and slicing work as before.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, summary_chars=SUMMARY_CHARS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.summary_chars = summary_chars
+        self._lock = threading.Lock()
+        self._records = deque()
+        self._bytes = 0
+        self._summary = deque()
+        self._summary_chars = 0
+        self.stats = {"appended": 0, "summarized": 0, "dropped_from_summary": 0}
+
+    def append(self, entry):
+        record = entry if isinstance(entry, HistoryRecord) else HistoryRecord.from_entry(entry)
+        with self._lock:
+            self._records.append(record)
+            self._bytes += record.nbytes()
+            self.stats["appended"] += 1
+            while self._records and (len(self._records) > self.max_entries or self._bytes > self.max_bytes):
+                self._evict()
+
+    def _evict(self):
+        record = self._records.popleft()
+        self._bytes -= record.nbytes()
+        line = record.summarize()
+        self._summary.append(line)
+        self._summary_chars += len(line) + 1
+        self.stats["summarized"] += 1
+        while len(self._summary) > 1 and self._summary_chars > self.summary_chars:
+            self._summary_chars -= len(self._summary.popleft()) + 1
+            self.stats["dropped_from_summary"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._summary.clear()
+            self._bytes = 0
+            self._summary_chars = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._records))
+
+    def __getitem__(self, index):
+        with self._lock:
+            return list(self._records)[index]
+
+    @property
+    def summary(self):
+        with self._lock:
+            return "\n".join(self._summary)
+
+    def memory_bytes(self):
+        """Approximate memory held by kept turns and the summary."""
+        with self._lock:
+            return self._bytes + self._summary_chars
+
+    def report(self):
+        return (f"History: {len(self)} turns kept, {self.stats['summarized']} summarized, "
+                f"{self.memory_bytes() / 1024:.1f} KB (cap {self.max_bytes / 1024:.0f} KB)")
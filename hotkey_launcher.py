@@ -1,12 +1,17 @@
 import sys
 import os
+import threading
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QTimer, QObject, pyqtSignal
 from ui import FloatingChat
-import keyboard
+from input_events import HotkeyManager
 
 assistant_window = None
-was_pressed = False  # track toggle state
+LAUNCH_HOTKEY = "ctrl+alt+a"
+
+# Load OCR/LLM/indexing dependencies in the background once the launcher is idle
+WARMUP_ENABLED = os.getenv("FLOWSYNC_WARMUP", "1") != "0"
+WARMUP_DELAY_MS = 2000
 
 
 def launch_ui():
@@ -27,20 +32,38 @@ def clear_assistant_ref():
     assistant_window = None
 
 
-def check_hotkey():
-    global was_pressed
-    if keyboard.is_pressed("ctrl+alt+a"):
-        if not was_pressed:
-            was_pressed = True
-            launch_ui()
-    else:
-        was_pressed = False
+def warm_up():
+    import screen
+    import detect_open
+    try:
+        screen.warm_up()
+        detect_open.warm_up()
+        print("[INFO] Background warm-up complete.")
+    except Exception as e:
+        print(f"[WARN] Background warm-up failed: {e}")
+
+
+def start_warm_up():
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+class HotkeyBridge(QObject):
+    """Carries hotkey events from the keyboard hook thread to the Qt main thread."""
+    triggered = pyqtSignal()
+
 
-    QTimer.singleShot(100, check_hotkey)  # repeat every 100ms
+def register_hotkeys(hotkeys=None):
+    bridge = HotkeyBridge()
+    bridge.triggered.connect(launch_ui)
+    hotkeys = hotkeys or HotkeyManager()
+    hotkeys.register(LAUNCH_HOTKEY, bridge.triggered.emit)
+    return bridge, hotkeys
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    print("🔑 Hold Ctrl+Alt+A to launch your assistant.")
-    check_hotkey()
+    print("🔑 Press Ctrl+Alt+A to launch your assistant.")
+    bridge, hotkeys = register_hotkeys()
+    if WARMUP_ENABLED:
+        QTimer.singleShot(WARMUP_DELAY_MS, start_warm_up)
     sys.exit(app.exec_())
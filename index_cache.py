@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from lazy_imports import lazy_attr
+from lexical_index import LexicalIndex, attach
+
+FAISS = lazy_attr("langchain_community.vectorstores", "FAISS")
+
+# === Cache Location & Budget ===
+CACHE_DIR = os.getenv("FLOWSYNC_INDEX_CACHE_DIR", os.path.join(tempfile.gettempdir(), "flowsync_index_cache"))
+MAX_CACHE_MB = int(os.getenv("FLOWSYNC_INDEX_CACHE_MB", "1024"))
+MANIFEST_NAME = "manifest.json"
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """Returns the SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash, model, chunk_size, chunk_overlap, tokenizer=None):
+    """Builds the cache key from everything that changes the resulting index."""
+    raw = json.dumps([content_hash, model, chunk_size, chunk_overlap] + ([tokenizer] if tokenizer else []))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class DiskCache:
+    """Directories under `cache_dir`, one per key, in a JSON manifest with LRU eviction by size.
+
+    Subclasses write an entry's files to `path_for(key)` and then `record`
+    it; `touch` marks an entry used and tells whether it is still on disk.
+    """
+
+    kind = "entry"   # named in eviction messages
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def touch(self, key):
+        """Marks an entry as recently used; False if it is not cached (or its files are gone)."""
+        with self._lock:
+            entry = self.manifest.get(key)
+            if entry is None:
+                return False
+            if not os.path.exists(self.path_for(key)):
+                del self.manifest[key]
+                self._save_manifest()
+                return False
+            entry["last_used"] = time.time()
+            self._save_manifest()
+            return True
+
+    def record(self, key, **info):
+        """Records the files written to `path_for(key)` in the manifest and enforces the budget."""
+        now = time.time()
+        with self._lock:
+            entry = dict(info)
+            entry.update({"size": _dir_size(self.path_for(key)), "created": now, "last_used": now})
+            self.manifest[key] = entry
+            self._evict(protect=key)
+            self._save_manifest()
+
+    def find_latest(self, **match):
+        """Returns the most recently used key whose manifest entry matches every field given."""
+        with self._lock:
+            keys = [
+                key for key, entry in self.manifest.items()
+                if all(entry.get(field) == value for field, value in match.items())
+            ]
+            if not keys:
+                return None
+            return max(keys, key=lambda k: self.manifest[k].get("last_used", 0))
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+            self._save_manifest()
+
+    def _remove(self, key):
+        self.manifest.pop(key, None)
+        shutil.rmtree(self.path_for(key), ignore_errors=True)
+
+    def total_size(self):
+        return sum(entry.get("size", 0) for entry in self.manifest.values())
+
+    def _evict(self, protect=None):
+        """Drops least recently used entries until the cache fits in `max_bytes`."""
+        candidates = sorted(
+            (key for key in self.manifest if key != protect),
+            key=lambda k: self.manifest[k].get("last_used", 0),
+        )
+        for key in candidates:
+            if self.total_size() <= self.max_bytes:
+                break
+            print(f"🧹 Evicting cached {self.kind}: {self.manifest[key].get('source', key)}")
+            self._remove(key)
+
+
+class IndexCache(DiskCache):
+    """On-disk FAISS index cache (with each index's BM25 lexical index) and LRU eviction by size."""
+
+    kind = "index"
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_MB * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    def get(self, key, embeddings):
+        """Loads a cached index and marks it as recently used, or returns None."""
+        if not self.touch(key):
+            return None
+        path = self.path_for(key)
+        store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        # Indexes cached before the lexical index existed get one built on first lexical query
+        return attach(store, LexicalIndex.load(path))
+
+    def put(self, key, vector_store, **info):
+        """Saves an index under `key`, records it in the manifest and enforces the budget."""
+        path = self.path_for(key)
+        vector_store.save_local(path)
+        lexical = getattr(vector_store, "lexical_index", None)
+        if lexical is not None:
+            lexical.save(path)
+        self.record(key, **info)
+        return path
+
+
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+    """Returns the process-wide index cache, creating it on first use."""
+    global _index_cache
+    if _index_cache is None:
+        with _index_cache_lock:
+            if _index_cache is None:
+                _index_cache = IndexCache()
+    return _index_cache
@@ -0,0 +1,114 @@
+import os
+import json
+from itertools import islice
+
+# === Streaming Settings ===
+ROW_BLOCK_SIZE = 200          # spreadsheet/CSV rows per section
+TEXT_BLOCK_CHARS = 64 * 1024  # plain-text characters per section
+PARAGRAPH_BLOCK_SIZE = 50     # DOCX paragraphs per section
+
+
+def batched(iterable, size):
+    """Yields lists of up to `size` items without materialising the whole iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _iter_txt(file_path):
+    block, size, first_line = [], 0, 1
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            block.append(line)
+            size += len(line)
+            if size >= TEXT_BLOCK_CHARS:
+                yield "".join(block), {"lines": f"{first_line}-{line_no}"}
+                block, size, first_line = [], 0, line_no + 1
+    if block:
+        yield "".join(block), {"lines": f"{first_line}-{first_line + len(block) - 1}"}
+
+
+def _heading_level(paragraph):
+    """1 for a Title, N for "Heading N", 0 for body text; taken from the paragraph style, never the text."""
+    style = paragraph.style.name if paragraph.style is not None else ""
+    if style == "Title":
+        return 1
+    if style.startswith("Heading"):
+        level = style.rpartition(" ")[2]
+        return int(level) if level.isdigit() else 1
+    return 0
+
+
+def _iter_docx(file_path):
+    import docx
+    doc = docx.Document(file_path)
+    block, first = [], 1
+    for number, paragraph in enumerate(doc.paragraphs, start=1):
+        level = _heading_level(paragraph)
+        # Sections end at headings as well as every PARAGRAPH_BLOCK_SIZE paragraphs; each is chunked on its own
+        if block and (len(block) >= PARAGRAPH_BLOCK_SIZE or level):
+            yield "\n".join(block), {"paragraphs": f"{first}-{number - 1}"}
+            block, first = [], number
+        block.append(f"{'#' * level} {paragraph.text}" if level else paragraph.text)
+    if block:
+        yield "\n".join(block), {"paragraphs": f"{first}-{first + len(block) - 1}"}
+
+
+def _iter_pdf(file_path):
+    import PyPDF2
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_no, page in enumerate(reader.pages, start=1):
+            yield (page.extract_text() or ""), {"page": page_no}
+
+
+def _iter_table(file_path):
+    from tabular import iter_row_sections
+    yield from iter_row_sections(file_path, ROW_BLOCK_SIZE)
+
+
+def _iter_pptx(file_path):
+    import pptx
+    ppt = pptx.Presentation(file_path)
+    for slide_no, slide in enumerate(ppt.slides, start=1):
+        yield "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text")), {"slide": slide_no}
+
+
+def _iter_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield json.dumps(json.load(f), indent=4), {}
+
+
+SECTION_READERS = {
+    "txt": _iter_txt,
+    "docx": _iter_docx,
+    "pdf": _iter_pdf,
+    "xlsx": _iter_table,
+    "xls": _iter_table,
+    "pptx": _iter_pptx,
+    "ppt": _iter_pptx,
+    "csv": _iter_table,
+    "json": _iter_json,
+}
+
+
+def iter_sections(file_path):
+    """Yields (text, metadata) per page, slide, paragraph block or row block of a document."""
+    file_extension = file_path.lower().split('.')[-1]
+    reader = SECTION_READERS.get(file_extension)
+    if reader is None:
+        raise ValueError(f"Unsupported file type: .{file_extension}")
+    yield from reader(file_path)
+
+
+def iter_chunks(file_path, splitter):
+    """Chunks a document section by section; each chunk carries its source location."""
+    source = os.path.basename(file_path)
+    for text, metadata in iter_sections(file_path):
+        if not text.strip():
+            continue
+        for chunk in splitter.split_text(text):
+            yield chunk, dict(metadata, source=source)
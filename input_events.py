@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+from lazy_imports import lazy_import
+
+keyboard = lazy_import("keyboard")
+
+# === Settings ===
+INPUT_BACKEND = os.getenv("FLOWSYNC_INPUT_BACKEND", "keyboard")  # "keyboard" or "synthetic"
+DEBOUNCE_SECONDS = 0.3   # a new press of the same hotkey within this window is ignored (switch chatter)
+
+
+def normalize_combo(combo):
+    return "+".join(sorted(part.strip().lower() for part in combo.split("+")))
+
+
+class KeyboardHookBackend:
+    """Hotkeys through the `keyboard` package's OS-level hooks; callbacks run on its listener thread."""
+
+    def add_hotkey(self, combo, callback):
+        return keyboard.add_hotkey(combo, callback)
+
+    def remove_hotkey(self, handle):
+        keyboard.remove_hotkey(handle)
+
+    def on_release(self, callback):
+        """Calls `callback()` on every key release; returns a handle for `remove_release`."""
+        return keyboard.on_release(lambda event: callback())
+
+    def remove_release(self, handle):
+        keyboard.unhook(handle)
+
+    def is_pressed(self, combo):
+        return keyboard.is_pressed(combo)
+
+
+class SyntheticBackend:
+    """In-process backend for tests and benchmarks: `press()` fires hotkeys like a real key event."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hotkeys = {}
+        self._releases = {}
+        self._pressed = set()
+        self._next_handle = 0
+
+    def add_hotkey(self, combo, callback):
+        with self._lock:
+            self._next_handle += 1
+            self._hotkeys[self._next_handle] = (normalize_combo(combo), callback)
+            return self._next_handle
+
+    def remove_hotkey(self, handle):
+        with self._lock:
+            self._hotkeys.pop(handle, None)
+
+    def on_release(self, callback):
+        with self._lock:
+            self._next_handle += 1
+            self._releases[self._next_handle] = callback
+            return self._next_handle
+
+    def remove_release(self, handle):
+        with self._lock:
+            self._releases.pop(handle, None)
+
+    def is_pressed(self, combo):
+        return normalize_combo(combo) in self._pressed
+
+    def press(self, combo):
+        """A key-down event; calling it again before `release` is key auto-repeat."""
+        combo = normalize_combo(combo)
+        self._pressed.add(combo)
+        with self._lock:
+            callbacks = [callback for hotkey, callback in self._hotkeys.values() if hotkey == combo]
+        for callback in callbacks:
+            callback()
+
+    def release(self, combo):
+        self._pressed.discard(normalize_combo(combo))
+        with self._lock:
+            callbacks = list(self._releases.values())
+        for callback in callbacks:
+            callback()
+
+
+def get_backend(name=None):
+    name = name or INPUT_BACKEND
+    if name == "synthetic":
+        return SyntheticBackend()
+    return KeyboardHookBackend()
+
+
+class HotkeyManager:
+    """Event-driven hotkey registration, firing once per press.
+
+    Callbacks run on the backend's thread as soon as the key-down event
+    arrives, so nothing polls while idle. A hotkey then stays disarmed
+    while it is held (key auto-repeat sends more key-down events) and is
+    re-armed by the release of any of its keys; a new press within
+    `debounce` seconds of the last one is also ignored. `stats` counts
+    fired and debounced events and the time spent in callbacks.
+    """
+
+    def __init__(self, backend=None, debounce=DEBOUNCE_SECONDS):
+        self.backend = backend or get_backend()
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._handles = []
+        self._combos = {}
+        self._held = set()
+        self._last_fired = {}
+        self._release_handle = None
+        self.stats = {"fired": 0, "debounced": 0, "callback_seconds": 0.0}
+
+    def _on_release(self):
+        with self._lock:
+            held = [(key, self._combos[key]) for key in self._held]
+        released = [key for key, combo in held if not self.backend.is_pressed(combo)]
+        if released:
+            with self._lock:
+                self._held.difference_update(released)
+
+    def register(self, combo, callback, debounce=None):
+        """Calls `callback()` once each time `combo` (e.g. "ctrl+alt+a") is pressed; returns a handle."""
+        key = normalize_combo(combo)
+        window = self.debounce if debounce is None else debounce
+
+        def on_hotkey():
+            now = time.monotonic()
+            with self._lock:
+                last = self._last_fired.get(key)
+                if key in self._held or (last is not None and now - last < window):
+                    self.stats["debounced"] += 1
+                    return
+                self._held.add(key)
+                self._last_fired[key] = now
+                self.stats["fired"] += 1
+            callback()
+            with self._lock:
+                self.stats["callback_seconds"] += time.monotonic() - now
+
+        with self._lock:
+            self._combos[key] = combo
+            if self._release_handle is None:
+                self._release_handle = self.backend.on_release(self._on_release)
+        handle = self.backend.add_hotkey(combo, on_hotkey)
+        self._handles.append(handle)
+        return handle
+
+    def unregister(self, handle):
+        self.backend.remove_hotkey(handle)
+        self._handles.remove(handle)
+        if not self._handles and self._release_handle is not None:
+            self.backend.remove_release(self._release_handle)
+            self._release_handle = None
+
+    def unregister_all(self):
+        for handle in list(self._handles):
+            self.unregister(handle)
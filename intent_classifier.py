@@ -0,0 +1,213 @@
+import os
+import re
+import math
+from collections import Counter
+
+# Below this confidence classify_query_intent falls back to the LLM (1 = always ask the LLM)
+CONFIDENCE_THRESHOLD = float(os.getenv("FLOWSYNC_INTENT_THRESHOLD", "0.75"))
+
+# === Rules ===
+# Imperative desktop actions at the start of the query (after politeness fillers)
+_FILLERS = (
+    r"^(?:(?:please|pls|hey|ok|okay|now|also|then|can you|could you|would you|will you|help me|i want to|i need to|"
+    r"i'd like to|let's|go ahead and)\s+)*"
+)
+# Commands that are hardly ever the start of a question ("double-click ...", "unzip ...", "scroll down")
+AUTOMATION_RULE = re.compile(
+    _FILLERS +
+    r"(?:click|double[- ]click|right[- ]click|install|uninstall|unzip|unmute|take a screenshot|"
+    r"scroll (?:up|down)|zoom (?:in|out)|shut ?down|log ?out|sign ?out)\b",
+    re.IGNORECASE,
+)
+# Everything else a command starts with is also an ordinary word ("book recommendations", "type of
+# animals", "switch vs router", "save money tips"), so it only counts as automation with a desktop
+# target in the same sentence, and never in a comparison or an explanation request
+_UI_VERBS = (
+    r"(?:open|launch|restart|close|quit|exit|press|type|enter|send|reply|forward|compose|email|copy|paste|save|"
+    r"download|upload|delete|remove|rename|move|insert|switch|go to|navigate|browse|visit|search for|search|pause|"
+    r"mute|toggle|enable|disable|minimi[sz]e|maximi[sz]e|resize|scroll|highlight|bold|underline|print|"
+    r"schedule|book|lock|refresh|reload|zip|screenshot|submit|pin|unpin|bookmark|attach|zoom|join|"
+    r"subscribe|write|make|new|create|add|set|change|start|run|stop|play|turn|record|clear|find|fill|cut|"
+    r"select|format|sort|filter|share|extract|message)\b"
+)
+UI_VERB_RULE = re.compile(
+    _FILLERS + _UI_VERBS +
+    r"(?![^.?!]*\b(?:vs|versus|difference|explained|meaning|tips|ideas|recommendations|examples)\b)"
+    r"[^.?!]*\b(?:app|apps|application|program|window|windows|tab|tabs|browser|chrome|firefox|microsoft edge|"
+    r"google|youtube|spotify|calculator|website|page|link|url|search box|search bar|text box|chat|slides?|photos?|"
+    r"pictures?|images?|music|drive|"
+    r"file|files|folder|folders|document|pdf|spreadsheet|excel|microsoft word|ms word|powerpoint|notepad|"
+    r"e-?mail|mail|inbox|whatsapp|slack|teams|outlook|gmail|bold|italic|font|column|row|cells?|desktop|screen|"
+    r"laptop|pc|wallpaper|settings|volume|brightness|bluetooth|wi-?fi|alarm|timer|reminder|calendar|meeting|"
+    r"playlist|video|song|channel|cab|taxi|uber|flight|button|icon|start menu|shortcut|form|cache|clipboard|"
+    r"recycle bin|trash|downloads|dark mode|light mode)\b",
+    re.IGNORECASE,
+)
+GENERAL_RULE = re.compile(
+    r"^(?:what|what's|whats|why|who|whom|whose|when|where|which|explain|define|describe|summari[sz]e|"
+    r"tell me (?:about|what|why|who)|is it true|meaning of|translate|compare|difference between|"
+    r"how (?:does|do|did|is|are|was|were|many|much|long|old|far)\b(?! i\b))",
+    re.IGNORECASE,
+)
+AMBIGUOUS_START = re.compile(_FILLERS + _UI_VERBS, re.IGNORECASE)
+RULE_CONFIDENCE = 0.95
+AMBIGUOUS_CONFIDENCE = 0.5   # an "automation" guess for "type of animals ..." is left to the LLM
+
+# === Training Data ===
+TRAINING_EXAMPLES = [
+    ("open chrome and go to youtube", "automation"),
+    ("launch notepad", "automation"),
+    ("close all the open windows", "automation"),
+    ("send a message to john on whatsapp saying i'll be late", "automation"),
+    ("type hello world in the document", "automation"),
+    ("save this file as report.docx", "automation"),
+    ("create a new folder on the desktop called projects", "automation"),
+    ("play the first video in the search results", "automation"),
+    ("search google for the weather in hyderabad", "automation"),
+    ("turn on dark mode", "automation"),
+    ("change the wallpaper", "automation"),
+    ("how do i change my wallpaper", "automation"),
+    ("how can i take a screenshot", "automation"),
+    ("how to create a new excel sheet", "automation"),
+    ("i want to send this document by email", "automation"),
+    ("can you mute the volume", "automation"),
+    ("please copy this text and paste it into word", "automation"),
+    ("reply to this email with thanks", "automation"),
+    ("rename the file to final version", "automation"),
+    ("delete the selected files", "automation"),
+    ("minimize this window", "automation"),
+    ("switch to the next tab", "automation"),
+    ("open settings and enable bluetooth", "automation"),
+    ("install vs code", "automation"),
+    ("schedule a meeting for tomorrow at 10am", "automation"),
+    ("fill in the form with my details", "automation"),
+    ("download this pdf", "automation"),
+    ("make the text bold", "automation"),
+    ("help me book a cab", "automation"),
+    ("set an alarm for 7am", "automation"),
+    ("scroll down to the comments", "automation"),
+    ("log out of my account", "automation"),
+    ("restart the computer", "automation"),
+    ("print this page", "automation"),
+    ("write an email to my manager asking for leave", "automation"),
+    ("join the teams meeting", "automation"),
+    ("subscribe to this channel", "automation"),
+    ("add this song to my playlist", "automation"),
+    ("sort the column by date", "automation"),
+    ("navigate to the downloads folder", "automation"),
+    ("what is on my screen", "general"),
+    ("what does this error mean", "general"),
+    ("explain this code", "general"),
+    ("summarize this article", "general"),
+    ("who is the author of this paper", "general"),
+    ("why is my computer slow", "general"),
+    ("what is machine learning", "general"),
+    ("tell me about the history of india", "general"),
+    ("how does photosynthesis work", "general"),
+    ("what time is it in london", "general"),
+    ("define recursion", "general"),
+    ("is this email a scam", "general"),
+    ("what are the main points in this document", "general"),
+    ("translate this paragraph to hindi", "general"),
+    ("which option should i choose", "general"),
+    ("what's the difference between ram and storage", "general"),
+    ("give me a joke", "general"),
+    ("write a poem about rain", "general"),
+    ("what should i reply to this message", "general"),
+    ("is python better than java", "general"),
+    ("how many words are in this paragraph", "general"),
+    ("describe what you see", "general"),
+    ("what is the capital of france", "general"),
+    ("suggest a good title for this essay", "general"),
+    ("any tips for this interview", "general"),
+    ("can you explain the chart", "general"),
+    ("what does the warning say", "general"),
+    ("is this code correct", "general"),
+    ("recommend a laptop under 50000", "general"),
+    ("thanks that was helpful", "general"),
+    ("hi", "general"),
+    ("hello good morning", "general"),
+    ("where is this place", "general"),
+    ("compare these two products", "general"),
+    ("what's wrong with my sentence", "general"),
+    ("how old is the universe", "general"),
+    ("calculate 15 percent of 2400", "general"),
+    ("proofread this text", "general"),
+    ("what do you think about this design", "general"),
+    ("give me ideas for a birthday gift", "general"),
+    ("how much does this cost", "general"),
+    ("write a short story about a dragon", "general"),
+    ("make a plan for my exam preparation", "general"),
+    ("find the mistake in this sentence", "general"),
+    ("new ways to save money", "general"),
+    ("clear my doubt about compound interest", "general"),
+    ("set realistic goals for the next month", "general"),
+    ("start with the basics of statistics", "general"),
+    ("help me understand this poem", "general"),
+    ("type of government in ancient rome", "general"),
+    ("book review of the great gatsby", "general"),
+    ("print vs println in java", "general"),
+    ("open ended questions for an interview", "general"),
+    ("copy writing tips for beginners", "general"),
+    ("join operations in databases", "general"),
+    ("save energy at home", "general"),
+    ("switch statements in javascript", "general"),
+    ("delete operator in c plus plus", "general"),
+    ("close friends vs acquaintances", "general"),
+    ("record label business model", "general"),
+    ("press conference summary", "general"),
+    ("highlight the main argument of this essay", "general"),
+]
+
+
+def tokenize(text):
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntent:
+    """Multinomial naive Bayes over unigrams and bigrams with Laplace smoothing."""
+
+    def __init__(self, examples):
+        self.labels = sorted({label for _, label in examples})
+        self.word_counts = {label: Counter() for label in self.labels}
+        label_counts = Counter()
+        for text, label in examples:
+            self.word_counts[label].update(tokenize(text))
+            label_counts[label] += 1
+        self.vocab_size = len({w for counts in self.word_counts.values() for w in counts})
+        self.totals = {label: sum(self.word_counts[label].values()) for label in self.labels}
+        self.log_priors = {label: math.log(label_counts[label] / len(examples)) for label in self.labels}
+
+    def predict(self, text):
+        """Returns (label, probability) for the most likely label."""
+        tokens = tokenize(text)
+        scores = {}
+        for label in self.labels:
+            denominator = self.totals[label] + self.vocab_size
+            counts = self.word_counts[label]
+            scores[label] = self.log_priors[label] + sum(math.log((counts[t] + 1) / denominator) for t in tokens)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        total = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / total
+
+
+_model = NaiveBayesIntent(TRAINING_EXAMPLES)
+
+
+def classify(query):
+    """Classifies a screen-mode query as "automation" or "general".
+
+    Returns (label, confidence, source) where source is "rule" or "model".
+    """
+    text = query.strip()
+    if AUTOMATION_RULE.match(text) or UI_VERB_RULE.match(text):
+        return "automation", RULE_CONFIDENCE, "rule"
+    if GENERAL_RULE.match(text):
+        return "general", RULE_CONFIDENCE, "rule"
+    label, confidence = _model.predict(text)
+    if label == "automation" and AMBIGUOUS_START.match(text):
+        # One of the verbs above without a desktop target: as likely a question as a command
+        confidence = min(confidence, AMBIGUOUS_CONFIDENCE)
+    return label, confidence, "model"
@@ -0,0 +1,65 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that performs the real import on first attribute access."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_lazy_name"])
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def is_loaded(self):
+        return self.__dict__["_lazy_module"] is not None
+
+
+def lazy_import(name):
+    """Returns a lazily imported module: `pd = lazy_import("pandas")`."""
+    return LazyModule(name)
+
+
+class LazyAttribute:
+    """Stand-in for a class or function from a heavy module, resolved on first use."""
+
+    def __init__(self, module_name, attr):
+        self._module = LazyModule(module_name)
+        self._attr = attr
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = getattr(self._module, self._attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+
+def lazy_attr(module_name, attr):
+    """Returns a lazily resolved attribute: `FAISS = lazy_attr("langchain_community.vectorstores", "FAISS")`."""
+    return LazyAttribute(module_name, attr)
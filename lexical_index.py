@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter, defaultdict
+from lazy_imports import lazy_attr
+
+Document = lazy_attr("langchain_core.documents", "Document")
+
+LEXICAL_FILE = "lexical.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Identifiers such as "AB-1234", "4.2.1" or "Q3_total" are kept whole and also split into parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:#][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:#]")
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(TOKEN_SEPARATORS.split(token))
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunks, keyed by the same ids as the FAISS docstore.
+
+    Answers exact-term queries (part numbers, clause ids, cell values) that
+    dense retrieval misses, and needs no embedding call, so it also serves
+    as the offline path.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}                       # id -> [text, metadata]
+        self.lengths = {}                    # id -> token count
+        self.postings = defaultdict(dict)    # term -> {id: term frequency}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, text, metadata=None):
+        if doc_id in self.docs:
+            return
+        terms = Counter(tokenize(text))
+        self.docs[doc_id] = [text, metadata or {}]
+        self.lengths[doc_id] = sum(terms.values())
+        self.total_length += self.lengths[doc_id]
+        for term, count in terms.items():
+            self.postings[term][doc_id] = count
+
+    def set_metadata(self, doc_id, metadata):
+        if doc_id in self.docs:
+            self.docs[doc_id][1] = metadata or {}
+
+    def remove(self, doc_id):
+        entry = self.docs.pop(doc_id, None)
+        if entry is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in set(tokenize(entry[0])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def stats(self, terms):
+        """(chunk count, total length, {term: document frequency}) for combining indexes in `search_all`."""
+        return len(self.docs), self.total_length, {term: len(self.postings.get(term, ())) for term in terms}
+
+    def search(self, query, k=4, stats=None):
+        """Returns up to `k` (Document, BM25 score) pairs, best first.
+
+        `stats` (count, total length, document frequencies) replaces this
+        index's own, so scores from several indexes are comparable.
+        """
+        if not self.docs:
+            return []
+        terms = set(tokenize(query))
+        count, total_length, frequencies = stats or self.stats(terms)
+        average = total_length / count or 1
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        top = heapq.nlargest(k, scores.items(), key=lambda pair: pair[1])
+        return [(Document(page_content=self.docs[doc_id][0], metadata=self.docs[doc_id][1], id=doc_id), score)
+                for doc_id, score in top]
+
+    def save(self, directory):
+        path = os.path.join(directory, LEXICAL_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.docs, "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, directory):
+        """Loads the index saved in `directory`, or returns None if there is none."""
+        try:
+            with open(os.path.join(directory, LEXICAL_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        index = cls(data["k1"], data["b"])
+        index.docs = data["docs"]
+        index.postings = defaultdict(dict, data["postings"])
+        for postings in index.postings.values():
+            for doc_id, tf in postings.items():
+                index.lengths[doc_id] = index.lengths.get(doc_id, 0) + tf
+        index.total_length = sum(index.lengths.values())
+        for doc_id in index.docs:
+            index.lengths.setdefault(doc_id, 0)
+        return index
+
+    @classmethod
+    def from_vector_store(cls, store):
+        """Builds the index from a FAISS store's docstore (for indexes saved without one)."""
+        index = cls()
+        for doc_id in store.index_to_docstore_id.values():
+            doc = store.docstore.search(doc_id)
+            if hasattr(doc, "page_content"):
+                index.add(doc_id, doc.page_content, doc.metadata)
+        return index
+
+
+def search_all(lexicals, query, k=4):
+    """One BM25 ranking over several indexes, scored as if they were a single corpus.
+
+    Chunk counts, lengths and document frequencies are summed across the
+    indexes first, so a term rare in one document but common overall is not
+    over-weighted. A chunk held by several indexes appears once.
+    """
+    terms = set(tokenize(query))
+    count, total_length, frequencies = 0, 0, Counter()
+    for lexical in lexicals:
+        chunks, length, found = lexical.stats(terms)
+        count += chunks
+        total_length += length
+        frequencies.update(found)
+    if not count:
+        return []
+    stats = (count, total_length, frequencies)
+    ranked = sorted((pair for lexical in lexicals for pair in lexical.search(query, k=k, stats=stats)),
+                    key=lambda pair: pair[1], reverse=True)
+    seen, top = set(), []
+    for doc, score in ranked:
+        if doc.id in seen:
+            continue
+        seen.add(doc.id)
+        top.append((doc, score))
+        if len(top) == k:
+            break
+    return top
+
+
+def attach(store, lexical):
+    """Keeps the lexical index on its FAISS store, so every index list carries both."""
+    if store is not None:
+        store.lexical_index = lexical
+    return store
+
+
+def lexical_for(store):
+    """Returns the store's lexical index, building it from the docstore on first use."""
+    lexical = getattr(store, "lexical_index", None)
+    if lexical is None:
+        lexical = LexicalIndex.from_vector_store(store)
+        attach(store, lexical)
+    return lexical
@@ -0,0 +1,188 @@
+import hashlib
+import threading
+from lazy_imports import lazy_import
+from tracing import count
+
+np = lazy_import("numpy")
+
+# === Tiling Settings ===
+TILE_SIZE = 128          # pixels per tile side
+REGION_MARGIN = 12       # padding around changed tiles so glyphs cut at tile edges are re-read whole
+FULL_OCR_RATIO = 0.6     # above this share of changed pixels a full-frame pass is cheaper
+
+
+def box_rect(bbox):
+    """Axis-aligned (x0, y0, x1, y1) of an EasyOCR quadrilateral."""
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _merge_rects(rects):
+    """Merges overlapping rectangles until none overlap."""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if _intersects(rects[i], rects[j]):
+                    rects[i] = _union(rects[i], rects.pop(j))
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+def sort_reading_order(results, line_tolerance=0.5):
+    """Orders OCR results top-to-bottom by line, then left-to-right within a line."""
+    entries = sorted(results, key=lambda r: box_rect(r[0])[1])
+    lines = []
+    for entry in entries:
+        x0, y0, x1, y1 = box_rect(entry[0])
+        center = (y0 + y1) / 2
+        if lines:
+            line_center, line_height, line = lines[-1]
+            if abs(center - line_center) <= line_tolerance * max(line_height, y1 - y0):
+                line.append(entry)
+                continue
+        lines.append((center, y1 - y0, [entry]))
+    ordered = []
+    for _, _, line in lines:
+        ordered.extend(sorted(line, key=lambda r: box_rect(r[0])[0]))
+    return ordered
+
+
+class IncrementalOCR:
+    """Screen OCR that only re-reads the parts of a frame that changed since the last one.
+
+    Frames are split into tiles and hashed. Changed tiles are grouped into
+    padded regions, EasyOCR runs on those crops only, and the cached results
+    for untouched areas are stitched back in reading order.
+    """
+
+    def __init__(self, reader_factory, tile_size=TILE_SIZE, margin=REGION_MARGIN, full_ratio=FULL_OCR_RATIO):
+        self._get_reader = reader_factory
+        self.tile_size = tile_size
+        self.margin = margin
+        self.full_ratio = full_ratio
+        self._lock = threading.Lock()
+        self._shape = None
+        self._hashes = None
+        self._results = []
+        self.stats = {"frames": 0, "full_passes": 0, "tiles_total": 0, "tiles_changed": 0, "regions": 0}
+
+    def reset(self):
+        with self._lock:
+            self._shape = None
+            self._hashes = None
+            self._results = []
+
+    def _tile_hashes(self, frame):
+        size = self.tile_size
+        height, width = frame.shape[:2]
+        return [
+            [hashlib.blake2b(np.ascontiguousarray(frame[y:y + size, x:x + size]).tobytes(), digest_size=16).digest()
+             for x in range(0, width, size)]
+            for y in range(0, height, size)
+        ]
+
+    def _changed_regions(self, changed, shape):
+        """Groups changed tiles into connected components and returns padded pixel rectangles."""
+        size, margin = self.tile_size, self.margin
+        height, width = shape[:2]
+        remaining = set(changed)
+        rects = []
+        while remaining:
+            stack = [remaining.pop()]
+            rows, cols = [], []
+            while stack:
+                row, col = stack.pop()
+                rows.append(row)
+                cols.append(col)
+                for neighbour in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+                    if neighbour in remaining:
+                        remaining.remove(neighbour)
+                        stack.append(neighbour)
+            rects.append((
+                max(0, min(cols) * size - margin),
+                max(0, min(rows) * size - margin),
+                min(width, (max(cols) + 1) * size + margin),
+                min(height, (max(rows) + 1) * size + margin),
+            ))
+        return _merge_rects(rects)
+
+    def _ocr(self, frame, rect=None):
+        if rect is None:
+            count("ocr_pixels", frame.shape[0] * frame.shape[1])
+            return [tuple(r) for r in self._get_reader().readtext(frame, detail=1)]
+        x0, y0, x1, y1 = (int(v) for v in rect)
+        crop = np.ascontiguousarray(frame[y0:y1, x0:x1])
+        count("ocr_pixels", crop.shape[0] * crop.shape[1])
+        return [
+            ([[p[0] + x0, p[1] + y0] for p in bbox], text, confidence)
+            for bbox, text, confidence in self._get_reader().readtext(crop, detail=1)
+        ]
+
+    def read(self, frame):
+        """Returns [(bbox, text, confidence)] for an RGB frame (H x W x C array) in reading order."""
+        with self._lock:
+            hashes = self._tile_hashes(frame)
+            tiles = sum(len(row) for row in hashes)
+            self.stats["frames"] += 1
+            self.stats["tiles_total"] += tiles
+
+            if self._hashes is None or self._shape != frame.shape:
+                results = self._ocr(frame)
+                self.stats["full_passes"] += 1
+                self.stats["tiles_changed"] += tiles
+            else:
+                changed = {
+                    (r, c) for r, row in enumerate(hashes) for c, digest in enumerate(row)
+                    if digest != self._hashes[r][c]
+                }
+                self.stats["tiles_changed"] += len(changed)
+                results = self._update(frame, changed)
+
+            self._shape = frame.shape
+            self._hashes = hashes
+            self._results = sort_reading_order(results)
+            return list(self._results)
+
+    def _update(self, frame, changed):
+        if not changed:
+            return self._results
+        regions = _merge_rects(self._changed_regions(changed, frame.shape))
+        # Grow regions over cached boxes they cut through, so partially changed words are re-read whole.
+        # Repeated until nothing changes: a grown region can reach boxes the changed tiles did not.
+        rects = [box_rect(result[0]) for result in self._results]
+        while True:
+            grown = list(regions)
+            for rect in rects:
+                for i, region in enumerate(grown):
+                    if _intersects(rect, region):
+                        grown[i] = _union(region, rect)
+            grown = _merge_rects(grown)
+            if grown == regions:
+                break
+            regions = grown
+
+        changed_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        if changed_area >= self.full_ratio * frame.shape[0] * frame.shape[1]:
+            self.stats["full_passes"] += 1
+            return self._ocr(frame)
+
+        kept = [r for r in self._results if not any(_intersects(box_rect(r[0]), region) for region in regions)]
+        self.stats["regions"] += len(regions)
+        for region in regions:
+            kept.extend(self._ocr(frame, region))
+        return kept
@@ -0,0 +1,141 @@
+import math
+from collections import defaultdict
+from difflib import SequenceMatcher
+from ocr_engine import box_rect
+
+GRID_CELL = 64          # pixels per spatial grid cell
+MIN_GRAM_OVERLAP = 0.4  # share of the label's trigrams a candidate must contain
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class OCRElement:
+    __slots__ = ("id", "text", "norm", "bbox", "rect", "center", "confidence")
+
+    def __init__(self, element_id, bbox, text, confidence):
+        self.id = element_id
+        self.text = text
+        self.norm = normalize(text)
+        self.bbox = bbox
+        self.rect = box_rect(bbox)
+        self.center = ((self.rect[0] + self.rect[2]) / 2, (self.rect[1] + self.rect[3]) / 2)
+        self.confidence = confidence
+
+    def __repr__(self):
+        return f"OCRElement({self.text!r}, center=({self.center[0]:.0f}, {self.center[1]:.0f}))"
+
+
+class OCRIndex:
+    """Lookup structure over one capture's OCR boxes.
+
+    A trigram index narrows fuzzy label matches to a few candidates and a
+    uniform grid answers region and nearest-neighbour queries, so lookups
+    cost microseconds instead of an OCR pass. Coordinates are frame pixels.
+    """
+
+    def __init__(self, results, cell_size=GRID_CELL):
+        self.cell_size = cell_size
+        self.elements = [OCRElement(i, bbox, text, conf) for i, (bbox, text, conf) in enumerate(results)]
+        self._grams = defaultdict(set)
+        self._grid = defaultdict(list)
+        self._extent = 0
+        for element in self.elements:
+            self._extent = max(self._extent, element.rect[2], element.rect[3])
+            for gram in trigrams(element.norm):
+                self._grams[gram].add(element.id)
+            for cell in self._cells(element.rect):
+                self._grid[cell].append(element.id)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def _cells(self, rect):
+        size = self.cell_size
+        for cx in range(int(rect[0] // size), int(rect[2] // size) + 1):
+            for cy in range(int(rect[1] // size), int(rect[3] // size) + 1):
+                yield cx, cy
+
+    @staticmethod
+    def _score(label, element, min_score):
+        if label == element.norm:
+            return 1.0
+        if label in element.norm:
+            # Substring hits rank by how much of the element the label covers
+            return 0.8 + 0.2 * len(label) / len(element.norm)
+        matcher = SequenceMatcher(None, label, element.norm)
+        # quick_ratio() is a cheap upper bound; skip the full comparison when it can't pass
+        return matcher.ratio() if matcher.quick_ratio() >= min_score else 0.0
+
+    def find(self, label, limit=5, min_score=0.6):
+        """Returns up to `limit` (element, score) pairs whose text best matches `label`."""
+        label = normalize(label)
+        if not label:
+            return []
+        grams = trigrams(label)
+        votes = defaultdict(int)
+        for gram in grams:
+            for element_id in self._grams.get(gram, ()):
+                votes[element_id] += 1
+        needed = max(1, int(len(grams) * MIN_GRAM_OVERLAP))
+        scored = []
+        for element_id, count in votes.items():
+            if count < needed:
+                continue
+            element = self.elements[element_id]
+            score = self._score(label, element, min_score)
+            if score >= min_score:
+                scored.append((element, score))
+        scored.sort(key=lambda pair: (-pair[1], pair[0].id))
+        return scored[:limit]
+
+    def find_best(self, label, min_score=0.6):
+        matches = self.find(label, limit=1, min_score=min_score)
+        return matches[0][0] if matches else None
+
+    def in_region(self, x0, y0, x1, y1):
+        """Returns elements whose boxes intersect the rectangle, in reading order."""
+        region = (x0, y0, x1, y1)
+        found = set()
+        for cell in self._cells(region):
+            for element_id in self._grid.get(cell, ()):
+                rect = self.elements[element_id].rect
+                if rect[0] < x1 and x0 < rect[2] and rect[1] < y1 and y0 < rect[3]:
+                    found.add(element_id)
+        return [self.elements[i] for i in sorted(found)]
+
+    def nearest(self, x, y, limit=1, exclude=None):
+        """Returns the `limit` elements whose centres are closest to (x, y)."""
+        if not self.elements:
+            return []
+        size = self.cell_size
+        cx, cy = int(x // size), int(y // size)
+        max_ring = int(max(self._extent, x, y) // size) + 1
+        found = {}
+        for ring in range(max_ring + 1):
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in range(cy - ring, cy + ring + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != ring:
+                        continue
+                    for element_id in self._grid.get((gx, gy), ()):
+                        if element_id != exclude and element_id not in found:
+                            element = self.elements[element_id]
+                            found[element_id] = math.dist((x, y), element.center)
+            # Anything outside the searched rings is at least `ring * size` away
+            if len(found) >= limit and sorted(found.values())[limit - 1] <= ring * size:
+                break
+        ordered = sorted(found, key=found.get)[:limit]
+        return [self.elements[i] for i in ordered]
+
+    def nearest_to(self, label, limit=1):
+        """Returns the elements closest to the one labelled `label`."""
+        anchor = self.find_best(label)
+        if anchor is None:
+            return []
+        return self.nearest(*anchor.center, limit=limit, exclude=anchor.id)
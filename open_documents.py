@@ -0,0 +1,456 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from lazy_imports import lazy_import
+
+psutil = lazy_import("psutil")
+win32gui = lazy_import("win32gui")
+win32process = lazy_import("win32process")
+win32file = lazy_import("win32file")
+
+# === Settings ===
+DETECTION_BACKEND = os.getenv("FLOWSYNC_DETECTION_BACKEND", "auto")  # "auto", "windows", "linux" or "synthetic"
+OPEN_FILES_TTL = float(os.getenv("FLOWSYNC_OPEN_FILES_TTL", "2"))    # seconds a process's open-file scan is reused
+COPY_DIR = os.path.join(tempfile.gettempdir(), "flowsync_documents")
+FOCUS_POLL_SECONDS = 0.1   # re-check interval while waiting for a document window, when no focus event arrives
+COPY_BLOCK_BYTES = 1024 * 1024
+
+FILE_TYPES = {
+    '.docx': "Word Document",
+    '.pdf': "PDF Document",
+    '.txt': "Text File",
+    '.xlsx': "Excel Spreadsheet",
+    '.xls': "Excel Spreadsheet",
+    '.pptx': "PowerPoint Presentation",
+    '.ppt': "PowerPoint Presentation",
+    '.csv': "CSV File",
+    '.json': "JSON File"
+}
+
+
+# Without focus information any process may be the match, and one holding a .txt or .json is far
+# more often a log or config reader than a document window
+SCAN_TYPES = set(FILE_TYPES) - {".txt", ".json"}
+
+
+def is_document(path, types=FILE_TYPES):
+    return os.path.splitext(path)[1].lower() in types
+
+
+def _unique(paths):
+    return list(dict.fromkeys(paths))
+
+
+class ProcessRef:
+    """The parts of a process detection reports; `pid` and `name()` match psutil.Process."""
+    __slots__ = ("pid", "_name")
+
+    def __init__(self, pid, name=""):
+        self.pid = pid
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return f"ProcessRef(pid={self.pid}, name={self._name!r})"
+
+
+class WindowsBackend:
+    """Foreground window through win32gui, open files through psutil, copies through share-mode reads."""
+
+    def active_pid(self):
+        hwnd = win32gui.GetForegroundWindow()
+        if not hwnd:
+            return None
+        return win32process.GetWindowThreadProcessId(hwnd)[1]
+
+    def watch_focus(self, callback):
+        return False
+
+    def window_pids(self):
+        """Owners of the visible, titled top-level windows, front to back (EnumWindows walks the Z order)."""
+        windows = []
+
+        def collect(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd) and win32gui.GetWindowText(hwnd):
+                windows.append(hwnd)
+            return True
+
+        win32gui.EnumWindows(collect, None)
+        return _unique(win32process.GetWindowThreadProcessId(hwnd)[1] for hwnd in windows)
+
+    def process_name(self, pid):
+        try:
+            return psutil.Process(pid).name()
+        except psutil.Error:
+            return ""
+
+    def start_time(self, pid):
+        try:
+            return psutil.Process(pid).create_time()
+        except psutil.Error:
+            return None
+
+    def open_files(self, pid):
+        try:
+            return _unique(f.path for f in psutil.Process(pid).open_files() if is_document(f.path))
+        except psutil.Error as e:
+            print(f"[ERROR] Could not retrieve file path: {e}")
+            return []
+
+    def candidate_pids(self):
+        return []
+
+    def copy_file(self, source, destination):
+        """Reads with FILE_SHARE_READ | WRITE | DELETE, so a file Office holds open can still be copied."""
+        try:
+            shutil.copyfile(source, destination)
+            return
+        except PermissionError:
+            pass
+        handle = win32file.CreateFile(
+            source, win32file.GENERIC_READ,
+            win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
+            None, win32file.OPEN_EXISTING, 0, None,
+        )
+        try:
+            with open(destination, "wb") as out:
+                while True:
+                    _, data = win32file.ReadFile(handle, COPY_BLOCK_BYTES)
+                    if not data:
+                        break
+                    out.write(data)
+        finally:
+            handle.Close()
+
+
+class LinuxProcBackend:
+    """Open documents from /proc/<pid>/fd and command lines; focus from X11 `xprop` when available.
+
+    Needs no window system: on Wayland or a headless box `active_pid` is
+    None (or FLOWSYNC_ACTIVE_PID), and the detector falls back to the newest
+    session process holding an office document, PDF or CSV.
+    """
+
+    def __init__(self, proc="/proc"):
+        self.proc = proc
+
+    def _xprop(self, *args):
+        try:
+            result = subprocess.run(["xprop", *args], capture_output=True, text=True, timeout=1)
+        except (OSError, subprocess.SubprocessError):
+            return ""
+        return result.stdout
+
+    def _window_pid(self, window_id):
+        output = self._xprop("-id", window_id, "_NET_WM_PID")
+        value = output.rpartition("=")[2].strip()
+        return int(value) if value.isdigit() else None
+
+    def active_pid(self):
+        forced = os.getenv("FLOWSYNC_ACTIVE_PID")
+        if forced:
+            return int(forced)
+        if not os.getenv("DISPLAY"):
+            return None
+        window_id = self._xprop("-root", "_NET_ACTIVE_WINDOW").rpartition("#")[2].strip()
+        return self._window_pid(window_id) if window_id.startswith("0x") else None
+
+    def watch_focus(self, callback):
+        """Calls `callback(pid)` on every X11 focus change (`xprop -spy`); False if there is no X display."""
+        if not os.getenv("DISPLAY") or shutil.which("xprop") is None:
+            return False
+        spy = subprocess.Popen(["xprop", "-spy", "-root", "_NET_ACTIVE_WINDOW"],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+        def run():
+            for line in spy.stdout:
+                window_id = line.rpartition("#")[2].strip()
+                if window_id.startswith("0x"):
+                    callback(self._window_pid(window_id))
+
+        threading.Thread(target=run, name="focus-watch", daemon=True).start()
+        return True
+
+    def window_pids(self):
+        """Owners of the managed windows, front to back (`_NET_CLIENT_LIST_STACKING`); lazily, one xprop per window."""
+        if not os.getenv("DISPLAY"):
+            return
+        stacking = self._xprop("-root", "_NET_CLIENT_LIST_STACKING").partition("#")[2]
+        seen = set()
+        for window_id in reversed([window.strip() for window in stacking.split(",")]):
+            pid = self._window_pid(window_id) if window_id.startswith("0x") else None
+            if pid is not None and pid not in seen:
+                seen.add(pid)
+                yield pid
+
+    def process_name(self, pid):
+        try:
+            with open(f"{self.proc}/{pid}/comm", "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def start_time(self, pid):
+        try:
+            with open(f"{self.proc}/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # Field 22 (starttime); the command name before it may contain spaces and parentheses
+        return int(stat.rpartition(b")")[2].split()[19])
+
+    def open_files(self, pid):
+        paths = []
+        fd_dir = f"{self.proc}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return []
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("/") and is_document(target):
+                paths.append(target)
+        # Viewers that read the file and close it (LibreOffice, Evince, editors) still name it on their command line
+        try:
+            with open(f"{self.proc}/{pid}/cmdline", "rb") as f:
+                args = f.read().split(b"\0")[1:]
+            cwd = os.readlink(f"{self.proc}/{pid}/cwd")
+        except OSError:
+            args, cwd = [], "/"
+        for arg in args:
+            path = os.fsdecode(arg)
+            if is_document(path):
+                path = os.path.join(cwd, path)
+                if os.path.isfile(path):
+                    paths.append(path)
+        return _unique(paths)
+
+    def candidate_pids(self):
+        """The user's processes, most recently started first."""
+        uid, own = os.getuid(), os.getpid()
+        pids = []
+        for entry in os.listdir(self.proc):
+            if not entry.isdigit() or int(entry) == own:
+                continue
+            try:
+                if os.stat(f"{self.proc}/{entry}").st_uid != uid:
+                    continue
+            except OSError:
+                continue
+            pids.append(int(entry))
+        return sorted(pids, key=lambda pid: self.start_time(pid) or 0, reverse=True)
+
+    def copy_file(self, source, destination):
+        # POSIX has no mandatory locks, so a plain read never disturbs the owning application
+        shutil.copyfile(source, destination)
+
+
+class SyntheticBackend:
+    """In-process backend for tests and benchmarks: `focus()` stands in for the user switching windows."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = {}    # pid -> (name, open files)
+        self._active = None
+        self._stacking = []     # focused pids, back to front
+        self._watchers = []
+        self.scans = 0
+
+    def add_process(self, pid, name, files=()):
+        with self._lock:
+            self._processes[pid] = (name, list(files))
+
+    def focus(self, pid):
+        self._active = pid
+        self._stacking = [other for other in self._stacking if other != pid] + [pid]
+        for callback in list(self._watchers):
+            callback(pid)
+
+    def active_pid(self):
+        return self._active
+
+    def watch_focus(self, callback):
+        self._watchers.append(callback)
+        return True
+
+    def window_pids(self):
+        return _unique(reversed(self._stacking))
+
+    def process_name(self, pid):
+        return self._processes.get(pid, ("", []))[0]
+
+    def start_time(self, pid):
+        return 0 if pid in self._processes else None
+
+    def open_files(self, pid):
+        self.scans += 1
+        return [path for path in self._processes.get(pid, ("", []))[1] if is_document(path)]
+
+    def candidate_pids(self):
+        return sorted(self._processes, reverse=True)
+
+    def copy_file(self, source, destination):
+        shutil.copyfile(source, destination)
+
+
+def get_backend(name=None):
+    name = name or DETECTION_BACKEND
+    if name == "auto":
+        name = "windows" if sys.platform == "win32" else "linux"
+    if name == "synthetic":
+        return SyntheticBackend()
+    if name == "windows":
+        return WindowsBackend()
+    return LinuxProcBackend()
+
+
+class OpenFileCache:
+    """Process -> open documents, keyed by (pid, start time) so a reused pid never returns stale files."""
+
+    def __init__(self, backend, ttl=OPEN_FILES_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.stats = {"hits": 0, "scans": 0}
+
+    def get(self, pid):
+        key = (pid, self.backend.start_time(pid))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.stats["hits"] += 1
+                return entry[1]
+        files = self.backend.open_files(pid)
+        with self._lock:
+            self._entries[key] = (now, files)
+            self.stats["scans"] += 1
+        return files
+
+    def invalidate(self, pid=None):
+        with self._lock:
+            if pid is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == pid]:
+                    del self._entries[key]
+
+
+class DocumentDetector:
+    """Finds the document open in the focused window without waiting or touching the owning app.
+
+    Focus changes arrive as events where the backend supports them (X11
+    `xprop -spy`, the synthetic backend); FlowSync's own window is ignored,
+    so the document the user was looking at stays the target when the
+    assistant takes focus. Where focus cannot be watched (Windows), the
+    window just behind FlowSync's in the Z order is taken instead. Without
+    any window information (Wayland, headless) the newest process holding
+    an office document, PDF or CSV is used. Open-file scans are cached per
+    process.
+    """
+
+    def __init__(self, backend=None, ttl=OPEN_FILES_TTL):
+        self.backend = backend or get_backend()
+        self.cache = OpenFileCache(self.backend, ttl)
+        self._own_pid = os.getpid()
+        self._focus_pid = None
+        self._watching = False
+        self._focus_changed = threading.Event()
+        self.stats = {"detections": 0, "found": 0, "total_ms": 0.0}
+
+    def start_watching(self):
+        if not self._watching:
+            self._watching = self.backend.watch_focus(self.notify_focus_changed)
+        return self._watching
+
+    def notify_focus_changed(self, pid):
+        if pid is not None and pid != self._own_pid:
+            self._focus_pid = pid
+            self.cache.invalidate(pid)
+        self._focus_changed.set()
+
+    def _foreground_pid(self):
+        if self._watching and self._focus_pid is not None:
+            return self._focus_pid
+        pid = self.backend.active_pid()
+        if pid == self._own_pid and not self._watching:
+            # FlowSync has focus and the switch to it was not seen: the previous foreground window
+            pid = next((pid for pid in self.backend.window_pids() if pid != self._own_pid), None)
+        if pid is not None and pid != self._own_pid:
+            self._focus_pid = pid
+        return self._focus_pid
+
+    def detect_once(self):
+        pid = self._foreground_pid()
+        if pid is not None:
+            files = self.cache.get(pid)
+            return (files[0] if files else None), ProcessRef(pid, self.backend.process_name(pid))
+        # No focus information (Wayland, headless): the newest process holding a document
+        for pid in self.backend.candidate_pids():
+            files = [path for path in self.cache.get(pid) if is_document(path, SCAN_TYPES)]
+            if files:
+                return files[0], ProcessRef(pid, self.backend.process_name(pid))
+        return None, None
+
+    def detect(self, timeout=0.0):
+        """Returns (file_path, process), waiting up to `timeout` seconds for a document window to take focus."""
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        while True:
+            self._focus_changed.clear()
+            file_path, process = self.detect_once()
+            remaining = deadline - time.monotonic()
+            if file_path or remaining <= 0:
+                break
+            self._focus_changed.wait(min(remaining, FOCUS_POLL_SECONDS))
+        self.stats["detections"] += 1
+        self.stats["found"] += bool(file_path)
+        self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+        return file_path, process
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = DocumentDetector()
+            _detector.start_watching()
+        return _detector
+
+
+def copy_for_reading(file_path, directory=COPY_DIR):
+    """Copies a document for indexing while its application keeps it open.
+
+    The copy is written next to its final name and renamed into place, so a
+    reader never sees a half-written file. Each document gets its own
+    subdirectory, so two documents with the same name never share a copy.
+    """
+    folder = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    directory = os.path.join(directory, folder)
+    os.makedirs(directory, exist_ok=True)
+    destination = os.path.join(directory, os.path.basename(file_path))
+    # A unique partial file per call: two threads may copy the same document at once
+    handle, partial = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(file_path)}.", suffix=".part")
+    os.close(handle)
+    try:
+        get_detector().backend.copy_file(file_path, partial)
+        os.replace(partial, destination)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return destination
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from array import array
+from tracing import count
+
+# === Settings ===
+RESPONSE_CACHE_PATH = os.getenv(
+    "FLOWSYNC_RESPONSE_CACHE", os.path.join(tempfile.gettempdir(), "flowsync_responses.sqlite3")
+)
+RESPONSE_CACHE_TTL = float(os.getenv("FLOWSYNC_RESPONSE_CACHE_TTL", str(24 * 3600)))   # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("FLOWSYNC_RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+SIMILAR_MATCHING = os.getenv("FLOWSYNC_RESPONSE_CACHE_SIMILARITY", "0") == "1"
+SIMILARITY_THRESHOLD = 0.95
+
+
+def fingerprint(text):
+    """Short, whitespace-insensitive fingerprint of a screen text, document context or history."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()[:20]
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+def _estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """Persistent LLM response cache keyed by normalised prompt inputs.
+
+    Entries are keyed by (namespace, model, context fingerprint, normalised
+    query), expire after `ttl` seconds and are evicted least-recently-used
+    beyond `max_entries`. With `similar=True`, a miss falls back to the
+    cached query in the same context whose embedding is closest, if it is
+    above `similarity_threshold`.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 embeddings_factory=None, similarity_threshold=SIMILARITY_THRESHOLD, similar_matching=SIMILAR_MATCHING):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.similar_matching = similar_matching and embeddings_factory is not None
+        self._embeddings_factory = embeddings_factory
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, namespace TEXT, model TEXT, context TEXT, query TEXT, "
+            "value TEXT, vector BLOB, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses (namespace, model, context)")
+        self._conn.commit()
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "saved_tokens": 0}
+
+    @staticmethod
+    def make_key(namespace, model, context, query):
+        raw = json.dumps([namespace, model, context, normalize_query(query)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _embed(self, query):
+        return self._embeddings_factory().embed_query(normalize_query(query))
+
+    def get(self, namespace, model, query, context="", similar=False):
+        """Returns the cached value or None; counts a hit or a miss."""
+        now = time.time()
+        key = self.make_key(namespace, model, context, query)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, query, value FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+        kind = "hits"
+        if row is None and similar and self.similar_matching:
+            row = self._most_similar(namespace, model, context, query, now - self.ttl)
+            kind = "similar_hits"
+        if row is None:
+            self.stats["misses"] += 1
+            count("response_cache_misses")
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+        self.stats[kind] += 1
+        count("response_cache_hits")
+        self.stats["saved_tokens"] += _estimate_tokens(row[1] + context) + _estimate_tokens(row[2])
+        return json.loads(row[2])
+
+    def _most_similar(self, namespace, model, context, query, cutoff):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, query, value, vector FROM responses "
+                "WHERE namespace = ? AND model = ? AND context = ? AND vector IS NOT NULL AND created >= ?",
+                (namespace, model, context, cutoff),
+            ).fetchall()
+        if not rows:
+            return None
+        vector = self._embed(query)
+        best, best_score = None, self.similarity_threshold
+        for key, cached_query, value, blob in rows:
+            cached_vector = array("f")
+            cached_vector.frombytes(blob)
+            score = _cosine(vector, cached_vector)
+            if score >= best_score:
+                best, best_score = (key, cached_query, value), score
+        return best
+
+    def put(self, namespace, model, query, value, context="", similar=False):
+        now = time.time()
+        vector = None
+        if similar and self.similar_matching:
+            vector = array("f", self._embed(query)).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(namespace, model, context, query), namespace, model, context,
+                 normalize_query(query), json.dumps(value), vector, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["similar_hits"] + self.stats["misses"]
+        saved = self.stats["hits"] + self.stats["similar_hits"]
+        rate = saved / lookups * 100 if lookups else 0.0
+        return (f"Response cache: {saved}/{lookups} hits ({rate:.0f}%, {self.stats['similar_hits']} similar), "
+                f"~{self.stats['saved_tokens']} tokens saved")
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Returns the process-wide response cache, creating it on first use."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            from embedding_service import get_embedding_service
+            _response_cache = ResponseCache(
+                embeddings_factory=lambda: get_embedding_service(os.getenv("OPENAI_API_KEY"))
+            )
+        return _response_cache
@@ -0,0 +1,174 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from context_builder import build_context, CONTEXT_TOKEN_BUDGET
+from lexical_index import lexical_for, search_all
+from tracing import span, count
+
+# "hybrid": dense + BM25 fused by reciprocal rank; "dense": FAISS only; "lexical": BM25 only, no embedding call
+RETRIEVAL_MODE = os.getenv("FLOWSYNC_RETRIEVAL_MODE", "hybrid")
+RRF_K = 60  # reciprocal-rank fusion constant; higher flattens the rank weighting
+DEFAULT_K = 4
+CONTEXT_CANDIDATES = 12  # chunks fetched for context assembly before MMR and the token budget trim them
+MAX_SEARCH_THREADS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_SEARCH_THREADS, thread_name_prefix="retrieval")
+    return _executor
+
+
+def search_indexes(indexes, query, k=DEFAULT_K, fetch_k=None, embeddings=None, query_vector=None):
+    """Embeds the query once, searches every index in parallel and merges a global top-k.
+
+    Returns (Document, distance) pairs ordered closest first, with duplicate chunks
+    removed. All indexes are expected to share the same embedding model.
+    """
+    indexes = [index for index in indexes if index is not None]
+    if not indexes:
+        return []
+    if query_vector is None:
+        embeddings = embeddings or indexes[0].embeddings
+        query_vector = embeddings.embed_query(query)
+    # Over-fetch per index so duplicates dropped during the merge don't shrink the result
+    fetch_k = fetch_k or k * 2
+
+    def search(index):
+        return index.similarity_search_with_score_by_vector(query_vector, k=fetch_k)
+
+    if len(indexes) == 1:
+        results = [search(indexes[0])]
+    else:
+        results = list(_get_executor().map(search, indexes))
+
+    merged = sorted((pair for result in results for pair in result), key=lambda pair: pair[1])
+    seen, top = set(), []
+    for doc, score in merged:
+        content = doc.page_content.strip()
+        if content in seen:
+            continue
+        seen.add(content)
+        top.append((doc, score))
+        if len(top) == k:
+            break
+    return top
+
+
+def lexical_search(indexes, query, k=DEFAULT_K):
+    """BM25 search over every index's lexical index as one corpus; a single global ranking, nothing embedded."""
+    indexes = [index for index in indexes if index is not None]
+    return search_all([lexical_for(index) for index in indexes], query, k=k)
+
+
+def reciprocal_rank_fusion(rankings, k=DEFAULT_K, rrf_k=RRF_K):
+    """Fuses ranked (Document, score) lists by summed 1 / (rrf_k + rank), merging identical chunks."""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking):
+            content = doc.page_content.strip()
+            scores[content] = scores.get(content, 0.0) + 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(content, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [(docs[content], scores[content]) for content in ordered]
+
+
+def hybrid_search(indexes, query, k=DEFAULT_K, mode=None, query_vector=None):
+    """Returns (Document, fused score) pairs from dense and/or lexical retrieval per `mode`.
+
+    Each side contributes one global ranking across all indexes, so both
+    weigh the same in the fusion however many documents are open. If the
+    query cannot be embedded (e.g. offline), hybrid mode falls back to
+    lexical only.
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode == "dense":
+        return search_indexes(indexes, query, k=k, query_vector=query_vector)
+    rankings = [lexical_search(indexes, query, k=k * 2)]
+    if mode != "lexical":
+        try:
+            rankings.append(search_indexes(indexes, query, k=k * 2, query_vector=query_vector))
+        except Exception as e:
+            print(f"⚠️ Dense retrieval unavailable, using keyword search only: {e}")
+    return reciprocal_rank_fusion(rankings, k=k)
+
+
+def retrieve_documents(indexes, query, k=DEFAULT_K, mode=None):
+    """Returns the globally best `k` documents across all indexes."""
+    return [doc for doc, _ in hybrid_search(indexes, query, k=k, mode=mode)]
+
+
+def vector_positions(store):
+    """{docstore id: FAISS position} for a store, built on first use and kept on the store.
+
+    `index_chunks` drops it whenever it adds or deletes vectors.
+    """
+    positions = getattr(store, "vector_positions", None)
+    if positions is None:
+        positions = {doc_id: position for position, doc_id in store.index_to_docstore_id.items()}
+        store.vector_positions = positions
+    return positions
+
+
+def stored_vectors(indexes, docs):
+    """The vectors of `docs` as stored in the FAISS indexes, looked up by docstore id.
+
+    Chunk ids are content hashes, so any index holding an id holds the
+    chunk's vector. Documents without an id, or whose index cannot
+    reconstruct vectors, are embedded through the (cached) embedding service.
+    """
+    wanted = {doc.id for doc in docs if getattr(doc, "id", None)}
+    found = {}
+    for index in indexes:
+        if len(found) == len(wanted):
+            break
+        positions = vector_positions(index)
+        try:
+            for doc_id in wanted:
+                position = positions.get(doc_id)
+                if position is not None and doc_id not in found:
+                    found[doc_id] = index.index.reconstruct(position)
+        except RuntimeError:
+            # Index types without a direct map (e.g. IVF) cannot reconstruct
+            continue
+    missing = [doc for doc in docs if getattr(doc, "id", None) not in found]
+    if missing:
+        embedded = iter(indexes[0].embeddings.embed_documents([doc.page_content for doc in missing]))
+        return [found[doc.id] if getattr(doc, "id", None) in found else next(embedded) for doc in docs]
+    return [found[doc.id] for doc in docs]
+
+
+def retrieve_context(indexes, query, budget=CONTEXT_TOKEN_BUDGET, candidates=CONTEXT_CANDIDATES, mode=None):
+    """Retrieves candidates across all indexes and packs them into a cited, token-budgeted context.
+
+    Chunk vectors for MMR are read back from the FAISS indexes, so a
+    question embeds only the query; in lexical mode nothing is embedded
+    and MMR uses word overlap instead. See `context_builder.build_context`.
+    """
+    indexes = [index for index in indexes if index is not None]
+    if not indexes:
+        return build_context([])
+    mode = mode or RETRIEVAL_MODE
+    query_vector = None
+    if mode != "lexical":
+        try:
+            with span("embed_query"):
+                query_vector = indexes[0].embeddings.embed_query(query)
+        except Exception as e:
+            print(f"⚠️ Could not embed the query, using keyword search only: {e}")
+            mode = "lexical"
+    with span("retrieval", mode=mode):
+        docs = [doc for doc, _ in hybrid_search(indexes, query, k=candidates, mode=mode, query_vector=query_vector)]
+        vectors = None
+        if docs and query_vector is not None:
+            vectors = stored_vectors(indexes, docs)
+    with span("context"):
+        context = build_context(docs, query_vector=query_vector, vectors=vectors, budget=budget)
+    count("context_tokens", context["tokens"])
+    return context
@@ -5,19 +5,29 @@ import time
 import tempfile
 import shutil
 import json
-import keyboard
-import easyocr
-import pyautogui
-import pygetwindow as gw
-import pyperclip
+import threading
 import subprocess
 import logging
+import queue
 from dotenv import load_dotenv
-from PIL import Image
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from lazy_imports import lazy_import, lazy_attr
+from ocr_engine import IncrementalOCR
+from screen_capture import ScreenCapture
+from response_cache import get_response_cache, fingerprint
+import intent_classifier
+from input_events import HotkeyManager
+from clients import get_chat_model, get_chain
+from history import ConversationHistory
+from tracing import span, count, trace, propagate
+
+# Heavy modules are imported on first use so the hotkey launcher starts fast;
+# they stay module globals because generated automation code runs in this namespace.
+keyboard = lazy_import("keyboard")
+pyautogui = lazy_import("pyautogui")
+gw = lazy_import("pygetwindow")
+pyperclip = lazy_import("pyperclip")
+ChatPromptTemplate = lazy_attr("langchain_core.prompts", "ChatPromptTemplate")
+StrOutputParser = lazy_attr("langchain_core.output_parsers", "StrOutputParser")
 
 # === Load Environment ===
 load_dotenv()
@@ -28,38 +38,103 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 logging.basicConfig(filename="assistant.log", level=logging.INFO, format="%(asctime)s - %(message)s")
 
 # === Temp Directory for Screenshots ===
+# Only written when FLOWSYNC_DEBUG_SCREENSHOTS=1; captures otherwise stay in memory
 TEMP_DIR = tempfile.gettempdir()
 SCREENSHOT_PATH = os.path.join(TEMP_DIR, "screen_capture.png")
+last_capture = None
 
 # === OCR ===
-ocr_reader = easyocr.Reader(['en'], gpu=False)
+_ocr_reader = None
+_ocr_lock = threading.Lock()
+
+def get_ocr_reader():
+    """Loads the EasyOCR model on first use (several seconds and hundreds of MB)."""
+    global _ocr_reader
+    if _ocr_reader is None:
+        with _ocr_lock:
+            if _ocr_reader is None:
+                import easyocr
+                _ocr_reader = easyocr.Reader(['en'], gpu=False)
+    return _ocr_reader
+
+# One incremental OCR engine per capture region, so repeated captures only re-read changed tiles
+_ocr_engines = {}
+_ocr_engines_lock = threading.Lock()
+
+def get_ocr_engine(region=None):
+    key = tuple(region) if region else None
+    if key not in _ocr_engines:
+        with _ocr_engines_lock:
+            if key not in _ocr_engines:
+                _ocr_engines[key] = IncrementalOCR(get_ocr_reader)
+    return _ocr_engines[key]
 
 # === Assistant Modes ===
 ASSISTANT_MODE = "smart"  # "fast" or "smart"
 MAX_HISTORY = 5
-conversation_history = []
+# Bounded: old turns are folded into a rolling summary, screens are kept as fingerprints
+conversation_history = ConversationHistory()
 
 def format_conversation_history(history):
     formatted = ""
+    if history.summary:
+        formatted += f"\n---\nEarlier in this session:\n{history.summary}\n"
     for item in history[-MAX_HISTORY:]:
-        if item.get("type") == "instruction":
-            formatted += f"\n---\nUser Query: {item['query']}\nGemini Instructions: {item['instructions'][:100]}...\n"
-        elif item.get("type") == "automation_attempt":
-            formatted += f"\n---\nAutomation Attempt:\nCode: {item['code_attempt'][:100]}...\nError: {item['error']}\n"
-        elif item.get("type") == "automation_success":
-            formatted += f"\n---\nAutomation Success:\nCode: {item['code_attempt'][:100]}...\n"
+        if item.type == "instruction":
+            formatted += f"\n---\nUser Query: {item.query}\nGemini Instructions: {item.instructions[:100]}...\n"
+        elif item.type == "automation_attempt":
+            formatted += f"\n---\nAutomation Attempt:\nCode: {item.code[:100]}...\nError: {item.error}\n"
+        elif item.type == "automation_success":
+            formatted += f"\n---\nAutomation Success:\nCode: {item.code[:100]}...\n"
         else:
-            formatted += f"\n---\n[Unrecognized history entry]\n{json.dumps(item, indent=2)}\n"
+            formatted += f"\n---\n[Unrecognized history entry]\n{item.type}: {item.query}\n"
     return formatted
 
 # === LangChain Gemini Setup ===
+# from langchain_google_genai import ChatGoogleGenerativeAI
 # llm_general = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.3, api_key=google_api_key)
 # llm_code = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.2, api_key=google_api_key)
-llm_general = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3, api_key=openai_api_key)
-llm_code = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2, api_key=openai_api_key)
+LLM_MODEL = "gpt-3.5-turbo"
+_llms = {}
+_llm_lock = threading.Lock()
+
+def _get_llm(name, temperature):
+    if name not in _llms:
+        with _llm_lock:
+            if name not in _llms:
+                _llms[name] = get_chat_model(LLM_MODEL, temperature, api_key=openai_api_key)
+    return _llms[name]
+
+def get_llm_general():
+    return _get_llm("general", 0.3)
+
+def get_llm_code():
+    return _get_llm("code", 0.2)
+
+def _get_chain(name, prompt, get_llm):
+    """The shared `prompt | llm | parser` chain for one task (`prompt` is a template string), built once on the pooled clients."""
+    return get_chain(("screen", name, LLM_MODEL),
+                     lambda: ChatPromptTemplate.from_template(prompt) | get_llm() | StrOutputParser())
+
+def __getattr__(name):
+    # Backwards-compatible access to the lazily created clients
+    if name == "ocr_reader":
+        return get_ocr_reader()
+    if name == "llm_general":
+        return get_llm_general()
+    if name == "llm_code":
+        return get_llm_code()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up():
+    """Loads the OCR model and LLM clients ahead of the first request."""
+    get_ocr_reader()
+    get_llm_general()
+    get_llm_code()
 
 # === Prompts ===
-suggestion_prompt = ChatPromptTemplate.from_template("""
+# Template strings; `_get_chain` turns them into ChatPromptTemplates when a chain is first built
+suggestion_prompt = """
 You are an intelligent assistant. The following is a snapshot of the user's screen:
 
 ---SCREEN CONTENT---
@@ -68,9 +143,9 @@ You are an intelligent assistant. The following is a snapshot of the user's scre
 
 Give a list of tasks the user might want help with based solely on this screen.
 Be concise and specific.
-""")
+"""
 
-query_prompt = ChatPromptTemplate.from_template("""
+query_prompt = """
 You are an expert desktop assistant helping a user on a Windows 11 system.
 
 The user sees the following on their screen:
@@ -96,6 +171,7 @@ Your task:
 - Always add `time.sleep(1)` **after each key press or action** to ensure stable execution.
 - Avoid using `keyboard.press()` and `keyboard.release()` manually unless absolutely required. Instead, use `keyboard.press_and_release()` or `pyautogui.hotkey()`.
 - Do not use `pyautogui.click()` or move the mouse unless there's absolutely no other keyboard-based alternative.
+- If a click is truly unavoidable, call `highlight_and_click("visible label text")`, which clicks the on-screen text matching the label (fuzzy match). Never guess pixel coordinates.
 - Use `time.sleep(8-10)` when opening an app, and `time.sleep(2-5)` when loading content or navigating.
 - At the **end of your script**, include safe fallback code to release all keys if any were held (e.g., using `keyboard.release('ctrl')`, `keyboard.release('alt')`, etc.).
 - Your automation should never leave keys pressed down.
@@ -106,62 +182,226 @@ Respond **ONLY** in the following JSON format:
   "instructions": "Step-by-step manual instructions go here.",
   "automation_code": "Python code using keyboard-only shortcuts with 1s delays and key release safety(if applicable)."
 }}
-""")
+"""
 
-
-
-# === Intent Detection ===
-def classify_query_intent(user_query):
-    intent_prompt = ChatPromptTemplate.from_template("""
+intent_prompt = """
     Classify the user's query into one of two categories:
     - "automation" if the user is asking to perform a desktop action or automate something.
     - "general" if the user is asking a question, explanation, or non-automatable information.
 
     User Query: "{query}"
     Category:
-    """)
-    chain = intent_prompt | llm_general | StrOutputParser()
-    response = chain.invoke({"query": user_query}).strip().lower()
-    return "automation" if "automation" in response else "general"
+    """
 
-# === Core Chain Handlers ===
-def suggest_task_from_screen(screen_content):
-    chain = suggestion_prompt | llm_general | StrOutputParser()
-    return chain.invoke({"screen": screen_content})
-
-def respond_to_user_query(screen_content, user_query):
-    use_history = ASSISTANT_MODE == "smart"
-    history_formatted = format_conversation_history(conversation_history) if use_history else ""
+general_prompt = """
+    You are a smart and helpful assistant. Your job is to answer the user's question.
 
-    query_type = classify_query_intent(user_query)
+    Context from screen (if any): 
+    "{screen}"
 
-    if query_type == "general":
-        # Just respond as a chatbot
-        print("💬 Detected general query. Responding conversationally.")
-        chain = ChatPromptTemplate.from_template("""
-        You are a smart and helpful assistant. Your job is to answer the user's question.
+    User Question: 
+    "{query}"
 
-        Context from screen (if any): 
-        "{screen}"
+    Respond clearly and helpfully. If the screen content is not relevant, ignore it.
+    Use your own general knowledge or reasoning. Only refer to screen content if it's necessary.
+    """
 
-        User Question: 
-        "{query}"
 
-        Respond clearly and helpfully. If the screen content is not relevant, ignore it.
-        Use your own general knowledge or reasoning. Only refer to screen content if it's necessary.
-        """) | llm_general | StrOutputParser()
 
-        return chain.invoke({"screen": screen_content, "query": user_query}), ""
+# === Intent Detection ===
+def classify_query_intent(user_query):
+    """Classifies locally; only low-confidence queries go to the (cached) LLM."""
+    intent, confidence, _ = intent_classifier.classify(user_query)
+    if confidence >= intent_classifier.CONFIDENCE_THRESHOLD:
+        return intent
+    return classify_query_intent_llm(user_query)
+
+def classify_query_intent_llm(user_query):
+    cache = get_response_cache()
+    cached = cache.get("intent", LLM_MODEL, user_query, similar=True)
+    if cached is not None:
+        return cached
+    chain = _get_chain("intent", intent_prompt, get_llm_general)
+    with span("intent_llm"):
+        response = chain.invoke({"query": user_query}).strip().lower()
+    intent = "automation" if "automation" in response else "general"
+    cache.put("intent", LLM_MODEL, user_query, intent, similar=True)
+    return intent
 
-    # Automation case
-    chain = query_prompt | llm_code | StrOutputParser()
-    result = chain.invoke({
+# === Core Chain Handlers ===
+def suggest_task_from_screen(screen_content):
+    cache = get_response_cache()
+    screen_key = fingerprint(screen_content)
+    cached = cache.get("suggestion", LLM_MODEL, "", context=screen_key)
+    if cached is not None:
+        return cached
+    chain = _get_chain("suggestion", suggestion_prompt, get_llm_general)
+    suggestion = chain.invoke({"screen": screen_content})
+    cache.put("suggestion", LLM_MODEL, "", suggestion, context=screen_key)
+    return suggestion
+
+def _run_chain(chain, inputs, on_token=None, cancel=None):
+    """Invokes a chain, forwarding each streamed chunk to `on_token` when one is given.
+
+    With a `cancel` event the chain is always streamed, and stops with
+    BranchCancelled at the next chunk once the event is set.
+    """
+    with span("llm") as attrs:
+        if on_token is None and cancel is None:
+            return chain.invoke(inputs)
+        start = time.perf_counter()
+        parts = []
+        for chunk in chain.stream(inputs):
+            if cancel is not None and cancel.is_set():
+                attrs["cancelled"] = True
+                raise BranchCancelled()
+            if not parts:
+                attrs["first_token_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            parts.append(chunk)
+            # Streamed chunks are about one token each
+            count("llm_tokens")
+            if on_token is not None:
+                on_token(chunk)
+        return "".join(parts)
+
+def _answer_general(screen_content, user_query, on_token=None, cancel=None):
+    cache = get_response_cache()
+    screen_key = fingerprint(screen_content)
+    cached = cache.get("general_answer", LLM_MODEL, user_query, context=screen_key, similar=True)
+    if cached is not None:
+        if on_token is not None:
+            on_token(cached)
+        return cached, ""
+    chain = _get_chain("general", general_prompt, get_llm_general)
+    answer = _run_chain(chain, {"screen": screen_content, "query": user_query}, on_token, cancel)
+    cache.put("general_answer", LLM_MODEL, user_query, answer, context=screen_key, similar=True)
+    return answer, ""
+
+def _stream_instructions(on_token):
+    """Forwards only the instructions of a streamed automation answer; the code is parsed once complete."""
+    parser = InstructionStreamParser()
+    def on_chunk(chunk):
+        text = parser.feed(chunk)
+        if text:
+            on_token(text)
+    return on_chunk
+
+def _answer_automation(screen_content, user_query, history_formatted, on_token=None, cancel=None):
+    # The answer also depends on the conversation history
+    cache = get_response_cache()
+    context_key = f"{fingerprint(screen_content)}:{fingerprint(history_formatted)}"
+    cached = cache.get("automation_answer", LLM_MODEL, user_query, context=context_key, similar=True)
+    if cached is not None:
+        instructions, code = cached
+        if on_token is not None:
+            on_token(instructions)
+        return instructions, code
+
+    chain = _get_chain("automation", query_prompt, get_llm_code)
+    on_chunk = _stream_instructions(on_token) if on_token is not None else None
+    result = _run_chain(chain, {
         "screen": screen_content,
         "query": user_query,
         "history": history_formatted
-    })
+    }, on_chunk, cancel)
     instructions, code = parse_response(result)
+    if code:
+        cache.put("automation_answer", LLM_MODEL, user_query, [instructions, code], context=context_key, similar=True)
+    return instructions, code
 
+# === Speculative Execution ===
+# "off":      classify, then run the matching chain (cheapest)
+# "fallback": when the local classifier is unsure, run the LLM classification and both chains together
+# "always":   always run classification and both chains together (lowest latency, most tokens)
+SPECULATIVE_MODE = os.getenv("FLOWSYNC_SPECULATIVE", "fallback")
+_speculation_pool = None
+_speculation_lock = threading.Lock()
+
+class BranchCancelled(Exception):
+    """Raised inside a speculative branch that lost to the other one."""
+
+class _Branch:
+    """Holds back a speculative branch's streamed text until it is chosen, then forwards it live."""
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._chosen = False
+
+    def emit(self, text):
+        with self._lock:
+            if not self._chosen:
+                self._buffer.append(text)
+            elif self.on_token is not None:
+                self.on_token(text)
+
+    def choose(self):
+        with self._lock:
+            self._chosen = True
+            buffered, self._buffer = "".join(self._buffer), []
+            if buffered and self.on_token is not None:
+                self.on_token(buffered)
+
+def _get_speculation_pool():
+    global _speculation_pool
+    with _speculation_lock:
+        if _speculation_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _speculation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculate")
+        return _speculation_pool
+
+def _respond_speculatively(screen_content, user_query, history_formatted, on_token=None):
+    """Runs both answer chains while the intent is classified; the loser is cancelled."""
+    pool = _get_speculation_pool()
+    branches = {"general": _Branch(on_token), "automation": _Branch(on_token)}
+    futures = {
+        "general": pool.submit(propagate(_answer_general), screen_content, user_query,
+                               branches["general"].emit, branches["general"].cancel),
+        "automation": pool.submit(propagate(_answer_automation), screen_content, user_query, history_formatted,
+                                  branches["automation"].emit, branches["automation"].cancel),
+    }
+    try:
+        query_type = classify_query_intent(user_query)
+    except Exception:
+        for branch in branches.values():
+            branch.cancel.set()
+        raise
+    if query_type == "general":
+        print("💬 Detected general query. Responding conversationally.")
+    loser = "automation" if query_type == "general" else "general"
+    branches[loser].cancel.set()
+    branches[query_type].choose()
+    return query_type, futures[query_type].result()
+
+def respond_to_user_query(screen_content, user_query, on_token=None, mode=None):
+    """Answers a screen-mode query; with `on_token`, the answer text is streamed as it arrives.
+
+    `mode` overrides SPECULATIVE_MODE for this call.
+    """
+    use_history = ASSISTANT_MODE == "smart"
+    history_formatted = format_conversation_history(conversation_history) if use_history else ""
+    mode = mode or SPECULATIVE_MODE
+
+    with span("intent"):
+        _, confidence, _ = intent_classifier.classify(user_query)
+    unsure = confidence < intent_classifier.CONFIDENCE_THRESHOLD
+    if mode == "always" or (mode == "fallback" and unsure):
+        query_type, (answer, code) = _respond_speculatively(screen_content, user_query, history_formatted, on_token)
+        if query_type == "general":
+            return answer, ""
+    else:
+        query_type = classify_query_intent(user_query)
+        if query_type == "general":
+            # Just respond as a chatbot
+            print("💬 Detected general query. Responding conversationally.")
+            return _answer_general(screen_content, user_query, on_token)
+        answer, code = _answer_automation(screen_content, user_query, history_formatted, on_token)
+    _remember_instruction(use_history, screen_content, user_query, answer, code)
+    return answer, code
+
+def _remember_instruction(use_history, screen_content, user_query, instructions, code):
     if use_history:
         conversation_history.append({
             "screen_context": screen_content,
@@ -170,11 +410,89 @@ def respond_to_user_query(screen_content, user_query):
             "automation_code": code,
             "type": "instruction"
         })
-    return instructions, code
 
 
 # === response parsing ===
 
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class InstructionStreamParser:
+    """Incrementally decodes the "instructions" value of a streamed JSON reply.
+
+    `feed()` takes raw chunks and returns the newly decoded instruction text,
+    so instructions can be shown before the automation code has arrived.
+    A list of instructions is joined with newlines, like `parse_response`.
+    """
+    KEY_PATTERN = re.compile(r'"instructions"\s*:')
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "seek"  # seek -> value -> string (-> value for lists) -> done
+        self.in_list = False
+        self.items = 0
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        out = []
+        buf = self.buffer
+        while self.state != "done":
+            if self.state == "seek":
+                match = self.KEY_PATTERN.search(buf, self.pos)
+                if not match:
+                    break
+                self.pos = match.end()
+                self.state = "value"
+            elif self.state == "value":
+                while self.pos < len(buf) and buf[self.pos] in " \t\r\n,":
+                    self.pos += 1
+                if self.pos >= len(buf):
+                    break
+                ch = buf[self.pos]
+                if ch == "[" and not self.in_list:
+                    self.in_list = True
+                    self.pos += 1
+                elif ch == '"':
+                    self.pos += 1
+                    if self.items:
+                        out.append("\n")
+                    self.items += 1
+                    self.state = "string"
+                else:
+                    self.state = "done"
+            elif not self._read_string(buf, out):
+                break
+        return "".join(out)
+
+    def _read_string(self, buf, out):
+        """Decodes string content; returns False when more input is needed."""
+        while self.pos < len(buf):
+            ch = buf[self.pos]
+            if ch == "\\":
+                if self.pos + 1 >= len(buf):
+                    return False
+                escape = buf[self.pos + 1]
+                if escape == "u":
+                    if self.pos + 6 > len(buf):
+                        return False
+                    try:
+                        out.append(chr(int(buf[self.pos + 2:self.pos + 6], 16)))
+                    except ValueError:
+                        pass
+                    self.pos += 6
+                else:
+                    out.append(JSON_ESCAPES.get(escape, escape))
+                    self.pos += 2
+            elif ch == '"':
+                self.pos += 1
+                self.state = "value" if self.in_list else "done"
+                return True
+            else:
+                out.append(ch)
+                self.pos += 1
+        return False
+
+
 def parse_response(response):
     try:
         # Step 1: Extract JSON object (whether inside a code block or raw)
@@ -203,88 +521,138 @@ def parse_response(response):
         return response.strip(), ""
 
 # === Automation Execution ===
-def execute_code(code_str, screen_context, user_query, max_attempts=3):
-    print("💻 Executing automation code...")
-    attempts = 0
+def run_automation_once(code_str, screen_context, user_query, attempt=0, max_attempts=3):
+    """Runs generated automation code once.
+
+    Returns None on success. On failure returns (error, fixed_code), the
+    LLM's repaired version, or None for fixed_code once `max_attempts` are
+    used up. Whether to run the repair is the caller's decision, so the UI
+    can ask on its own thread instead of blocking a worker on input().
+    """
     current_code = code_str.strip().replace("```python", "").replace("```", "")
-    while attempts < max_attempts:
-        try:
-            # keyboard.clear_all_hotkeys()  # Clears held keys from hotkey listener
-            time.sleep(2)  # Give time for the user to prepare
+    try:
+        # keyboard.clear_all_hotkeys()  # Clears held keys from hotkey listener
+        time.sleep(2)  # Give time for the user to prepare
+        with span("automation"):
             exec(current_code, globals())
-            print("✅ Task automated successfully.")
-            conversation_history.append({
-                "screen": screen_context,
-                "query": user_query,
-                "code_attempt": current_code,
-                "status": "success",
-                "type": "automation_success"
-            })
+        print("✅ Task automated successfully.")
+        conversation_history.append({
+            "screen": screen_context,
+            "query": user_query,
+            "code_attempt": current_code,
+            "status": "success",
+            "type": "automation_success"
+        })
+        return None
+    except Exception as e:
+        print(f"❌ Automation failed (Attempt {attempt+1}/{max_attempts}): {e}")
+        logging.error(f"Automation failed on attempt {attempt+1}: {e}")
+        conversation_history.append({
+            "screen": screen_context,
+            "query": user_query,
+            "code_attempt": current_code,
+            "error": str(e),
+            "status": "failed",
+            "type": "automation_attempt"
+        })
+        if attempt + 1 >= max_attempts:
+            return str(e), None
+        return str(e), fix_automation_code(current_code, screen_context, user_query, e)
+
+def fix_automation_code(current_code, screen_context, user_query, e):
+    """Asks the code LLM to repair automation code that raised `e`."""
+    fix_prompt = ChatPromptTemplate.from_template("""
+        You are an expert Python developer helping to fix broken automation code.
+        The following Python automation script was generated to help the user complete a task based on their desktop screen.
+        However, it failed with an error. Your job is to fix ONLY the error while keeping the original logic and structure intact.
+        📄 Screen Context: {screen}
+        ❓ User Query: {query}
+
+        💻 Original Python Code:
+        ```python
+        {current_code}
+        ❗ Error Message: "" {e} ""
+        ✅ Your task:
+        Fix the above Python code so it works correctly.
+        Return only the corrected Python code (no markdown formatting, no explanations, no comments).
+        DO NOT wrap the code in a function.
+        Keep the code as close to the original as possible. Only fix what is broken.
+        Please output only raw working Python code. Nothing else.""")
+    # Format the fix_prompt template first
+    formatted_prompt = fix_prompt.format(
+        screen=screen_context,
+        query=user_query,
+        current_code=current_code,
+        e=str(e)
+    )
+    # Now invoke the LLM with the formatted prompt (as a string)
+    fixed_code = get_llm_code().invoke(formatted_prompt)
+    return fixed_code.replace("```python", "").replace("```", "").strip()
+
+def execute_code(code_str, screen_context, user_query, max_attempts=3):
+    """Runs automation code from the console, offering each repaired version on stdin."""
+    print("💻 Executing automation code...")
+    current_code = code_str
+    for attempt in range(max_attempts):
+        failure = run_automation_once(current_code, screen_context, user_query, attempt, max_attempts)
+        if failure is None:
             return
-        except Exception as e:
-            print(f"❌ Automation failed (Attempt {attempts+1}/{max_attempts}): {e}")
-            logging.error(f"Automation failed on attempt {attempts+1}: {e}")
-            conversation_history.append({
-                "screen": screen_context,
-                "query": user_query,
-                "code_attempt": current_code,
-                "error": str(e),
-                "status": "failed",
-                "type": "automation_attempt"
-            })
-            fix_prompt = ChatPromptTemplate.from_template("""
-                You are an expert Python developer helping to fix broken automation code.
-                The following Python automation script was generated to help the user complete a task based on their desktop screen.
-                However, it failed with an error. Your job is to fix ONLY the error while keeping the original logic and structure intact.
-                📄 Screen Context: {screen}
-                ❓ User Query: {query}
-
-                💻 Original Python Code:
-                ```python
-                {current_code}
-                ❗ Error Message: "" {e} ""
-                ✅ Your task:
-                Fix the above Python code so it works correctly.
-                Return only the corrected Python code (no markdown formatting, no explanations, no comments).
-                DO NOT wrap the code in a function.
-                Keep the code as close to the original as possible. Only fix what is broken.
-                Please output only raw working Python code. Nothing else.""")
-            # Format the fix_prompt template first
-            formatted_prompt = fix_prompt.format(
-                screen=screen_context,
-                query=user_query,
-                current_code=current_code,
-                e=str(e)
-            )
-            # Now invoke the LLM with the formatted prompt (as a string)
-            fixed_code = llm_code.invoke(formatted_prompt)
-            print("\n🔧 Gemini suggests a fixed version:\n")
-            print(fixed_code)
-            confirm = input("\n⚙️ Do you want to try the fixed code? (y/n): ").strip().lower()
-            if confirm != "y":
-                print("⛔ Skipping automation.")
-                break
-            current_code = fixed_code.strip().replace("```python", "").replace("```", "")
-            attempts += 1
+        _, fixed_code = failure
+        if fixed_code is None:
+            break
+        print("\n🔧 Gemini suggests a fixed version:\n")
+        print(fixed_code)
+        confirm = input("\n⚙️ Do you want to try the fixed code? (y/n): ").strip().lower()
+        if confirm != "y":
+            print("⛔ Skipping automation.")
+            break
+        current_code = fixed_code
     print("❌ Could not complete automation after multiple attempts.")
     return
 
 # === Highlighting Click Locations ===
+# These helpers are available to generated automation code, which runs in this module's namespace.
+def current_capture():
+    """Grabs the screen again and returns the capture, so targets never come from a stale frame.
+
+    Only tiles that changed since the previous capture are re-read (see
+    IncrementalOCR), and the previous index is kept when the text did not
+    change, so a lookup on an unchanged screen costs a grab and a hash.
+    """
+    capture_and_process_screen(last_capture.region if last_capture is not None else None)
+    return last_capture
+
+def find_element(label, capture=None):
+    """Returns the on-screen element whose text best matches `label`, or None."""
+    return (capture or current_capture()).index.find_best(label)
+
+def elements_near(label, limit=3):
+    """Returns the elements closest to the one labelled `label` (e.g. the field next to a caption)."""
+    return current_capture().index.nearest_to(label, limit=limit)
+
+def elements_in_region(x0, y0, x1, y1):
+    """Returns the elements inside a rectangle of the current screen, in reading order."""
+    return current_capture().index.in_region(x0, y0, x1, y1)
+
+def click_element(element, capture=None):
+    """Clicks an element; its coordinates are relative to `capture` (by default the latest one)."""
+    capture = capture or last_capture or current_capture()
+    x, y = capture.to_screen(int(element.center[0]), int(element.center[1]))
+    pyautogui.moveTo(x, y, duration=0.3)
+    pyautogui.click()
+    pyautogui.sleep(0.5)
+    print(f"✅ Clicked on '{element.text}'")
+
 def highlight_and_click(text_to_find):
     try:
-        result = ocr_reader.readtext(SCREENSHOT_PATH, detail=1)
-        for (bbox, text, _) in result:
-            if text_to_find.lower() in text.lower():
-                (top_left, top_right, bottom_right, bottom_left) = bbox
-                x = int((top_left[0] + bottom_right[0]) / 2)
-                y = int((top_left[1] + bottom_right[1]) / 2)
-                pyautogui.moveTo(x, y, duration=0.3)
-                pyautogui.click()
-                pyautogui.sleep(0.5)
-                print(f"✅ Clicked on '{text}'")
-                return True
-        print("⚠️ No matching element found to click.")
-        return False
+        # A fresh capture: an earlier automation step may have opened or moved a window
+        capture = current_capture()
+        element = find_element(text_to_find, capture)
+        if element is None:
+            print("⚠️ No matching element found to click.")
+            return False
+        click_element(element, capture)
+        return True
     except Exception as e:
         print(f"❌ Error in highlight_and_click: {e}")
         logging.error(f"highlight_and_click error: {e}")
@@ -295,58 +663,84 @@ def contains_code(response):
     return any(cmd in response for cmd in ["pyautogui", "pyperclip", "subprocess", "webbrowser", "keyboard", "time"])
 
 def capture_and_process_screen(region=None):
-    if os.path.exists(SCREENSHOT_PATH):
-        os.remove(SCREENSHOT_PATH)
-    image = pyautogui.screenshot(region=region)
-    image.save(SCREENSHOT_PATH)
-    result = ocr_reader.readtext(SCREENSHOT_PATH, detail=0)
-    return "\n".join(result).strip()
+    global last_capture
+    with span("capture"):
+        capture = ScreenCapture.grab(region)
+    with span("ocr"):
+        capture.ocr(get_ocr_engine(region))
+    capture.save_if_debugging(SCREENSHOT_PATH)
+    capture.inherit_index(last_capture)
+    last_capture = capture
+    return capture.text
 
 # === Background Listener ===
-def start_background_listener():
+def _drain(events):
+    while not events.empty():
+        events.get_nowait()
+
+def start_background_listener(hotkeys=None):
     global ASSISTANT_MODE
+    events = queue.Queue()
+    hotkeys = hotkeys or HotkeyManager()
+    hotkeys.register("ctrl+l", lambda: events.put("capture"))
+    hotkeys.register("esc", lambda: events.put("exit"))
     print(f"📣 Assistant running in {ASSISTANT_MODE.upper()} mode... Press Ctrl+L for capturing screen and Press ESC anytime to exit.")
-    while True:
-        if keyboard.is_pressed('ctrl+l'):
-            print("\n🟠 Capturing screen...")
-            extracted_text = capture_and_process_screen()
-            if not extracted_text:
-                print("⚠️ No text detected on screen.")
-                continue
-
-            suggestion = suggest_task_from_screen(extracted_text)
-            print(f"\n💡 Gemini Suggests: {suggestion}")
-
-            while True:
-                user_query = input("\n❓ What do you want help with? (type 'exit' to recapture, 'mode' to switch): ").strip()
-                if user_query.lower() == "exit":
-                    print(f"\n📣 Assistant running in {ASSISTANT_MODE.upper()} mode... Press Ctrl+L for capturing screen and Press ESC anytime to exit.")
-                    break
-                elif user_query.lower() == "mode":
-                    user_mode = input("Enter any mode (smart/fast): ").strip().lower()
-                    if user_mode not in ["smart", "fast"]:
-                        print("⚠️ Invalid mode. Please enter 'smart' or 'fast'.")
-                        continue
-                    ASSISTANT_MODE = user_mode
-                    if ASSISTANT_MODE == "fast":
-                        conversation_history.clear()
-                    print(f"🔁 Switched to {ASSISTANT_MODE.upper()} mode.")
+    try:
+        while True:
+            # Blocks until a hotkey fires; nothing runs while idle
+            event = events.get()
+            if event == "capture":
+                print("\n🟠 Capturing screen...")
+                with trace("capture") as current:
+                    extracted_text = capture_and_process_screen()
+                print(current.breakdown())
+                if not extracted_text:
+                    print("⚠️ No text detected on screen.")
                     continue
 
-                instructions, automation_code = respond_to_user_query(extracted_text, user_query)
-                print(f"\n💡 Gemini Response:\n\n{instructions}")
-
-                if contains_code(automation_code.strip()):
-                    should_do = input("\n⚙️ Should I perform this task? (y/n): ").strip().lower()
-                    if should_do == "y":
-                        execute_code(automation_code.strip(), extracted_text, user_query)
-                else:
-                    print("\nℹ️ This was a general response. No automation will be performed.")
+                suggestion = suggest_task_from_screen(extracted_text)
+                print(f"\n💡 Gemini Suggests: {suggestion}")
+
+                while True:
+                    user_query = input("\n❓ What do you want help with? (type 'exit' to recapture, 'mode' to switch): ").strip()
+                    if user_query.lower() == "exit":
+                        # Keys pressed while typing the query are not commands
+                        _drain(events)
+                        print(f"\n📣 Assistant running in {ASSISTANT_MODE.upper()} mode... Press Ctrl+L for capturing screen and Press ESC anytime to exit.")
+                        break
+                    elif user_query.lower() == "mode":
+                        user_mode = input("Enter any mode (smart/fast): ").strip().lower()
+                        if user_mode not in ["smart", "fast"]:
+                            print("⚠️ Invalid mode. Please enter 'smart' or 'fast'.")
+                            continue
+                        ASSISTANT_MODE = user_mode
+                        if ASSISTANT_MODE == "fast":
+                            conversation_history.clear()
+                        print(f"🔁 Switched to {ASSISTANT_MODE.upper()} mode.")
+                        continue
 
-        elif keyboard.is_pressed('esc'):
-            print("\n👋 Exiting assistant.")
-            break
-        time.sleep(0.2)
+                    print("\n💡 Gemini Response:\n")
+                    with trace("screen_answer") as current:
+                        instructions, automation_code = respond_to_user_query(
+                            extracted_text, user_query, on_token=lambda text: print(text, end="", flush=True)
+                        )
+                    print()
+                    print(current.breakdown())
+
+                    if contains_code(automation_code.strip()):
+                        should_do = input("\n⚙️ Should I perform this task? (y/n): ").strip().lower()
+                        if should_do == "y":
+                            execute_code(automation_code.strip(), extracted_text, user_query)
+                    else:
+                        print("\nℹ️ This was a general response. No automation will be performed.")
+
+            elif event == "exit":
+                print(f"\n📊 {get_response_cache().summary()}")
+                print(f"📊 {conversation_history.report()}")
+                print("\n👋 Exiting assistant.")
+                break
+    finally:
+        hotkeys.unregister_all()
 
 # === Entry Point ===
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import os
+import time
+from lazy_imports import lazy_import
+from ocr_index import OCRIndex
+
+np = lazy_import("numpy")
+pyautogui = lazy_import("pyautogui")
+
+# Frames stay in memory; set FLOWSYNC_DEBUG_SCREENSHOTS=1 to also write them out as PNG
+DEBUG_SCREENSHOTS = os.getenv("FLOWSYNC_DEBUG_SCREENSHOTS", "0") == "1"
+
+
+class ScreenCapture:
+    """A captured frame held as an RGB array, together with its OCR results.
+
+    The bounding boxes are kept so later lookups (e.g. click targeting)
+    reuse this capture instead of re-reading and re-OCRing a file.
+    """
+
+    def __init__(self, frame, region=None, timestamp=None):
+        self.frame = frame
+        self.region = tuple(region) if region else None
+        self.timestamp = timestamp or time.time()
+        self.results = None
+        self._index = None
+
+    @classmethod
+    def grab(cls, region=None):
+        image = pyautogui.screenshot(region=region)
+        return cls(np.asarray(image.convert("RGB")), region)
+
+    def ocr(self, engine):
+        """Runs OCR on the in-memory frame; `engine` is anything with `read(frame)`."""
+        self.results = engine.read(self.frame)
+        return self.results
+
+    @property
+    def index(self):
+        """Text and spatial index over this capture's OCR boxes, built on first use."""
+        if self._index is None:
+            self._index = OCRIndex(self.results or [])
+        return self._index
+
+    def inherit_index(self, previous):
+        """Reuses the previous capture's index when the OCR results did not change."""
+        if previous is not None and previous._index is not None and previous.results == self.results:
+            self._index = previous._index
+
+    @property
+    def text(self):
+        return "\n".join(text for _, text, _ in self.results or []).strip()
+
+    def to_screen(self, x, y):
+        """Converts frame coordinates to screen coordinates for region captures."""
+        if self.region:
+            return x + self.region[0], y + self.region[1]
+        return x, y
+
+    def save(self, path):
+        from PIL import Image
+        Image.fromarray(self.frame).save(path)
+        return path
+
+    def save_if_debugging(self, path):
+        if DEBUG_SCREENSHOTS:
+            self.save(path)
+            print(f"📸 Debug screenshot saved: {path}")
@@ -0,0 +1,455 @@
+import os
+import re
+import json
+import importlib.util
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from lazy_imports import lazy_import
+from index_cache import file_hash, DiskCache
+from tracing import span
+
+pd = lazy_import("pandas")
+
+# === Settings ===
+TABLE_CACHE_DIR = os.getenv("FLOWSYNC_TABLE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "flowsync_tables"))
+MAX_TABLE_CACHE_MB = int(os.getenv("FLOWSYNC_TABLE_CACHE_MB", "1024"))
+TABLE_QUERIES = os.getenv("FLOWSYNC_TABLE_QUERIES", "1") != "0"
+TABULAR_EXTENSIONS = {"csv", "xlsx", "xls"}
+CSV_CHUNK_ROWS = 50_000     # rows per pandas read and per cached row group; only one is in memory at a time
+MEMORY_TABLES = 16          # workbooks whose cache manifest stays loaded between questions
+MAX_FILTER_VALUES = 1000    # text columns with more distinct values are not matched as filter values
+MAX_GROUPS_SHOWN = 20
+MANIFEST = "manifest.json"
+
+
+def is_tabular(file_path):
+    return file_path.lower().rsplit(".", 1)[-1] in TABULAR_EXTENSIONS
+
+
+def _has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _read_tables(file_path):
+    """Yields (sheet, chunks) pairs, `chunks` an iterator of DataFrames; the sheet is "" for CSVs.
+
+    CSVs are parsed CSV_CHUNK_ROWS rows at a time. Workbook sheets are
+    parsed whole (the Excel readers cannot stream) and sliced the same way.
+    """
+    if file_path.lower().endswith(".csv"):
+        yield "", pd.read_csv(file_path, chunksize=CSV_CHUNK_ROWS)
+        return
+    with pd.ExcelFile(file_path) as workbook:
+        for sheet in workbook.sheet_names:
+            frame = workbook.parse(sheet)
+            yield sheet, (frame.iloc[start:start + CSV_CHUNK_ROWS] for start in range(0, max(len(frame), 1), CSV_CHUNK_ROWS))
+
+
+def _to_numbers(series):
+    """The series as numbers, parsing "1,200" / "$15" / "20%" text; unparseable cells become NaN."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series
+    return pd.to_numeric(series.astype(str).str.replace(r"[,\s$€£%]", "", regex=True), errors="coerce")
+
+
+class _PartWriter:
+    """Writes a sheet's chunks to disk, each chunk one Parquet row group.
+
+    A chunk whose schema cannot be cast to the open part's (a column empty
+    in earlier chunks, say) starts a new part; chunks Parquet cannot store
+    at all (mixed-type object columns), or every chunk without pyarrow,
+    are pickled as parts of their own.
+    """
+
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.parts = []
+        self._writer = None
+        self._parquet = _has_pyarrow()
+
+    def _new_part(self, extension):
+        name = f"{self.prefix}-{len(self.parts)}{extension}"
+        self.parts.append(name)
+        return os.path.join(self.directory, name)
+
+    def write(self, chunk):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            try:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if self._writer is not None and not table.schema.equals(self._writer.schema):
+                    try:
+                        table = table.cast(self._writer.schema)
+                    except (pa.ArrowException, ValueError, TypeError):
+                        self.close()
+                if self._writer is None:
+                    self._writer = pq.ParquetWriter(self._new_part(".parquet"), table.schema)
+                self._writer.write_table(table)
+                return
+            except (pa.ArrowException, ValueError, TypeError):
+                pass
+        self.close()
+        chunk.to_pickle(self._new_part(".pkl"))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class Table:
+    """One cached sheet: its columns, per-column facts gathered at conversion, and its parts on disk."""
+
+    def __init__(self, directory, entry):
+        self.directory = directory
+        self.sheet = entry["sheet"]
+        self.columns = entry["columns"]
+        self.rows = entry["rows"]
+        self.numeric = set(entry["numeric"])   # columns whose values parse as numbers
+        self.values = entry["values"]          # {text column: distinct values} for low-cardinality columns
+        self.parts = entry["parts"]
+
+    def iter_frames(self, columns=None):
+        """Yields the sheet one row group at a time, reading only `columns` (all when None)."""
+        for name in self.parts:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".parquet"):
+                import pyarrow.parquet as pq
+                parquet = pq.ParquetFile(path)
+                for i in range(parquet.num_row_groups):
+                    yield parquet.read_row_group(i, columns=columns).to_pandas()
+            else:
+                frame = pd.read_pickle(path)
+                yield frame if columns is None else frame[columns]
+
+
+class TableCache(DiskCache):
+    """Columnar (Parquet, or pickle without pyarrow) copy of each sheet, keyed by file content.
+
+    Ingestion and the query engine read the cache one row group at a time
+    instead of re-parsing the spreadsheet; no sheet is ever held in memory
+    whole. The manifests of recently used workbooks stay loaded. Converted
+    workbooks share IndexCache's manifest and LRU disk budget; a conversion
+    holds only its own workbook's lock, so lookups of other tables go on.
+    """
+
+    kind = "table"
+
+    def __init__(self, cache_dir=TABLE_CACHE_DIR, max_bytes=MAX_TABLE_CACHE_MB * 1024 * 1024, memory_tables=MEMORY_TABLES):
+        super().__init__(cache_dir, max_bytes)
+        self.memory_tables = memory_tables
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._converting = {}   # content hash -> lock held while that workbook converts
+
+    def _remembered(self, content_hash):
+        with self._memory_lock:
+            tables = self._memory.get(content_hash)
+            if tables is not None:
+                self._memory.move_to_end(content_hash)
+            return tables
+
+    def load(self, file_path, content_hash=None):
+        """Returns {sheet: Table} for a CSV or workbook, converting it on first use."""
+        content_hash = content_hash or file_hash(file_path)
+        tables = self._remembered(content_hash)
+        if tables is not None and self.touch(content_hash):
+            return tables
+        with self._memory_lock:
+            guard = self._converting.setdefault(content_hash, threading.Lock())
+        with guard:
+            directory = self.path_for(content_hash)
+            tables = self._read_cached(directory) if self.touch(content_hash) else None
+            if tables is None:
+                tables = self._convert(file_path, directory)
+                self.record(content_hash, source=os.path.basename(file_path))
+            with self._memory_lock:
+                self._memory[content_hash] = tables
+                self._memory.move_to_end(content_hash)
+                while len(self._memory) > self.memory_tables:
+                    self._memory.popitem(last=False)
+                self._converting.pop(content_hash, None)
+            return tables
+
+    def _read_cached(self, directory):
+        try:
+            with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {entry["sheet"]: Table(directory, entry) for entry in entries}
+
+    def _convert(self, file_path, directory):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        entries = []
+        for i, (sheet, chunks) in enumerate(_read_tables(file_path)):
+            writer = _PartWriter(directory, str(i))
+            columns, rows, present, parsed, excluded, values = None, 0, {}, {}, set(), {}
+            try:
+                for chunk in chunks:
+                    chunk = chunk.rename(columns=str)
+                    if columns is None:
+                        columns = list(chunk.columns)
+                        values = {column: set() for column in columns}
+                    for column in columns:
+                        series = chunk[column]
+                        if pd.api.types.is_bool_dtype(series):
+                            excluded.add(column)
+                        present[column] = present.get(column, 0) + int(series.notna().sum())
+                        parsed[column] = parsed.get(column, 0) + int(_to_numbers(series).notna().sum())
+                        if values.get(column) is not None:
+                            values[column].update(series.dropna().astype(str).unique())
+                            if len(values[column]) > MAX_FILTER_VALUES:
+                                values[column] = None
+                    rows += len(chunk)
+                    writer.write(chunk)
+            finally:
+                writer.close()
+            numeric = [column for column in columns or []
+                       if column not in excluded and present[column] and parsed[column] >= 0.8 * present[column]]
+            entries.append({
+                "sheet": sheet, "columns": columns or [], "rows": rows, "numeric": numeric, "parts": writer.parts,
+                "values": {column: sorted(found) for column, found in values.items()
+                           if found is not None and column not in numeric},
+            })
+        # Written last: a conversion interrupted part-way is redone on the next load
+        with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        return {entry["sheet"]: Table(directory, entry) for entry in entries}
+
+
+_table_cache = None
+_table_cache_lock = threading.Lock()
+
+
+def get_table_cache():
+    global _table_cache
+    if _table_cache is None:
+        with _table_cache_lock:
+            if _table_cache is None:
+                _table_cache = TableCache()
+    return _table_cache
+
+
+# === Row Sections For Indexing ===
+def _blank(value):
+    return value is None or (isinstance(value, float) and value != value) or str(value).strip() == ""
+
+
+def format_record(header, values):
+    """One row as "Column: value; ..." so every chunk keeps its column names."""
+    return "; ".join(f"{column}: {value}" for column, value in zip(header, values) if not _blank(value))
+
+
+def iter_row_sections(file_path, block_size):
+    """Yields (text, metadata) per block of rows, one self-describing line per row.
+
+    Sheets are read one cached row group at a time, so memory stays bounded
+    by CSV_CHUNK_ROWS whatever the file size.
+    """
+    for sheet, table in get_table_cache().load(file_path).items():
+        prefix = f"--- Sheet: {sheet} ---\n" if sheet else ""
+        offset = 0
+        for frame in table.iter_frames():
+            for start in range(0, len(frame), block_size):
+                block = frame.iloc[start:start + block_size]
+                first = offset + start + 2   # row 1 is the header
+                lines = [f"Row {first + i}: {format_record(table.columns, row)}"
+                         for i, row in enumerate(block.itertuples(index=False, name=None))]
+                metadata = {"rows": f"{first}-{first + len(block) - 1}"}
+                if sheet:
+                    metadata["sheet"] = sheet
+                yield prefix + "\n".join(lines), metadata
+            offset += len(frame)
+
+
+# === Direct Query Engine ===
+# The aggregate must open the question ("total amount by region", "what is the average price"), so
+# "what is the phone number of John" or "in total, what did they say" go to retrieval and the LLM
+AGGREGATE_LEAD = (
+    r"^\s*(?:(?:please|ok|okay|now|so|and|can you|could you|tell me|show me|give me|what is|what's|whats|"
+    r"what was|what are|calculate|compute|get)\s+)*(?:the\s+)?"
+)
+AGGREGATES = [
+    ("count", re.compile(AGGREGATE_LEAD + r"(how many|count|number of)\b")),
+    ("mean", re.compile(AGGREGATE_LEAD + r"(average|mean|avg)\b")),
+    ("max", re.compile(AGGREGATE_LEAD + r"(max|maximum|highest|largest|biggest)\b")),
+    ("min", re.compile(AGGREGATE_LEAD + r"(min|minimum|lowest|smallest)\b")),
+    ("sum", re.compile(AGGREGATE_LEAD + r"(total|sum|add up)\b")),
+]
+AGGREGATE_LABELS = {"sum": "Total", "mean": "Average", "max": "Maximum", "min": "Minimum", "count": "Count"}
+PARTIALS = {"sum": ["sum"], "mean": ["sum", "count"], "max": ["max"], "min": ["min"], "count": ["size"]}
+COMBINE = {"sum": "sum", "count": "sum", "size": "sum", "max": "max", "min": "min"}
+GROUP_PATTERN = re.compile(r"\b(?:by|per|for each|for every|across)\s+(?:the\s+)?([\w\s]+?)(?=\s+(?:where|with|in|for)\b|[?.!,]|$)")
+COMPARISONS = [
+    (">=", re.compile(r"\b(?:at least|>=)\s*(-?[\d,]*\.?\d+)")),
+    ("<=", re.compile(r"\b(?:at most|<=)\s*(-?[\d,]*\.?\d+)")),
+    (">", re.compile(r"(?:\b(?:over|above|greater than|more than)|>)\s*(-?[\d,]*\.?\d+)")),
+    ("<", re.compile(r"(?:\b(?:under|below|less than|fewer than)|<)\s*(-?[\d,]*\.?\d+)")),
+]
+OPERATORS = {">=": lambda s, n: s >= n, "<=": lambda s, n: s <= n, ">": lambda s, n: s > n, "<": lambda s, n: s < n}
+
+
+def _norm(text):
+    return " ".join(re.sub(r"[_\W]+", " ", str(text).lower()).split())
+
+
+def looks_aggregate(question):
+    return any(pattern.search(question.lower()) for _, pattern in AGGREGATES)
+
+
+class TableQueryEngine:
+    """Answers aggregate questions ("total of X where Y", "average X by Z") with pandas.
+
+    Column names and cell values mentioned in the question are matched
+    against the table's manifest; questions it cannot resolve unambiguously
+    return None so the caller falls back to retrieval and the LLM. Resolved
+    questions are computed one row group at a time, reading only the
+    columns they use, and the partial aggregates combined.
+    """
+
+    def __init__(self, tables, source=""):
+        self.tables = tables
+        self.source = source
+
+    def answer(self, question):
+        q = _norm(question)
+        aggregate = next((name for name, pattern in AGGREGATES if pattern.search(question.lower())), None)
+        if aggregate is None:
+            return None
+        for table in self.tables.values():
+            result = self._answer_table(q, question.lower(), aggregate, table)
+            if result is not None:
+                return result
+        return None
+
+    def _mentioned_columns(self, q, columns):
+        found, taken = [], q
+        for column in sorted(columns, key=lambda c: -len(_norm(c))):
+            name = _norm(column)
+            if name and re.search(rf"\b{re.escape(name)}\b", taken):
+                found.append(column)
+                taken = re.sub(rf"\b{re.escape(name)}\b", " ", taken)
+        return found
+
+    def _value_filters(self, q, table):
+        """[(column, [values])] for the cell values the question names; "East and West" keeps both.
+
+        Longer values are matched first and removed, so "New York" does not
+        also select "York".
+        """
+        filters = []
+        for column, values in table.values.items():
+            found, taken = [], q
+            for value in sorted(values, key=lambda v: -len(_norm(v))):
+                text = _norm(value)
+                if len(text) >= 2 and re.search(rf"\b{re.escape(text)}\b", taken):
+                    found.append(value)
+                    taken = re.sub(rf"\b{re.escape(text)}\b", " ", taken)
+            if found:
+                filters.append((column, sorted(found, key=lambda v: q.find(_norm(v)))))
+        return filters
+
+    def _answer_table(self, q, raw, aggregate, table):
+        if not table.rows:
+            return None
+        mentioned = self._mentioned_columns(q, table.columns)
+
+        group = None
+        match = GROUP_PATTERN.search(q)
+        if match:
+            group = next((c for c in mentioned if _norm(c) in match.group(1) and c not in table.numeric), None)
+
+        filters = [(column, value) for column, value in self._value_filters(q, table) if column != group]
+        conditions = [f"{column} = {values[0]}" if len(values) == 1 else f"{column} in {', '.join(values)}"
+                      for column, values in filters]
+        comparisons = []
+        targets = [c for c in mentioned if c in table.numeric]
+        for op, pattern in COMPARISONS:
+            found = pattern.search(raw)
+            if found and len(targets) > (0 if aggregate == "count" else 1):
+                # "sum of amount where quantity over 5": the comparison applies to the column just before it
+                before = _norm(raw[:found.start()])
+                column = max(targets, key=lambda c: before.rfind(_norm(c)))
+                comparisons.append((column, op, float(found.group(1).replace(",", ""))))
+                conditions.append(f"{column} {op} {found.group(1)}")
+                targets.remove(column)
+
+        # Sums, averages and extremes need exactly one numeric column; counts a column to group or filter on
+        if aggregate != "count" and len(targets) != 1:
+            return None
+        if aggregate == "count" and not (conditions or group):
+            return None
+        target = targets[0] if targets and aggregate != "count" else None
+
+        needed = [target, group] + [column for column, _ in filters] + [column for column, _, _ in comparisons]
+        matched, partials = 0, []
+        for frame in table.iter_frames(list(dict.fromkeys(c for c in needed if c is not None))):
+            mask = pd.Series(True, index=frame.index)
+            for column, values in filters:
+                mask &= frame[column].astype(str).isin(values)
+            for column, op, number in comparisons:
+                mask &= OPERATORS[op](_to_numbers(frame[column]), number)
+            matched += int(mask.sum())
+            values = _to_numbers(frame[target])[mask] if target else mask[mask]
+            keys = frame[group][mask] if group else pd.Series("", index=values.index)
+            partials.append(values.groupby(keys).agg(PARTIALS[aggregate]))
+        combined = pd.concat(partials).groupby(level=0).agg({stat: COMBINE[stat] for stat in PARTIALS[aggregate]})
+        result = combined["sum"] / combined["count"] if aggregate == "mean" else combined[PARTIALS[aggregate][0]]
+
+        label = AGGREGATE_LABELS[aggregate] + (f" of {target}" if target else " of rows")
+        where = f" where {' and '.join(conditions)}" if conditions else ""
+        location = " ".join(part for part in (self.source, table.sheet) if part)
+        if group is not None:
+            result = result.sort_values(ascending=aggregate == "min")
+            lines = [f"- {key}: {_format_number(value)}" for key, value in result.head(MAX_GROUPS_SHOWN).items()]
+            if len(result) > MAX_GROUPS_SHOWN:
+                lines.append(f"- … {len(result) - MAX_GROUPS_SHOWN} more")
+            text = f"{label} by {group}{where}:\n" + "\n".join(lines)
+        else:
+            empty = 0 if aggregate in ("sum", "count") else float("nan")
+            text = f"{label}{where}: {_format_number(result.iloc[0] if len(result) else empty)}"
+        return {"answer": text, "source": f"{location} ({matched} of {table.rows} rows)", "rows": matched}
+
+
+def _format_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if value != value:
+        return "n/a"
+    return f"{value:,.0f}" if value == int(value) else f"{value:,.2f}"
+
+
+def attach_tables(store, file_path, content_hash=None):
+    """Remembers the spreadsheet behind a tabular document's index for direct queries."""
+    if store is not None and is_tabular(file_path):
+        store.table_file = file_path
+        store.table_hash = content_hash
+    return store
+
+
+def answer_from_tables(indexes, question):
+    """Answers an aggregate question from the tables behind any tabular index, or returns None."""
+    if not TABLE_QUERIES or not looks_aggregate(question):
+        return None
+    for index in indexes:
+        path = getattr(index, "table_file", None)
+        if path is None:
+            continue
+        try:
+            with span("table_query"):
+                tables = get_table_cache().load(path, getattr(index, "table_hash", None))
+                result = TableQueryEngine(tables, os.path.basename(path)).answer(question)
+        except Exception as e:
+            print(f"⚠️ Table query failed, falling back to document search: {e}")
+            continue
+        if result is not None:
+            return result
+    return None
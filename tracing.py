@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# === Settings ===
+TRACING = os.getenv("FLOWSYNC_TRACING", "1") != "0"
+TRACE_FILE = os.getenv("FLOWSYNC_TRACE_FILE", "")        # JSON lines, one finished trace per line
+METRICS_FILE = os.getenv("FLOWSYNC_METRICS_FILE", "")    # Prometheus text format, rewritten after each trace
+METRICS_PORT = int(os.getenv("FLOWSYNC_METRICS_PORT", "0"))   # serve /metrics on 127.0.0.1 when set
+RECENT_TRACES = 50
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)   # seconds
+
+_current = contextvars.ContextVar("flowsync_trace", default=None)
+
+
+class Trace:
+    """Spans and counters of one request (an answer, a context detection)."""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []        # [name, offset ms, duration ms, attrs]
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration_ms, attrs):
+        with self._lock:
+            self.spans.append([name, round((start - self.start) * 1000, 3), round(duration_ms, 3), attrs])
+
+    def add(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_totals(self):
+        """{stage: (total ms, span count)} in the order stages first started."""
+        totals = {}
+        for name, _, duration, _ in sorted(self.spans, key=lambda span: span[1]):
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        return totals
+
+    def breakdown(self):
+        """One line for the UI, e.g. "⏱️ 1.42 s · retrieval 85 ms · llm 1.30 s (first token 410 ms) · 212 tokens"."""
+        parts = [f"⏱️ {_format_ms(self.duration_ms if self.duration_ms is not None else (time.perf_counter() - self.start) * 1000)}"]
+        for name, (total, count) in self.stage_totals().items():
+            part = f"{name} {_format_ms(total)}" + (f" ×{count}" if count > 1 else "")
+            first_token = next((attrs["first_token_ms"] for span, _, _, attrs in self.spans
+                                if span == name and "first_token_ms" in attrs), None)
+            if first_token is not None:
+                part += f" (first token {_format_ms(first_token)})"
+            parts.append(part)
+        for name in ("llm_tokens", "chunks", "context_tokens", "response_cache_hits"):
+            if self.counters.get(name):
+                parts.append(f"{self.counters[name]:g} {name.replace('_', ' ')}")
+        return " · ".join(parts)
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "name": self.name, "timestamp": self.timestamp,
+                "duration_ms": self.duration_ms, "attrs": self.attrs, "spans": self.spans, "counters": self.counters}
+
+
+def _format_ms(ms):
+    return f"{ms / 1000:.2f} s" if ms >= 1000 else f"{ms:.0f} ms" if ms >= 10 else f"{ms:.1f} ms"
+
+
+class Metrics:
+    """Process-wide stage latency histograms and counters, in Prometheus text format on demand."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}    # stage -> [bucket counts..., +Inf count, sum seconds]
+        self._counters = {}
+        self.recent = deque(maxlen=RECENT_TRACES)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[len(self.buckets)] += 1
+            histogram[-1] += seconds
+
+    def add(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def prometheus(self):
+        lines = ["# TYPE flowsync_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'flowsync_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'flowsync_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram[len(self.buckets)]}')
+                lines.append(f'flowsync_stage_seconds_sum{{stage="{stage}"}} {histogram[-1]:.6f}')
+                lines.append(f'flowsync_stage_seconds_count{{stage="{stage}"}} {histogram[len(self.buckets)]}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE flowsync_{name}_total counter")
+                lines.append(f"flowsync_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+_export_lock = threading.Lock()
+_server = None
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Times a stage; recorded on the current trace (if any) and in the stage histogram.
+
+    The yielded dict can be filled with attributes while the span runs.
+    """
+    if not TRACING:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe(name, duration)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_span(name, start, duration * 1000, attrs)
+
+
+def count(name, value=1):
+    """Adds to a counter (tokens, chunks, cache hits, OCR pixels) on the current trace and globally."""
+    if not TRACING:
+        return
+    metrics.add(name, value)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, value)
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Collects the spans and counters of one request; exported when the block exits."""
+    current = Trace(name, **attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.duration_ms = (time.perf_counter() - current.start) * 1000
+        if TRACING:
+            metrics.observe(f"request:{name}", current.duration_ms / 1000)
+            metrics.recent.append(current)
+            _export(current)
+
+
+def propagate(fn):
+    """Wraps `fn` to run in the caller's trace context, for work handed to another thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def _export(finished):
+    try:
+        with _export_lock:
+            if TRACE_FILE:
+                with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(finished.to_dict()) + "\n")
+            if METRICS_FILE:
+                metrics.write(METRICS_FILE)
+        if METRICS_PORT:
+            start_metrics_server()
+    except OSError as e:
+        print(f"⚠️ Could not export trace: {e}")
+
+
+def start_metrics_server(port=None):
+    """Serves the metrics at http://127.0.0.1:<port>/metrics from a daemon thread (once)."""
+    global _server
+    with _export_lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer(("127.0.0.1", port or METRICS_PORT), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        print(f"📈 Metrics at http://127.0.0.1:{_server.server_address[1]}/metrics")
+        return _server
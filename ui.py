@@ -5,20 +5,24 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QTextEdit,
                              QLineEdit, QDesktopWidget, QHBoxLayout, QMessageBox, QSystemTrayIcon, QStyle, QFileDialog, QGraphicsOpacityEffect)
 from PyQt5.QtCore import Qt, QRectF, QTimer, QPropertyAnimation, QEasingCurve, QSize
-from PyQt5.QtGui import QRegion, QPainterPath, QColor, QIcon, QPixmap
+from PyQt5.QtGui import QRegion, QPainterPath, QColor, QIcon, QPixmap, QTextCursor
 from PyQt5.QtWidgets import QGraphicsDropShadowEffect
-from screen import capture_and_process_screen, suggest_task_from_screen, respond_to_user_query, execute_code
-from detect_open import detect_document_path, extract_text, build_temp_index_from_file, close_application_by_pid, copy_to_temp, reopen_file, FILE_TYPES
+from screen import capture_and_process_screen, suggest_task_from_screen, respond_to_user_query, run_automation_once, conversation_history
+from detect_open import detect_document_path, build_temp_index_from_file, copy_to_temp
+from open_documents import FILE_TYPES
+from retrieval import retrieve_context
+from context_builder import format_citations
+from tabular import answer_from_tables
+from workers import TaskRunner, StallMonitor
+from response_cache import get_response_cache, fingerprint
 from dotenv import load_dotenv
-from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
-from langchain.retrievers.ensemble import EnsembleRetriever
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
+from clients import get_document_qa_chain
+from embedding_service import embedding_services
+from tracing import trace
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+DOCUMENT_QA_MODEL = "gpt-3.5-turbo"
 
 class FloatingChat(QWidget):
     def __init__(self):
@@ -36,6 +40,9 @@ class FloatingChat(QWidget):
         self.document_mode = False
         self.document_indexes = []
         self.screen_text = ""
+        self.tasks = TaskRunner(self)
+        self.stall_monitor = StallMonitor(self)
+        self.stall_monitor.start()
         self.init_ui()
 
         self.resize(self.circle_radius * 2, self.circle_radius * 2)
@@ -61,6 +68,10 @@ class FloatingChat(QWidget):
         self.add_doc_btn.clicked.connect(self.add_new_document)
         self.add_doc_btn.setVisible(False)
 
+        self.stop_btn = QPushButton("⏹ Stop")
+        self.stop_btn.clicked.connect(self.cancel_query)
+        self.stop_btn.setVisible(False)
+
         self.close_button = QPushButton("X")
         self.close_button.setFixedSize(20, 20)
         self.close_button.clicked.connect(self.toggle_expand)
@@ -68,6 +79,7 @@ class FloatingChat(QWidget):
         self.expandable_layout.addWidget(self.close_button)
         self.expandable_layout.addWidget(self.chat_box)
         self.expandable_layout.addWidget(self.input_field)
+        self.expandable_layout.addWidget(self.stop_btn)
         self.expandable_layout.addWidget(self.mode_toggle_btn)
         self.expandable_layout.addWidget(self.add_doc_btn)
 
@@ -212,106 +224,231 @@ class FloatingChat(QWidget):
     def initialize_context(self):
         self.chat_box.setText("🔍 Checking your screen and open documents...")
         self.show_toast("Analyzing screen and checking for open documents...")
-        QApplication.processEvents()
-        try:
-            file_path, process = detect_document_path()
-            process_name = process.name().lower() if process else ""
-            ext = os.path.splitext(file_path)[-1].lower() if file_path else ""
-
-            if file_path and ext in FILE_TYPES:
-                close_application_by_pid(process.pid)
-                temp_path = copy_to_temp(file_path)
-                self.document_text = extract_text(temp_path)
-                index = build_temp_index_from_file(temp_path, OPENAI_API_KEY)
-                if index:
-                    self.document_indexes.append(index)
-                reopen_file(file_path)
-
-                self.chat_box.setText(
-                    f"📄 A supported document is open: {os.path.basename(file_path)}\n\nYou're now in Document Expert mode. Ask your question below."
-                )
-                self.document_mode = True
-                self.mode_toggle_btn.setVisible(True)
-                self.update_mode_button()
-                self.layout.update()
-                self.updateGeometry()
-                return
-
-            elif process_name in ["winword.exe", "excel.exe", "powerpnt.exe"]:
-                self.chat_box.setText(
-                    f"📄 A document app is open (e.g., Word/Excel/PowerPoint), but file access failed.\n\nDefaulting to Document Expert mode."
-                )
-                self.document_mode = True
-                self.mode_toggle_btn.setVisible(True)
-                self.update_mode_button()
-                self.layout.update()
-                self.updateGeometry()
-                return
-
-            self.screen_text = capture_and_process_screen()
-            screen_suggestions = suggest_task_from_screen(self.screen_text)
-            self.chat_box.setText(f"💡 Gemini Suggestions (Screen):\n{screen_suggestions}\n\nAsk anything below.")
+        self.tasks.submit(
+            "context", self._detect_context,
+            on_result=self._on_context_ready,
+            on_error=self._on_context_error,
+            on_progress=self.chat_box.append,
+        )
+
+    def _detect_context(self, token, progress, stream):
+        """Background stage: detect an open document and index it, or fall back to the screen."""
+        with trace("context") as current:
+            context = self._find_context(token, progress)
+        context["timing"] = current.breakdown()
+        return context
+
+    def _find_context(self, token, progress):
+        file_path, process = detect_document_path()
+        token.raise_if_cancelled()
+        process_name = process.name().lower() if process else ""
+        ext = os.path.splitext(file_path)[-1].lower() if file_path else ""
+
+        if file_path and ext in FILE_TYPES:
+            progress(f"📄 Indexing {os.path.basename(file_path)}...")
+            # A shared-read copy: the user's application stays open
+            temp_path = copy_to_temp(file_path)
+            token.raise_if_cancelled()
+            index = build_temp_index_from_file(temp_path, OPENAI_API_KEY, source=file_path)
+            return {"kind": "document", "file_path": file_path, "index": index}
+
+        if process_name in ["winword.exe", "excel.exe", "powerpnt.exe"]:
+            return {"kind": "document_app"}
+
+        progress("🖥️ Reading your screen...")
+        screen_text = capture_and_process_screen()
+        token.raise_if_cancelled()
+        return {"kind": "screen", "screen_text": screen_text, "suggestions": suggest_task_from_screen(screen_text)}
+
+    def _on_context_ready(self, context):
+        if context["kind"] == "document":
+            if context["index"]:
+                self.document_indexes.append(context["index"])
+            self.chat_box.setText(
+                f"📄 A supported document is open: {os.path.basename(context['file_path'])}\n\nYou're now in Document Expert mode. Ask your question below."
+            )
+            self.document_mode = True
+        elif context["kind"] == "document_app":
+            self.chat_box.setText(
+                "📄 A document app is open (e.g., Word/Excel/PowerPoint), but file access failed.\n\nDefaulting to Document Expert mode."
+            )
+            self.document_mode = True
+        else:
+            self.screen_text = context["screen_text"]
+            self.chat_box.setText(f"💡 Gemini Suggestions (Screen):\n{context['suggestions']}\n\nAsk anything below.")
             self.show_toast("No document detected. Using screen context.")
             self.document_mode = False
-            self.mode_toggle_btn.setVisible(True)
-            self.update_mode_button()
+        self.chat_box.append(context["timing"])
+        self.mode_toggle_btn.setVisible(True)
+        self.update_mode_button()
+        self.layout.update()
+        self.updateGeometry()
 
-        except Exception as e:
-            self.chat_box.setText(f"❌ Error during initialization: {e}")
-            self.show_toast("Initialization error. See assistant for details.")
+    def _on_context_error(self, error):
+        self.chat_box.setText(f"❌ Error during initialization: {error}")
+        self.show_toast("Initialization error. See assistant for details.")
 
     def add_new_document(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select a document", "", "Documents (*.pdf *.docx *.txt)")
         if file_path:
-            try:
-                self.chat_box.append(f"\n📄 Loading: {os.path.basename(file_path)}")
-                temp_path = copy_to_temp(file_path)
-                document_text = extract_text(temp_path)
-                index = build_temp_index_from_file(temp_path, OPENAI_API_KEY)
-                if index:
-                    self.document_indexes.append(index)
-                    self.chat_box.append("✅ Document added and ready to query.")
-            except Exception as e:
-                self.chat_box.append(f"❌ Failed to load document: {e}")
+            self.chat_box.append(f"\n📄 Loading: {os.path.basename(file_path)}")
+            # Each document gets its own slot so several can load at once
+            self.tasks.submit(
+                f"document:{file_path}", self._load_document, file_path,
+                on_result=self._on_document_loaded,
+                on_error=lambda error: self.chat_box.append(f"❌ Failed to load document: {error}"),
+            )
+
+    def _load_document(self, file_path, token, progress, stream):
+        temp_path = copy_to_temp(file_path)
+        token.raise_if_cancelled()
+        return build_temp_index_from_file(temp_path, OPENAI_API_KEY, source=file_path)
+
+    def _on_document_loaded(self, index):
+        if index:
+            self.document_indexes.append(index)
+            self.chat_box.append("✅ Document added and ready to query.")
 
     def handle_user_query(self):
         user_query = self.input_field.text().strip()
         if not user_query:
             return
         self.input_field.clear()
+        if self.tasks.is_busy("query"):
+            self.chat_box.append("⏭️ Previous question superseded.")
         self.chat_box.append(f"\n🧑 You: {user_query}\n")
-        QApplication.processEvents()
-
-        try:
-            if self.document_mode and self.document_indexes:
-                similarity_search_results = []
-                for index in self.document_indexes:
-                    results = index.similarity_search(user_query, k=3)
-                    similarity_search_results.extend(results)
-                retriever = "\n".join([doc.page_content for doc in similarity_search_results])
-                llm=ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2, api_key=OPENAI_API_KEY)
-                prompt = ChatPromptTemplate.from_template("Answer the question based on: {context} Question: {question}")
-                qa_chain = {"context": lambda x: retriever, "question": RunnablePassthrough()} | prompt | llm | StrOutputParser()
-                answer = qa_chain.invoke(user_query)
-                self.chat_box.append(f"🤖 Document Answer:\n{answer}")
-            else:
-                instructions, automation_code = respond_to_user_query(self.screen_text, user_query)
-                self.chat_box.append(f"🤖 Screen Assistant:\n{instructions}\n")
-                if automation_code.strip():
-                    confirm = QMessageBox.question(
-                        self, "Automation Request",
-                        "Do you want me to perform this task automatically?",
-                        QMessageBox.Yes | QMessageBox.No
-                    )
-                    if confirm == QMessageBox.Yes:
-                        self.chat_box.append("⚙️ Running automation...\n")
-                        QApplication.processEvents()
-                        result = execute_code(automation_code, self.screen_text, user_query)
-                        self.chat_box.append(f"✅ Automated successfully.\n{result if result else ''}")
-        except Exception as e:
-            self.chat_box.append(f"❌ Error: {e}")
+        self.stop_btn.setVisible(True)
+        # Snapshot the state the answer depends on; the worker must not touch widgets
+        self.tasks.submit(
+            "query", self._answer_query, user_query, self.document_mode, list(self.document_indexes), self.screen_text,
+            on_result=self._on_answer,
+            on_error=lambda error: self.chat_box.append(f"❌ Error: {error}"),
+            on_progress=self.chat_box.append,
+            on_stream=self.append_stream,
+            on_finished=lambda: self.stop_btn.setVisible(False),
+        )
+
+    def _answer_query(self, user_query, document_mode, document_indexes, screen_text, token, progress, stream):
+        """Background stage: retrieval + LLM for documents, or the screen assistant chain.
+
+        Answer text is streamed to the chat box as it is generated. Each
+        answer is traced, and its per-stage latency breakdown is shown with it.
+        """
+        name = "document_answer" if document_mode and document_indexes else "screen_answer"
+        with trace(name) as current:
+            answer = self._compose_answer(user_query, document_mode, document_indexes, screen_text, token, progress, stream)
+        answer["timing"] = current.breakdown()
+        return answer
+
+    def _compose_answer(self, user_query, document_mode, document_indexes, screen_text, token, progress, stream):
+        streamed = []
+        def on_token(text):
+            token.raise_if_cancelled()
+            streamed.append(text)
+            stream(text)
+
+        if document_mode and document_indexes:
+            # Totals, averages and counts over spreadsheets are computed with pandas, not the LLM
+            table_answer = answer_from_tables(document_indexes, user_query)
+            if table_answer is not None:
+                progress("📊 Table Answer:")
+                on_token(table_answer["answer"])
+                return {"kind": "document", "answer": table_answer["answer"],
+                        "sources": f"Sources: {table_answer['source']}", "streamed": True}
+            context = retrieve_context(document_indexes, user_query)
+            token.raise_if_cancelled()
+            sources = format_citations(context["citations"])
+            progress("🤖 Document Answer:")
+            # The retrieved context identifies the document set, so identical questions skip the LLM
+            cache = get_response_cache()
+            context_key = fingerprint(context["text"])
+            cached = cache.get("document_answer", DOCUMENT_QA_MODEL, user_query, context=context_key, similar=True)
+            if cached is not None:
+                on_token(cached)
+                return {"kind": "document", "answer": cached, "sources": sources, "streamed": True}
+            qa_chain = get_document_qa_chain(DOCUMENT_QA_MODEL, api_key=OPENAI_API_KEY)
+            for chunk in qa_chain.stream({"context": context["text"], "question": user_query}):
+                on_token(chunk)
+            answer = "".join(streamed)
+            cache.put("document_answer", DOCUMENT_QA_MODEL, user_query, answer, context=context_key, similar=True)
+            return {"kind": "document", "answer": answer, "sources": sources, "streamed": True}
+        progress("🤖 Screen Assistant:")
+        instructions, automation_code = respond_to_user_query(screen_text, user_query, on_token=on_token)
+        return {"kind": "screen", "query": user_query, "instructions": instructions,
+                "automation_code": automation_code, "streamed": bool(streamed)}
+
+    def append_stream(self, text):
+        """Appends streamed text to the end of the chat box without starting a new paragraph."""
+        cursor = self.chat_box.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertPlainText(text)
+        self.chat_box.setTextCursor(cursor)
+        self.chat_box.ensureCursorVisible()
+
+    def _on_answer(self, answer):
+        if answer["kind"] == "document":
+            if not answer["streamed"]:
+                self.chat_box.append(answer["answer"])
+            if answer["sources"]:
+                self.chat_box.append(f"📎 {answer['sources']}")
+            self.chat_box.append(answer["timing"])
+            return
+        if not answer["streamed"]:
+            self.chat_box.append(answer["instructions"])
+        self.chat_box.append(answer["timing"])
+        self.chat_box.append("")
+        if answer["automation_code"].strip():
+            confirm = QMessageBox.question(
+                self, "Automation Request",
+                "Do you want me to perform this task automatically?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if confirm == QMessageBox.Yes:
+                self._start_automation(answer["automation_code"], self.screen_text, answer["query"])
+
+    def _start_automation(self, automation_code, screen_text, user_query, attempt=0):
+        """Runs one automation attempt on the pool; every confirmation is asked here, on the UI thread."""
+        self.chat_box.append("⚙️ Running automation...\n")
+        self.tasks.submit(
+            "automation", self._run_automation, automation_code, screen_text, user_query, attempt,
+            on_result=lambda failure: self._on_automation_result(failure, screen_text, user_query, attempt),
+            on_error=lambda error: self.chat_box.append(f"❌ Error: {error}"),
+        )
+
+    def _run_automation(self, automation_code, screen_text, user_query, attempt, token, progress, stream):
+        return run_automation_once(automation_code, screen_text, user_query, attempt)
+
+    def _on_automation_result(self, failure, screen_text, user_query, attempt):
+        if failure is None:
+            self.chat_box.append("✅ Automated successfully.")
+            return
+        error, fixed_code = failure
+        self.chat_box.append(f"❌ Automation failed: {error}")
+        if fixed_code is None:
+            self.chat_box.append("❌ Could not complete automation after multiple attempts.")
+            return
+        confirm = QMessageBox.question(
+            self, "Automation Failed",
+            f"The automation failed:\n{error}\n\nDo you want me to try a fixed version?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm == QMessageBox.Yes:
+            self._start_automation(fixed_code, screen_text, user_query, attempt + 1)
+        else:
+            self.chat_box.append("⛔ Skipping automation.")
+
+    def cancel_query(self):
+        if self.tasks.cancel("query"):
+            self.chat_box.append("⏹ Cancelled.")
+        self.stop_btn.setVisible(False)
 
     def close_app(self):
+        self.tasks.cancel_all()
+        print(f"📊 {self.stall_monitor.summary()}")
+        print(f"📊 {get_response_cache().summary()}")
+        print(f"📊 {conversation_history.report()}")
+        for service in embedding_services():
+            print(f"📊 {service.query_summary()}")
         QApplication.quit()
 
 if __name__ == '__main__':
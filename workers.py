@@ -0,0 +1,163 @@
+import time
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal, pyqtSlot
+
+
+class CancelledError(Exception):
+    """Raised inside a task once it has been cancelled or superseded."""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between the UI and a background task."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise CancelledError()
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(str)
+    stream = pyqtSignal(str)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Runs `fn(*args, token=..., progress=..., stream=..., **kwargs)` on a thread pool.
+
+    `progress` reports status lines; `stream` forwards partial output such as LLM tokens.
+
+    Results of a cancelled task are dropped, so a superseded query never
+    overwrites the answer of the one that replaced it.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = CancelToken()
+        self.signals = WorkerSignals()
+
+    def _progress(self, message):
+        if not self.token.cancelled:
+            self.signals.progress.emit(message)
+
+    def _stream(self, text):
+        if not self.token.cancelled:
+            self.signals.stream.emit(text)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.fn(*self.args, token=self.token, progress=self._progress, stream=self._stream, **self.kwargs)
+        except CancelledError:
+            pass
+        except Exception as e:
+            if not self.token.cancelled:
+                self.signals.error.emit(str(e))
+        else:
+            if not self.token.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class TaskRunner(QObject):
+    """Starts workers by named slot; submitting to a busy slot cancels the task already in it."""
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._active = {}
+
+    def submit(self, slot, fn, *args, on_result=None, on_error=None, on_progress=None, on_stream=None,
+               on_finished=None, **kwargs):
+        self.cancel(slot)
+        worker = Worker(fn, *args, **kwargs)
+        if on_result:
+            worker.signals.result.connect(on_result)
+        if on_error:
+            worker.signals.error.connect(on_error)
+        if on_progress:
+            worker.signals.progress.connect(on_progress)
+        if on_stream:
+            worker.signals.stream.connect(on_stream)
+        worker.signals.finished.connect(lambda: self._finish(slot, worker, on_finished))
+        self._active[slot] = worker
+        self.pool.start(worker)
+        return worker
+
+    def _finish(self, slot, worker, on_finished):
+        if self._active.get(slot) is worker:
+            del self._active[slot]
+            if on_finished:
+                on_finished()
+
+    def cancel(self, slot):
+        worker = self._active.pop(slot, None)
+        if worker:
+            worker.token.cancel()
+        return worker is not None
+
+    def cancel_all(self):
+        for slot in list(self._active):
+            self.cancel(slot)
+
+    def is_busy(self, slot):
+        return slot in self._active
+
+
+class StallMonitor(QObject):
+    """Measures how long the GUI thread is blocked.
+
+    A timer is scheduled every `interval_ms`; any delay beyond that interval
+    before it fires is time the event loop could not process input or paint.
+    """
+
+    def __init__(self, parent=None, interval_ms=16, report_threshold_ms=100):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.report_threshold_ms = report_threshold_ms
+        self.total_stall_ms = 0.0
+        self.max_stall_ms = 0.0
+        self.stalls = 0
+        self.ticks = 0
+        self._last = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        stall_ms = (now - self._last) * 1000 - self.interval_ms
+        self._last = now
+        self.ticks += 1
+        if stall_ms > self.interval_ms:
+            self.total_stall_ms += stall_ms
+            self.max_stall_ms = max(self.max_stall_ms, stall_ms)
+            self.stalls += 1
+            if stall_ms >= self.report_threshold_ms:
+                print(f"🐢 GUI thread stalled for {stall_ms:.0f} ms")
+
+    def summary(self):
+        return (f"GUI stalls: {self.stalls} (> {self.interval_ms} ms late), "
+                f"total {self.total_stall_ms:.0f} ms, worst {self.max_stall_ms:.0f} ms over {self.ticks} ticks")